@@ -3,20 +3,25 @@ from flask import Flask
 from flask_cors import CORS
 from flask import jsonify
 from RainViewerAPI import RainViewerAPI
-from flask import request, send_file, abort
+from flask import request, send_file, abort, Response
 import os
 import requests
 from goesdata import get_goes19_image_base64
 from rss_feeds.ai_interaction import GeminiArticleRanker
 from rss_feeds.db_handler import DatabaseHandler
 from rss_feeds.aggregator import RSSAggregator
-import threading
-import time
+from rss_feeds.news_cache import NewsCache
+from rss_feeds.retention import ArticleRetention
+from rss_feeds.scheduler import FeedScheduler
+import gzip
 from dotenv import load_dotenv
 from pictures.picture_handler import save_uploaded_picture
 from pictures.picture_handler import get_pictures_algorithmically
 from pictures.picture_handler import update_picture_likes
 from pictures.picture_handler import toggle_picture_visibility
+from heatmaps import FrameCatalog, HeatmapWorker, normalize_heatmap_type, clamp_window
+from heatmaps.tiles import TileServer, empty_tile
+from heatmaps.animation import HeatmapAnimator
 
 # Load environment variables from .env file
 load_dotenv()
@@ -27,22 +32,46 @@ CORS(app, resources={r"*": {"origins": "*"}})
 
 BASE_PATH = os.path.join(os.path.dirname(__file__))
 
-def rss_aggregate_and_rank():
-    if (os.getenv("run_rss_aggregator", "False").lower() != "true"):
-        print("RSS Aggregation and Ranking is disabled.")
-        return
-    agg = RSSAggregator(feeds_file="rss_feeds/feeds.json", db_path="rss_feeds/articles.db")
-    agg.aggregate_all_feeds()
+frame_catalog = FrameCatalog(db_path="heatmaps.db")
+tile_server = TileServer(frame_catalog)
+heatmap_animator = HeatmapAnimator(frame_catalog)
+
+# With debug=True the Werkzeug reloader imports this module in a watcher process and again in
+# the serving child (WERKZEUG_RUN_MAIN=true); background jobs only run in the process that serves
+run_background_jobs = __name__ != '__main__' or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+
+# Run the flight heatmap engine as a child process; its live grids are shared with us
+heatmap_worker = None
+if run_background_jobs and os.getenv("run_heatmapper", "False").lower() == "true":
+    heatmap_worker = HeatmapWorker(db_path="heatmaps.db", output_folder="flight_heatmaps",
+                                   grid_resolution=int(os.getenv("heatmap_grid_resolution", "200")),
+                                   render_pngs=os.getenv("heatmap_render_pngs", "True").lower() == "true",
+                                   sparse=os.getenv("heatmap_sparse_grids", "False").lower() == "true",
+                                   ingest_mode=os.getenv("heatmap_ingest_mode", "points"),
+                                   cube_resolution=int(os.getenv("heatmap_cube_resolution", "100")) or None)
+    heatmap_worker.start()
+
+# Candidates for /get_news, reloaded after every aggregate-and-rank cycle
+news_cache = NewsCache(db_path="rss_feeds/articles.db")
+# Archives articles that can't be served any more, once a day
+article_retention = ArticleRetention(db_path="rss_feeds/articles.db")
+
+def rank_new_articles():
     ranker = GeminiArticleRanker(db_path="rss_feeds/articles.db", api_key=os.getenv("GEMINI_API_KEY"))
     ranker.rank_pending_articles()
+    article_retention.run_if_due()
+    news_cache.refresh()
 
-def schedule_task(interval_seconds=1800):  # 1800 seconds = 30 minutes
-    while True:
-        rss_aggregate_and_rank()
-        time.sleep(interval_seconds)
-
-scheduler_thread = threading.Thread(target=schedule_task, daemon=True)
-scheduler_thread.start()
+# Each feed is polled on its own interval, learned from how often it publishes
+feed_scheduler = None
+if run_background_jobs and os.getenv("run_rss_aggregator", "False").lower() == "true":
+    feed_scheduler = FeedScheduler(RSSAggregator(feeds_file="rss_feeds/feeds.json", db_path="rss_feeds/articles.db"),
+                                   on_new_articles=rank_new_articles,
+                                   min_interval=float(os.getenv("rss_min_poll_interval", "300")),
+                                   max_interval=float(os.getenv("rss_max_poll_interval", "21600")))
+    feed_scheduler.start()
+elif run_background_jobs:
+    print("RSS Aggregation and Ranking is disabled.")
 
 
 @app.after_request
@@ -121,20 +150,174 @@ def weather():
     return jsonify(response)
 
 
-# @app.route("/flightsdata", methods=['POST'])
-# def flightdata():
-#     data = request.get_json()
-#     type= data["type"]
-#     duration = data["duration"]
-#     if type == "reset_30_mins":
-#         type = "reset_30min"
-#     elif type == "reset_hour":
-#         type = "reset_hour"
+@app.route("/flightsdata", methods=['POST'])
+def flightdata():
+    """
+    Return [url, timestamp, has_grid] for the heatmap frames in the requested window.
+    Only frames with a stored grid can be served as tiles; the rest only as a whole PNG.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict) or not isinstance(data.get("type", ""), str):
+        return jsonify({'error': 'Expected a JSON object with a string type'}), 400
+    try:
+        duration = clamp_window(data.get("duration", 30))
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({'error': 'duration must be a number of minutes'}), 400
+
+    heatmap_type = normalize_heatmap_type(data.get("type", ""))
+    if heatmap_type is None:
+        return jsonify([])
+
+    frames = frame_catalog.get_recent_frames(heatmap_type, duration)
+    return jsonify([[f"/heatmap/{data['type']}/{frame['timestamp']}.png", frame['timestamp'],
+                     bool(frame['grid_id'] or frame['grid_archive_id'])] for frame in frames])
+
+def frame_response(data, mimetype, tag):
+    """
+    Wrap a render of a stored frame. Replay can rewrite a frame under the same
+    URL, so clients only keep it for a few minutes and then revalidate against
+    an ETag that changes with the frame generation.
+    """
+    response = Response(data, mimetype=mimetype)
+    response.headers['Cache-Control'] = 'public, max-age=600'
+    response.set_etag(f"{frame_catalog.generation()}-{tag}")
+    return response.make_conditional(request)
+
+@app.route("/heatmap/<heatmap_type>/<int:timestamp>.png", methods=['GET'])
+def heatmap_frame(heatmap_type, timestamp):
+    """
+    Serve a single heatmap frame.
+    """
+    stored_type = normalize_heatmap_type(heatmap_type)
+    if stored_type is None:
+        abort(404)
+
+    png = frame_catalog.get_frame_png(stored_type, timestamp)
+    if png is None:
+        abort(404)
+
+    return frame_response(png, 'image/png', f"{stored_type}-{timestamp}")
+
+@app.route("/heatmap/contours/<heatmap_type>/<int:timestamp>.geojson", methods=['GET'])
+def heatmap_contours(heatmap_type, timestamp):
+    """
+    Serve a frame's density bands as GeoJSON polygons for vector overlays.
+    The bands are fixed server-side; query parameters are ignored.
+    """
+    stored_type = normalize_heatmap_type(heatmap_type)
+    if stored_type is None:
+        abort(404)
+
+    geojson = frame_catalog.get_frame_contours(stored_type, timestamp)
+    if geojson is None:
+        abort(404)
+
+    return frame_response(geojson, 'application/geo+json', f"contours-{stored_type}-{timestamp}")
 
-#     print(type, duration)
-#     ani = HeatmapAnimation()
-#     frames = ani.fetch_frames(duration, type)
-#     return jsonify(frames)
+@app.route("/heatmap/delta/<heatmap_type>.bin", methods=['GET'])
+def heatmap_delta(heatmap_type):
+    """
+    Serve the frames of a window (?duration=minutes) as one binary stream: a
+    uint16 keyframe followed by sparse per-frame deltas, for the client to
+    colorize itself.
+    """
+    stored_type = normalize_heatmap_type(heatmap_type)
+    if stored_type is None:
+        abort(404)
+
+    # The window is part of the cache key, so it's clamped to a bounded set of values
+    data = frame_catalog.get_delta_stream(stored_type, clamp_window(request.args.get('duration', 30, type=int)))
+    response = Response(data, mimetype='application/octet-stream')
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    # The body depends on Accept-Encoding, so shared caches must key on it
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route("/heatmap/loop/<heatmap_type>.png", methods=['GET'])
+def heatmap_loop(heatmap_type):
+    """
+    Serve the frames of a window (?duration=minutes) as one animated PNG.
+    """
+    stored_type = normalize_heatmap_type(heatmap_type)
+    if stored_type is None:
+        abort(404)
+
+    duration = clamp_window(request.args.get('duration', 30, type=int))
+    loop = heatmap_animator.get_loop(stored_type, duration)
+    if loop is None:
+        abort(404)
+
+    timestamp, apng = loop
+    response = Response(apng, mimetype='image/apng')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Frame-Timestamp'] = str(timestamp)
+    # Clients revalidate and get a 304 until a new frame enters the window or frames are rewritten
+    response.set_etag(f"{frame_catalog.generation()}-{stored_type}-{duration}-{timestamp}")
+    return response.make_conditional(request)
+
+@app.route("/heatmap/tiles/<heatmap_type>/<int:timestamp>/<int:z>/<int:x>/<int:y>.png", methods=['GET'])
+def heatmap_tile(heatmap_type, timestamp, z, x, y):
+    """
+    Serve one z/x/y map tile of a heatmap frame.
+    """
+    stored_type = normalize_heatmap_type(heatmap_type)
+    if stored_type is None:
+        abort(404)
+
+    found, tile = tile_server.get_tile(stored_type, timestamp, z, x, y)
+    if not found:
+        abort(404)
+    # Tiles with no traffic share one transparent PNG
+    return frame_response(tile or empty_tile(), 'image/png', f"{stored_type}-{timestamp}-{z}-{x}-{y}")
+
+@app.route("/heatmap/cube/<int:timestamp>.png", methods=['GET'])
+def heatmap_cube_slice(timestamp):
+    """
+    Render a slice of a frame's flight histogram cube. Repeat the
+    altitude_band, speed_band and airline query parameters to select several
+    bins; axes that aren't given are summed over.
+    """
+    png = frame_catalog.get_cube_png(timestamp,
+                                     altitude_band=request.args.getlist('altitude_band', type=int),
+                                     speed_band=request.args.getlist('speed_band', type=int),
+                                     airline=request.args.getlist('airline'))
+    if png is None:
+        abort(404)
+
+    return frame_response(png, 'image/png', f"cube-{timestamp}-{request.query_string.decode()}")
+
+@app.route("/heatmap/cube/<int:timestamp>/summary", methods=['GET'])
+def heatmap_cube_summary(timestamp):
+    """
+    Return the marginal totals of a frame's cube along each category axis.
+    """
+    cube = frame_catalog.get_frame_cube(timestamp)
+    if cube is None:
+        return jsonify({'error': 'No cube for this frame'}), 404
+
+    return jsonify({axis: cube.marginal(axis) for axis in ('altitude_band', 'speed_band', 'airline')})
+
+@app.route("/heatmap/live/<heatmap_type>.png", methods=['GET'])
+def heatmap_live(heatmap_type):
+    """
+    Render the heatmap engine's current grid straight from shared memory.
+    """
+    stored_type = normalize_heatmap_type(heatmap_type)
+    if stored_type is None or heatmap_worker is None:
+        abort(404)
+
+    live = heatmap_worker.live_png(stored_type)
+    if live is None:
+        abort(404)
+
+    timestamp, png = live
+    response = Response(png, mimetype='image/png')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Frame-Timestamp'] = str(timestamp)
+    return response
 
 
 @app.route("/radar-json", methods=['POST'])
@@ -162,9 +345,7 @@ def goes_image():
 
 @app.route('/get_news', methods=['GET'])
 def get_news():
-    agg = RSSAggregator(feeds_file="rss_feeds/feeds.json", db_path="rss_feeds/articles.db")
-    articles = agg.fetch_articles_algorithmically()
-    return jsonify(articles)
+    return jsonify(news_cache.pick())
 
 @app.route('/pictures/get_pictures', methods=['GET'])
 def get_pictures_endpoint():
@@ -0,0 +1,40 @@
+"""
+Heatmaps package for storing, indexing and rendering flight density grids.
+"""
+
+from .db_handler import HeatmapDBHandler
+from .sparse import SparseGrid
+from .grid_store import encode_grid, decode_grid, save_grid, load_grid
+from .render import render_grid_png
+from .delta import encode_delta_stream, decode_delta_stream
+from .catalog import FrameCatalog, normalize_heatmap_type, clamp_window
+from .cube import FlightCube, CubeFrame
+from .engine import HeatmapEngine
+from .snapshots import SnapshotStore
+from .pipeline import HeatmapPipeline
+from .shared_grids import SharedGrids
+from .worker import HeatmapWorker
+from .replay import replay
+
+__all__ = [
+    'HeatmapDBHandler',
+    'SparseGrid',
+    'encode_grid',
+    'decode_grid',
+    'save_grid',
+    'load_grid',
+    'render_grid_png',
+    'encode_delta_stream',
+    'decode_delta_stream',
+    'FrameCatalog',
+    'normalize_heatmap_type',
+    'clamp_window',
+    'FlightCube',
+    'CubeFrame',
+    'HeatmapEngine',
+    'SnapshotStore',
+    'HeatmapPipeline',
+    'SharedGrids',
+    'HeatmapWorker',
+    'replay',
+]
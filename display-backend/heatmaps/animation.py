@@ -0,0 +1,191 @@
+import struct
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .catalog import FrameCatalog
+
+logger = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class PngFrame(NamedTuple):
+    """
+    The parts of a PNG an APNG frame is built from.
+    """
+    ihdr: bytes
+    ancillary: bytes
+    image_data: bytes
+
+
+def _chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def parse_png(png: bytes) -> PngFrame:
+    """
+    Split a PNG into its IHDR payload, the raw chunks that must precede the
+    image data (palette, transparency, colour space) and its concatenated
+    IDAT payload.
+
+    Args:
+        png (bytes): PNG image data
+
+    Returns:
+        PngFrame: The parsed frame
+    """
+    if not png.startswith(PNG_SIGNATURE):
+        raise ValueError("Not a PNG image")
+
+    ihdr, ancillary, image_data = b'', [], []
+    offset = len(PNG_SIGNATURE)
+    while offset < len(png):
+        (length,) = struct.unpack_from('>I', png, offset)
+        chunk_type = png[offset + 4:offset + 8]
+        data = png[offset + 8:offset + 8 + length]
+        if chunk_type == b'IHDR':
+            ihdr = data
+        elif chunk_type == b'IDAT':
+            image_data.append(data)
+        elif chunk_type in (b'PLTE', b'tRNS', b'gAMA', b'cHRM', b'sRGB', b'iCCP', b'pHYs'):
+            ancillary.append(png[offset:offset + 12 + length])
+        elif chunk_type == b'IEND':
+            break
+        offset += 12 + length
+    return PngFrame(ihdr, b''.join(ancillary), b''.join(image_data))
+
+
+def mux_apng(frames: List[PngFrame], delay_ms: int = 200, num_plays: int = 0) -> bytes:
+    """
+    Assemble already-compressed PNG frames into an animated PNG.
+
+    The compressed image data of each frame is reused as-is (IDAT for the
+    first frame, so viewers without APNG support show it, fdAT for the rest);
+    only the small frame control chunks and sequence numbers are written, so
+    muxing costs a copy and a CRC per frame, not a re-encode.
+
+    Args:
+        frames (list): Parsed frames, all with the same IHDR
+        delay_ms (int): Display time of each frame
+        num_plays (int): Loop count (0 loops forever)
+
+    Returns:
+        bytes: APNG image data
+    """
+    first = frames[0]
+    width, height = struct.unpack_from('>II', first.ihdr, 0)
+    chunks = [PNG_SIGNATURE, _chunk(b'IHDR', first.ihdr), _chunk(b'acTL', struct.pack('>II', len(frames), num_plays)),
+              first.ancillary]
+
+    sequence = 0
+    for index, frame in enumerate(frames):
+        chunks.append(_chunk(b'fcTL', struct.pack('>IIIIIHHBB', sequence, width, height, 0, 0,
+                                                  delay_ms, 1000, 0, 0)))
+        sequence += 1
+        if index == 0:
+            chunks.append(_chunk(b'IDAT', frame.image_data))
+        else:
+            chunks.append(_chunk(b'fdAT', struct.pack('>I', sequence) + frame.image_data))
+            sequence += 1
+    chunks.append(_chunk(b'IEND', b''))
+    return b''.join(chunks)
+
+
+class HeatmapAnimator:
+    """
+    Animated PNG loops over the recent frames of a heatmap window.
+
+    Parsed frames are cached individually, so when the window moves only the
+    new frame's PNG is read and the loop is re-muxed from cached chunks. The
+    finished loop is cached per (type, duration) until its frame list changes.
+    Both caches are dropped when the catalog's frame generation moves.
+    """
+
+    def __init__(self, catalog: FrameCatalog, delay_ms: int = 200, frame_cache_size: int = 256,
+                 loop_cache_size: int = 8):
+        """
+        Initialize the animator.
+
+        Args:
+            catalog (FrameCatalog): Source of frame lists and PNGs
+            delay_ms (int): Display time of each frame
+            frame_cache_size (int): Number of parsed frames to keep in memory
+            loop_cache_size (int): Number of finished loops to keep in memory
+        """
+        self.catalog = catalog
+        self.delay_ms = delay_ms
+        self.frame_cache_size = frame_cache_size
+        self.loop_cache_size = loop_cache_size
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._frame_cache: "OrderedDict[Tuple[str, int], PngFrame]" = OrderedDict()
+        self._loop_cache: "OrderedDict[Tuple[str, int], Tuple[tuple, Optional[bytes]]]" = OrderedDict()
+
+    def get_loop(self, heatmap_type: str, duration_minutes: int) -> Optional[Tuple[int, bytes]]:
+        """
+        Get the animated PNG of the last duration_minutes.
+
+        Args:
+            heatmap_type (str): Stored heatmap type
+            duration_minutes (int): Window length in minutes
+
+        Returns:
+            tuple or None: (newest frame timestamp, APNG data), or None if the window is empty
+        """
+        generation = self.catalog.generation()
+        with self._lock:
+            if generation != self._generation:
+                self._generation = generation
+                self._frame_cache.clear()
+                self._loop_cache.clear()
+
+        key = (heatmap_type, int(duration_minutes))
+        timestamps = tuple(frame['timestamp'] for frame in self.catalog.get_recent_frames(heatmap_type,
+                                                                                          duration_minutes))
+        with self._lock:
+            cached = self._loop_cache.get(key)
+            if cached and cached[0] == timestamps:
+                self._loop_cache.move_to_end(key)
+                return (timestamps[-1], cached[1]) if cached[1] else None
+
+        frames = [frame for frame in (self._get_frame(heatmap_type, timestamp, generation)
+                                      for timestamp in timestamps) if frame]
+        # Frame size can only change with the render settings; keep frames matching the newest
+        if frames:
+            frames = [frame for frame in frames if frame.ihdr == frames[-1].ihdr]
+        data = mux_apng(frames, delay_ms=self.delay_ms) if frames else None
+
+        with self._lock:
+            # A loop muxed while the generation moved may hold frames from before the rewrite
+            if generation == self._generation:
+                self._loop_cache[key] = (timestamps, data)
+                self._loop_cache.move_to_end(key)
+                while len(self._loop_cache) > self.loop_cache_size:
+                    self._loop_cache.popitem(last=False)
+        return (timestamps[-1], data) if data else None
+
+    def _get_frame(self, heatmap_type: str, timestamp: int, generation: int) -> Optional[PngFrame]:
+        key = (heatmap_type, timestamp)
+        with self._lock:
+            if key in self._frame_cache:
+                self._frame_cache.move_to_end(key)
+                return self._frame_cache[key]
+
+        png = self.catalog.get_frame_png(heatmap_type, timestamp)
+        if png is None:
+            return None
+        try:
+            frame = parse_png(png)
+        except ValueError as e:
+            logger.warning(f"Skipping frame {heatmap_type}@{timestamp} in loop: {e}")
+            return None
+
+        with self._lock:
+            if generation == self._generation:
+                self._frame_cache[key] = frame
+                while len(self._frame_cache) > self.frame_cache_size:
+                    self._frame_cache.popitem(last=False)
+        return frame
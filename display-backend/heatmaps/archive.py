@@ -0,0 +1,86 @@
+import os
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+def archive_path_for(archive_folder: str, heatmap_type: str, hour_start: int, generation: int) -> str:
+    """
+    Get the path of an hourly archive file.
+
+    Each rewrite of an hour gets a new generation number, so the index can be
+    switched to the new file before the old one is removed.
+
+    Args:
+        archive_folder (str): Root folder for archives
+        heatmap_type (str): Heatmap type
+        hour_start (int): UNIX timestamp of the start of the hour
+        generation (int): Generation number of this rewrite
+
+    Returns:
+        str: Path like <archive_folder>/<type>/<YYYY-MM-DD>/<HH>_<generation>.bin (UTC date and hour)
+    """
+    # UTC, like the hour buckets compaction groups frames into
+    hour_time = datetime.fromtimestamp(hour_start, timezone.utc)
+    return os.path.join(archive_folder, heatmap_type, hour_time.strftime('%Y-%m-%d'),
+                        f"{hour_time.strftime('%H')}_{generation}.bin")
+
+
+def write_archive(archive_path: str, blobs: list) -> list:
+    """
+    Write blobs back-to-back into a new archive file.
+
+    Args:
+        archive_path (str): Destination archive path
+        blobs (list): Byte strings to pack, in order
+
+    Returns:
+        list: (offset, length) for each blob
+    """
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+    tmp_path = archive_path + '.tmp'
+    ranges = []
+    offset = 0
+    with open(tmp_path, 'wb') as f:
+        for blob in blobs:
+            f.write(blob)
+            ranges.append((offset, len(blob)))
+            offset += len(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, archive_path)
+    return ranges
+
+
+def read_blob(archive_path: str, offset: int, length: int) -> bytes:
+    """
+    Read one packed blob from an archive without touching the rest of the file.
+
+    Args:
+        archive_path (str): Archive path
+        offset (int): Byte offset of the blob
+        length (int): Blob length in bytes
+
+    Returns:
+        bytes: The blob
+    """
+    fd = os.open(archive_path, os.O_RDONLY)
+    try:
+        return os.pread(fd, length, offset)
+    finally:
+        os.close(fd)
+
+
+def read_entry(entry: dict) -> bytes:
+    """
+    Read the blob described by a heatmap_archive row.
+
+    Args:
+        entry (dict): Row with archive_path, offset and length
+
+    Returns:
+        bytes: The blob
+    """
+    return read_blob(entry['archive_path'], entry['offset'], entry['length'])
+
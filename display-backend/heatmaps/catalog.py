@@ -0,0 +1,388 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from .db_handler import HeatmapDBHandler
+from .grid_store import decode_grid
+from .sparse import SparseGrid
+from .cube import CubeFrame
+from .render import render_grid_png
+from .delta import encode_delta_stream
+from .contours import grid_to_geojson
+from .archive import read_entry
+
+logger = logging.getLogger(__name__)
+
+HEATMAP_TYPES = ('rolling', 'reset_30min', 'reset_hour')
+
+# Names used by the Flights screen buttons
+HEATMAP_TYPE_ALIASES = {
+    'reset_30_mins': 'reset_30min',
+}
+
+# Longest window a client can ask for (frames older than this are thinned by compaction anyway)
+MAX_WINDOW_MINUTES = 24 * 60
+
+
+def normalize_heatmap_type(heatmap_type: str) -> Optional[str]:
+    """
+    Map a client-facing heatmap type to the name stored in heatmaps.db.
+
+    Args:
+        heatmap_type (str): Type as sent by the client
+
+    Returns:
+        str or None: Stored type name, or None if the type is unknown
+    """
+    heatmap_type = HEATMAP_TYPE_ALIASES.get(heatmap_type, heatmap_type)
+    return heatmap_type if heatmap_type in HEATMAP_TYPES else None
+
+
+def clamp_window(duration_minutes: int) -> int:
+    """
+    Limit a client-supplied window length to [1, MAX_WINDOW_MINUTES].
+
+    Args:
+        duration_minutes (int): Window length in minutes as sent by the client
+
+    Returns:
+        int: The clamped window length
+    """
+    return min(max(int(duration_minutes), 1), MAX_WINDOW_MINUTES)
+
+
+class FrameCatalog:
+    """
+    Catalog of heatmap frames backed by the (heatmap_type, timestamp) indexes
+    in heatmaps.db.
+
+    Recent frame lists are cached in memory for a short TTL, since every
+    Flights screen asks for the same few windows, and PNGs rendered on demand
+    from stored grids are kept in a small LRU. Replay can rewrite a frame in
+    place, so every cache is dropped when the frame generation in heatmaps.db
+    changes.
+    """
+
+    def __init__(self, db_path: str = "heatmaps.db", list_ttl: float = 30.0, png_cache_size: int = 32,
+                 window_cache_size: int = 16, contour_cache_size: int = 32, cmap_max: float = 10,
+                 generation_ttl: float = 5.0):
+        """
+        Initialize the frame catalog.
+
+        Args:
+            db_path (str): Path to the heatmap SQLite database
+            list_ttl (float): Seconds a cached frame list stays valid
+            png_cache_size (int): Number of lazily rendered PNGs to keep in memory
+            window_cache_size (int): Number of (type, duration) windows whose frame list
+                and delta stream are kept in memory
+            contour_cache_size (int): Number of traced frames kept as GeoJSON (the contour
+                levels are fixed here, so a cached frame is never traced twice)
+            cmap_max (float): Colormap cap used when rendering frames from grids
+            generation_ttl (float): Seconds between checks of the frame generation
+        """
+        self.db_handler = HeatmapDBHandler(db_path)
+        self.list_ttl = list_ttl
+        self.png_cache_size = png_cache_size
+        self.window_cache_size = window_cache_size
+        self.contour_cache_size = contour_cache_size
+        self.cmap_max = cmap_max
+        self.generation_ttl = generation_ttl
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._generation_checked = 0.0
+        self._list_cache: "OrderedDict[Tuple[str, int], Tuple[float, List[Dict]]]" = OrderedDict()
+        self._png_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._contour_cache: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+        self._delta_cache: "OrderedDict[Tuple[str, int], Tuple[tuple, bytes]]" = OrderedDict()
+
+    def generation(self) -> int:
+        """
+        Get the frame generation, clearing the caches if it moved since the last check.
+
+        The stored value is read at most once per generation_ttl. Caches built
+        on top of the catalog (tiles, loops) compare it with the generation
+        they were filled under.
+
+        Returns:
+            int: The frame generation
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._generation_checked < self.generation_ttl:
+                return self._generation
+            self._generation_checked = now
+
+        generation = self.db_handler.get_generation()
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                logger.info(f"Frame generation moved to {generation}, dropping cached frames")
+                self._generation = generation
+                self._clear_caches()
+            return self._generation
+
+    def _clear_caches(self):
+        self._list_cache.clear()
+        self._png_cache.clear()
+        self._contour_cache.clear()
+        self._delta_cache.clear()
+
+    def get_frames(self, heatmap_type: str, start: int, end: int) -> List[Dict]:
+        """
+        Range query over the frame index.
+
+        Args:
+            heatmap_type (str): Stored heatmap type
+            start (int): Range start (inclusive) as a UNIX timestamp
+            end (int): Range end (inclusive) as a UNIX timestamp
+
+        Returns:
+            list: Frame dictionaries (see HeatmapDBHandler.get_frames), oldest first
+        """
+        return self.db_handler.get_frames(heatmap_type, start, end)
+
+    def get_recent_frames(self, heatmap_type: str, duration_minutes: int) -> List[Dict]:
+        """
+        Get the frames of the last duration_minutes, served from cache when fresh.
+
+        Args:
+            heatmap_type (str): Stored heatmap type
+            duration_minutes (int): Window length in minutes
+
+        Returns:
+            list: Frame dictionaries, oldest first
+        """
+        generation = self.generation()
+        key = (heatmap_type, int(duration_minutes))
+        now = time.time()
+        with self._lock:
+            cached = self._list_cache.get(key)
+            if cached and cached[0] > now:
+                self._list_cache.move_to_end(key)
+                return cached[1]
+
+        end = int(now)
+        frames = self.get_frames(heatmap_type, end - int(duration_minutes) * 60, end)
+
+        with self._lock:
+            # Results loaded while the generation moved may come from the old frames
+            if generation == self._generation:
+                self._list_cache[key] = (now + self.list_ttl, frames)
+                self._list_cache.move_to_end(key)
+                while len(self._list_cache) > self.window_cache_size:
+                    self._list_cache.popitem(last=False)
+        return frames
+
+    def get_frame(self, heatmap_type: str, timestamp: int) -> Optional[Dict]:
+        """
+        Look up a single frame.
+
+        Args:
+            heatmap_type (str): Stored heatmap type
+            timestamp (int): Frame time as a UNIX timestamp
+
+        Returns:
+            dict or None: Frame dictionary, or None if not found
+        """
+        frames = self.get_frames(heatmap_type, timestamp, timestamp)
+        return frames[0] if frames else None
+
+    def get_frame_png(self, heatmap_type: str, timestamp: int) -> Optional[bytes]:
+        """
+        Get PNG bytes for a frame, rendering it from its grid if no PNG was saved.
+
+        Args:
+            heatmap_type (str): Stored heatmap type
+            timestamp (int): Frame time as a UNIX timestamp
+
+        Returns:
+            bytes or None: PNG image data, or None if the frame doesn't exist
+        """
+        generation = self.generation()
+        key = (heatmap_type, int(timestamp))
+        with self._lock:
+            if key in self._png_cache:
+                self._png_cache.move_to_end(key)
+                return self._png_cache[key]
+
+        frame = self.get_frame(heatmap_type, timestamp)
+        if not frame:
+            return None
+
+        # PNGs already on disk or in an archive are cheap to re-read, don't spend cache on them
+        png = self._read_blob(frame['file_path'], frame['png_archive_id'])
+        if png is not None:
+            return png
+
+        grid = self._load_grid(frame)
+        if grid is None:
+            logger.warning(f"Frame {heatmap_type}@{timestamp} is indexed but its files are missing")
+            return None
+
+        png = render_grid_png(grid, cmap_max=self.cmap_max)
+        with self._lock:
+            if generation == self._generation:
+                self._png_cache[key] = png
+                while len(self._png_cache) > self.png_cache_size:
+                    self._png_cache.popitem(last=False)
+        return png
+
+    def get_frame_contours(self, heatmap_type: str, timestamp: int) -> Optional[bytes]:
+        """
+        Get a frame's density bands as GeoJSON, traced from its grid once and cached.
+
+        Bands use the default levels of grid_to_geojson; clients can't pick
+        levels, so the cache holds at most one entry per frame. Frames
+        without a grid aren't cached.
+
+        Args:
+            heatmap_type (str): Stored heatmap type
+            timestamp (int): Frame time as a UNIX timestamp
+
+        Returns:
+            bytes or None: GeoJSON FeatureCollection, or None if the frame has no grid
+        """
+        generation = self.generation()
+        key = (heatmap_type, int(timestamp))
+        with self._lock:
+            if key in self._contour_cache:
+                self._contour_cache.move_to_end(key)
+                return self._contour_cache[key]
+
+        grid = self.get_frame_grid(heatmap_type, timestamp)
+        if grid is None:
+            return None
+
+        geojson = json.dumps(grid_to_geojson(grid, cmap_max=self.cmap_max), separators=(',', ':')).encode()
+        with self._lock:
+            if generation == self._generation:
+                self._contour_cache[key] = geojson
+                while len(self._contour_cache) > self.contour_cache_size:
+                    self._contour_cache.popitem(last=False)
+        return geojson
+
+    def get_delta_stream(self, heatmap_type: str, duration_minutes: int) -> bytes:
+        """
+        Encode the frames of the last duration_minutes as a keyframe plus deltas
+        (see heatmaps.delta), reusing the last stream until the window moves.
+
+        Args:
+            heatmap_type (str): Stored heatmap type
+            duration_minutes (int): Window length in minutes
+
+        Returns:
+            bytes: The encoded stream (frames without a stored grid are left out)
+        """
+        generation = self.generation()
+        key = (heatmap_type, int(duration_minutes))
+        frames = self.get_recent_frames(heatmap_type, duration_minutes)
+        frame_key = tuple(frame['timestamp'] for frame in frames)
+        with self._lock:
+            cached = self._delta_cache.get(key)
+            if cached and cached[0] == frame_key:
+                self._delta_cache.move_to_end(key)
+                return cached[1]
+
+        grids = []
+        for frame in frames:
+            grid = self._load_grid(frame) if frame['grid_path'] or frame['grid_archive_id'] else None
+            if grid is not None:
+                grids.append((frame['timestamp'], grid))
+        # A resolution change mid-window leaves only the frames matching the newest one
+        if grids:
+            shape = grids[-1][1].shape
+            grids = [(timestamp, grid) for timestamp, grid in grids if grid.shape == shape]
+
+        data = encode_delta_stream(grids)
+        with self._lock:
+            if generation == self._generation:
+                self._delta_cache[key] = (frame_key, data)
+                self._delta_cache.move_to_end(key)
+                while len(self._delta_cache) > self.window_cache_size:
+                    self._delta_cache.popitem(last=False)
+        return data
+
+    def get_frame_grid(self, heatmap_type: str, timestamp: int,
+                       sparse: bool = False) -> Optional[Union[np.ndarray, SparseGrid]]:
+        """
+        Load the grid a frame was rendered from, wherever it is stored.
+
+        Args:
+            heatmap_type (str): Stored heatmap type
+            timestamp (int): Frame time as a UNIX timestamp
+            sparse (bool): Return a SparseGrid instead of a dense array
+
+        Returns:
+            np.ndarray, SparseGrid or None: The grid, or None if the frame has no grid
+        """
+        frame = self.get_frame(heatmap_type, timestamp)
+        return self._load_grid(frame, sparse=sparse) if frame else None
+
+    def get_frame_cube(self, timestamp: int) -> Optional[CubeFrame]:
+        """
+        Load the flight histogram cube saved with a frame.
+
+        Args:
+            timestamp (int): Frame time as a UNIX timestamp
+
+        Returns:
+            CubeFrame or None: The cube, or None if the frame has no cube
+        """
+        frame = self.get_frame('cube', timestamp)
+        if not frame:
+            return None
+        data = self._read_blob(frame['grid_path'], frame['grid_archive_id'])
+        return CubeFrame.from_bytes(data) if data is not None else None
+
+    def get_cube_png(self, timestamp: int, altitude_band: Optional[List[int]] = None,
+                     speed_band: Optional[List[int]] = None, airline: Optional[List[str]] = None) -> Optional[bytes]:
+        """
+        Render a slice of a frame's histogram cube, summing over unselected axes.
+
+        Args:
+            timestamp (int): Frame time as a UNIX timestamp
+            altitude_band (list, optional): Altitude band indices to include
+            speed_band (list, optional): Speed band indices to include
+            airline (list, optional): Airline codes to include
+
+        Returns:
+            bytes or None: PNG image data, or None if the frame has no cube
+        """
+        generation = self.generation()
+        key = ('cube', int(timestamp), tuple(altitude_band or ()), tuple(speed_band or ()), tuple(airline or ()))
+        with self._lock:
+            if key in self._png_cache:
+                self._png_cache.move_to_end(key)
+                return self._png_cache[key]
+
+        cube = self.get_frame_cube(timestamp)
+        if cube is None:
+            return None
+
+        png = render_grid_png(cube.slice(altitude_band or None, speed_band or None, airline or None),
+                              cmap_max=self.cmap_max)
+        with self._lock:
+            if generation == self._generation:
+                self._png_cache[key] = png
+                while len(self._png_cache) > self.png_cache_size:
+                    self._png_cache.popitem(last=False)
+        return png
+
+    def _load_grid(self, frame: Dict, sparse: bool = False) -> Optional[Union[np.ndarray, SparseGrid]]:
+        data = self._read_blob(frame['grid_path'], frame['grid_archive_id'])
+        return decode_grid(data, sparse=sparse) if data is not None else None
+
+    def _read_blob(self, path: Optional[str], archive_id: Optional[int]) -> Optional[bytes]:
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                return f.read()
+        if archive_id:
+            entry = self.db_handler.get_archive_entry(archive_id)
+            if entry and os.path.exists(entry['archive_path']):
+                return read_entry(entry)
+        return None
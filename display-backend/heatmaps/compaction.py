@@ -0,0 +1,256 @@
+import os
+import time
+import logging
+from collections import defaultdict
+from typing import List, Dict, Optional, Tuple
+
+from .db_handler import HeatmapDBHandler
+from .archive import archive_path_for, write_archive, read_entry
+
+logger = logging.getLogger(__name__)
+
+# (min_age_hours, step_minutes, keep_png): frames at least min_age_hours old keep
+# one frame per step_minutes, and only keep their PNG when keep_png is set (a
+# frame with a grid can always be re-rendered). A step of None drops the frames.
+# The youngest matching tier wins.
+#
+# The last tier caps storage: with these tiers a heatmap type holds at most
+# 720 frames of the last day, 864 of the rest of the week and 552 hourly frames
+# up to 30 days old, 2136 in all (plus frames not yet old enough to compact).
+DEFAULT_RETENTION_TIERS: List[Tuple[float, Optional[int], bool]] = [
+    (0, 2, True),
+    (24, 10, False),
+    (24 * 7, 60, False),
+    (24 * 30, None, False),
+]
+
+
+def _tier_for(age_hours: float, tiers: List[Tuple[float, Optional[int], bool]]) -> int:
+    tier_index = 0
+    for i, (min_age_hours, _, _) in enumerate(tiers):
+        if age_hours >= min_age_hours:
+            tier_index = i
+    return tier_index
+
+
+def select_frames(frames: List[Dict], tiers: List[Tuple[float, Optional[int], bool]],
+                  now: float) -> List[Tuple[Dict, bool]]:
+    """
+    Thin one hour of frames according to the retention tiers.
+
+    Args:
+        frames (list): Frame dictionaries of a single type, oldest first
+        tiers (list): Retention tiers, see DEFAULT_RETENTION_TIERS
+        now (float): Current UNIX time
+
+    Returns:
+        list: (frame, keep_png) for each frame that survives
+    """
+    kept = []
+    seen_buckets = set()
+    for frame in frames:
+        tier_index = _tier_for((now - frame['timestamp']) / 3600, tiers)
+        _, step_minutes, keep_png = tiers[tier_index]
+        if step_minutes is None:
+            continue
+        bucket = (tier_index, frame['timestamp'] // (step_minutes * 60))
+        if bucket in seen_buckets:
+            continue
+        seen_buckets.add(bucket)
+        has_grid = bool(frame['grid_id'] or frame['grid_archive_id'])
+        kept.append((frame, keep_png or not has_grid))
+    return kept
+
+
+def _read_loose(path: Optional[str]) -> Optional[bytes]:
+    if path and os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    return None
+
+
+def _remove_loose(paths: List[str]) -> int:
+    removed = 0
+    folders = set()
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+            folders.add(os.path.dirname(path))
+        except FileNotFoundError:
+            continue
+    # Drop daily folders that are now empty
+    for folder in folders:
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass
+    return removed
+
+
+def _reclaim_archives(db_handler: HeatmapDBHandler, archive_folder: str, now: float, stats: Dict[str, int],
+                      min_live_ratio: float = 0.5, min_age_seconds: float = 600):
+    # Frames deleted from the index (e.g. replayed with replace_existing) leave their
+    # bytes behind: delete archive files nothing points at, repack mostly-dead ones
+    usage = db_handler.get_archive_usage()
+    if usage is None:
+        return
+    usage = {os.path.normpath(path): live_bytes for path, live_bytes in usage.items()}
+
+    for folder, _, files in os.walk(archive_folder):
+        for name in files:
+            if not name.endswith('.bin'):
+                continue
+            path = os.path.normpath(os.path.join(folder, name))
+            try:
+                size = os.path.getsize(path)
+                # Leave files young enough to be waiting for their index swap
+                if now - os.path.getmtime(path) < min_age_seconds:
+                    continue
+            except OSError:
+                continue
+
+            live_bytes = usage.get(path)
+            if live_bytes is None:
+                stats['archives_reclaimed'] += _remove_loose([path])
+                continue
+            if live_bytes >= size * min_live_ratio:
+                continue
+
+            try:
+                entries = db_handler.get_archive_entries(path)
+                if not entries:
+                    continue
+                blobs = [read_entry(entry) for entry in entries]
+                hour_start = entries[0]['timestamp'] - entries[0]['timestamp'] % 3600
+                new_path = archive_path_for(archive_folder, entries[0]['heatmap_type'], hour_start, int(now))
+                if os.path.normpath(new_path) == path:
+                    continue
+                for entry, (offset, length) in zip(entries, write_archive(new_path, blobs)):
+                    entry['offset'] = offset
+                    entry['length'] = length
+                if not db_handler.replace_archive([entries[0]['archive_path']], new_path, entries, [], []):
+                    os.remove(new_path)
+                    continue
+                stats['archives_reclaimed'] += _remove_loose([path])
+            except Exception as e:
+                logger.error(f"Error repacking {path}: {e}")
+
+
+def compact_frames(db_path: str = "heatmaps.db", archive_folder: str = "flight_heatmaps/archive",
+                   older_than_hours: float = 6, tiers: List[Tuple[float, Optional[int], bool]] = None,
+                   now: float = None) -> Dict[str, int]:
+    """
+    Pack frames older than a threshold into per-hour archive files.
+
+    Loose PNGs and grids are moved into one archive file per (type, hour),
+    indexed in heatmap_archive by byte offset so the frame catalog can still
+    serve them with a single pread. Frames already archived are thinned again
+    as they age into coarser retention tiers; an hour is only rewritten when
+    its contents change, and an hour whose frames all reached a drop tier is
+    removed from the index and disk. Archive files left unreferenced by deleted
+    frames are removed, and files that are less than half referenced are repacked.
+
+    Only frames indexed in heatmaps.db are compacted. The PNGs in the legacy
+    flight_heatmaps_2min/, flight_heatmaps_accum/ and flight_heatmaps_reset/
+    folders predate the index and its heatmap types, so they are left alone.
+
+    Args:
+        db_path (str): Path to the heatmap SQLite database
+        archive_folder (str): Root folder for archive files
+        older_than_hours (float): Only frames older than this are compacted
+        tiers (list): Retention tiers, see DEFAULT_RETENTION_TIERS
+        now (float): Current UNIX time (defaults to time.time())
+
+    Returns:
+        Dict[str, int]: Summary statistics of the compaction
+    """
+    tiers = tiers or DEFAULT_RETENTION_TIERS
+    now = now or time.time()
+    db_handler = HeatmapDBHandler(db_path)
+
+    stats = {
+        'hours_rewritten': 0,
+        'hours_dropped': 0,
+        'frames_archived': 0,
+        'frames_dropped': 0,
+        'pngs_dropped': 0,
+        'files_removed': 0,
+        'archives_reclaimed': 0,
+    }
+
+    groups = defaultdict(list)
+    for frame in db_handler.get_frames_before(int(now - older_than_hours * 3600)):
+        groups[(frame['heatmap_type'], frame['timestamp'] - frame['timestamp'] % 3600)].append(frame)
+
+    for (heatmap_type, hour_start), frames in sorted(groups.items()):
+        kept = select_frames(frames, tiers, now)
+        has_loose = any(frame['log_id'] or frame['grid_id'] for frame in frames)
+        drops_png = any(frame['png_archive_id'] and not keep_png for frame, keep_png in kept)
+        if not has_loose and not drops_png and len(kept) == len(frames):
+            continue
+
+        try:
+            old_archive_paths = set()
+            entries, blobs = [], []
+            for frame, keep_png in kept:
+                png_entry = db_handler.get_archive_entry(frame['png_archive_id']) if frame['png_archive_id'] else None
+                grid_entry = db_handler.get_archive_entry(frame['grid_archive_id']) if frame['grid_archive_id'] else None
+
+                grid = read_entry(grid_entry) if grid_entry else _read_loose(frame['grid_path'])
+                png = None
+                if keep_png or grid is None:
+                    png = read_entry(png_entry) if png_entry else _read_loose(frame['file_path'])
+                elif frame['png_archive_id'] or frame['file_path']:
+                    stats['pngs_dropped'] += 1
+
+                for kind, blob in (('grid', grid), ('png', png)):
+                    if blob is not None:
+                        entries.append({'heatmap_type': heatmap_type, 'timestamp': frame['timestamp'], 'kind': kind})
+                        blobs.append(blob)
+
+            for frame in frames:
+                for entry_id in (frame['png_archive_id'], frame['grid_archive_id']):
+                    if entry_id:
+                        old_archive_paths.add(db_handler.get_archive_entry(entry_id)['archive_path'])
+
+            # An hour with nothing left only needs its index rows and files removed
+            archive_path = archive_path_for(archive_folder, heatmap_type, hour_start, int(now))
+            if blobs:
+                for entry, (offset, length) in zip(entries, write_archive(archive_path, blobs)):
+                    entry['offset'] = offset
+                    entry['length'] = length
+
+            log_ids = [frame['log_id'] for frame in frames if frame['log_id']]
+            grid_ids = [frame['grid_id'] for frame in frames if frame['grid_id']]
+            if not db_handler.replace_archive(sorted(old_archive_paths), archive_path, entries, log_ids, grid_ids):
+                if blobs:
+                    os.remove(archive_path)
+                continue
+
+            # The index now points at the new archive; the old files are garbage
+            loose_paths = [path for frame in frames for path in (frame['file_path'], frame['grid_path']) if path]
+            stats['files_removed'] += _remove_loose(loose_paths + sorted(old_archive_paths - {archive_path}))
+            stats['hours_rewritten' if kept else 'hours_dropped'] += 1
+            stats['frames_archived'] += len(kept)
+            stats['frames_dropped'] += len(frames) - len(kept)
+        except Exception as e:
+            logger.error(f"Error compacting {heatmap_type} frames for hour {hour_start}: {e}")
+            continue
+
+    _reclaim_archives(db_handler, archive_folder, now, stats)
+    logger.info(f"Heatmap compaction completed. Stats: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pack old heatmap frames into hourly archives')
+    parser.add_argument('--db-path', default='heatmaps.db', help='Heatmap database path')
+    parser.add_argument('--archive-folder', default='flight_heatmaps/archive', help='Folder for archive files')
+    parser.add_argument('--older-than-hours', type=float, default=6, help='Only compact frames older than this')
+
+    args = parser.parse_args()
+    print(compact_frames(db_path=args.db_path, archive_folder=args.archive_folder,
+                         older_than_hours=args.older_than_hours))
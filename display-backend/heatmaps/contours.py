@@ -0,0 +1,130 @@
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import matplotlib
+import matplotlib.colors as mcolors
+from contourpy import FillType, contour_generator
+
+from .render import US_BOUNDS
+
+logger = logging.getLogger(__name__)
+
+# Flight counts per cell where density bands start
+DEFAULT_CONTOUR_LEVELS = (1, 2, 5, 10)
+
+
+def simplify_ring(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker simplification of a closed ring.
+
+    Args:
+        points (np.ndarray): (n, 2) ring, first point repeated at the end
+        tolerance (float): Maximum distance a dropped point may lie from the kept outline
+
+    Returns:
+        np.ndarray: The simplified ring, still closed
+    """
+    if len(points) <= 4 or tolerance <= 0:
+        return points
+
+    # Split the ring at the point furthest from its start so both halves have distinct endpoints
+    far = int(np.argmax(np.sum((points - points[0]) ** 2, axis=1)))
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, far, len(points) - 1]] = True
+
+    stack = [(0, far), (far, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        segment = end - start
+        inner = points[first + 1:last]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(*(inner - start).T)
+        else:
+            distances = np.abs(segment[0] * (inner[:, 1] - start[1]) - segment[1] * (inner[:, 0] - start[0])) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def _ring_area(ring: np.ndarray) -> float:
+    x, y = ring[:, 0], ring[:, 1]
+    return abs(float(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))) / 2
+
+
+def _smooth(grid: np.ndarray, passes: int) -> np.ndarray:
+    # Repeated 3x3 box filter, so single-poll speckle doesn't become its own polygon
+    for _ in range(passes):
+        padded = np.pad(grid, 1, mode='edge')
+        rows = padded[:-2] + padded[1:-1] + padded[2:]
+        grid = (rows[:, :-2] + rows[:, 1:-1] + rows[:, 2:]) / 9.0
+    return grid
+
+
+def grid_to_geojson(grid: np.ndarray, levels: Sequence[float] = DEFAULT_CONTOUR_LEVELS,
+                    bounds: Tuple[float, float, float, float] = US_BOUNDS, tolerance: float = 0.05,
+                    smooth: int = 1, min_cells: float = 2, cmap_name: str = 'hot', cmap_max: float = 10) -> Dict:
+    """
+    Trace density bands of a heatmap grid as GeoJSON polygons.
+
+    Filled contours are traced with contourpy's marching squares, one
+    MultiPolygon feature per band [level, next level), then simplified with
+    Douglas-Peucker.
+
+    Args:
+        grid (np.ndarray): 2D grid of per-cell counts (row 0 is the southern edge)
+        levels (sequence): Increasing lower bounds of the bands
+        bounds (tuple): (max_lat, min_lat, min_lon, max_lon) of the grid
+        tolerance (float): Simplification tolerance in degrees
+        smooth (int): Box filter passes applied before tracing
+        min_cells (float): Polygons smaller than this many grid cells are dropped
+        cmap_name (str): Matplotlib colormap used for the suggested fill colors
+        cmap_max (float): Count at which the colormap saturates
+
+    Returns:
+        dict: GeoJSON FeatureCollection
+    """
+    y1, y2, x1, x2 = bounds
+    grid = _smooth(np.asarray(grid, dtype=np.float64), smooth)
+    rows, cols = grid.shape
+    # Cell i covers [min + i * step, min + (i + 1) * step), see HeatmapEngine.get_grid_indices
+    lat_step, lon_step = (y1 - y2) / max(rows - 1, 1), (x2 - x1) / max(cols - 1, 1)
+    lons = x1 + (np.arange(cols) + 0.5) * lon_step
+    lats = y2 + (np.arange(rows) + 0.5) * lat_step
+
+    min_area = min_cells * lat_step * lon_step
+
+    cmap = matplotlib.colormaps[cmap_name]
+    generator = contour_generator(lons, lats, grid, fill_type=FillType.OuterOffset)
+    bands = list(zip(levels, list(levels[1:]) + [max(float(grid.max()), levels[-1]) + 1]))
+
+    features: List[Dict] = []
+    for lower, upper in bands:
+        if grid.max() < lower:
+            break
+        points_list, offsets_list = generator.filled(lower, upper)
+        polygons = []
+        for points, offsets in zip(points_list, offsets_list):
+            rings = [simplify_ring(points[start:end], tolerance) for start, end in zip(offsets[:-1], offsets[1:])]
+            if len(rings[0]) < 4 or _ring_area(rings[0]) < min_area:
+                continue
+            polygons.append([np.round(ring, 4).tolist() for ring in rings if len(ring) >= 4])
+        if polygons:
+            features.append({
+                'type': 'Feature',
+                'properties': {
+                    'level': lower,
+                    'upper': upper if upper <= levels[-1] else None,
+                    'fill': mcolors.to_hex(cmap(min(lower / cmap_max, 1.0))),
+                },
+                'geometry': {'type': 'MultiPolygon', 'coordinates': polygons},
+            })
+    return {'type': 'FeatureCollection', 'features': features}
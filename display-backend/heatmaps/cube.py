@@ -0,0 +1,218 @@
+import io
+import json
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .render import US_BOUNDS
+
+# Band edges: a value falls in band i when edges[i] <= value < edges[i + 1] (the last band is open)
+ALTITUDE_BAND_EDGES_FT = [0, 1000, 10000, 20000, 30000, 40000]
+SPEED_BAND_EDGES_KT = [0, 100, 250, 400, 500]
+
+# Airlines with their own slice; everything else is counted under 'other' (index 0)
+DEFAULT_AIRLINES = ['AAL', 'DAL', 'UAL', 'SWA', 'ASA', 'JBU', 'NKS', 'FFT',
+                    'SKW', 'RPA', 'ENY', 'EDV', 'FDX', 'UPS', 'AAY']
+
+CUBE_AXES = ('lat', 'lon', 'altitude_band', 'speed_band', 'airline')
+
+Selector = Union[None, int, str, Sequence[Union[int, str]]]
+
+
+def _band_indices(values: np.ndarray, edges: Sequence[float]) -> np.ndarray:
+    return np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 1)
+
+
+class CubeFrame:
+    """
+    Read-only view of a flight histogram cube stored as occupied cells.
+
+    Slices and marginals are computed from the occupied cells only, so
+    querying a frame never materializes the full lat x lon x altitude x
+    speed x airline array.
+    """
+
+    def __init__(self, shape: Sequence[int], keys: np.ndarray, values: np.ndarray, airlines: List[str],
+                 altitude_edges: Sequence[float] = ALTITUDE_BAND_EDGES_FT,
+                 speed_edges: Sequence[float] = SPEED_BAND_EDGES_KT):
+        """
+        Initialize the frame.
+
+        Args:
+            shape (sequence): Cube shape, in CUBE_AXES order
+            keys (np.ndarray): Row-major keys of the occupied cells
+            values (np.ndarray): Count of each occupied cell
+            airlines (list): Airline codes; index 0 is 'other'
+            altitude_edges (sequence): Altitude band edges in feet
+            speed_edges (sequence): Ground speed band edges in knots
+        """
+        self.shape = tuple(int(n) for n in shape)
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.airlines = list(airlines)
+        self.altitude_edges = list(altitude_edges)
+        self.speed_edges = list(speed_edges)
+        self._coords = np.unravel_index(self.keys, self.shape)
+
+    def _mask(self, altitude_band: Selector, speed_band: Selector, airline: Selector) -> np.ndarray:
+        mask = np.ones(self.keys.size, dtype=bool)
+        for axis, selector in ((2, altitude_band), (3, speed_band), (4, airline)):
+            if selector is None:
+                continue
+            selected = [selector] if isinstance(selector, (int, str, np.integer)) else list(selector)
+            if axis == 4:
+                # Airlines without their own slice are counted under 'other'
+                selected = [(self.airlines.index(s) if s in self.airlines else 0) if isinstance(s, str) else s
+                            for s in selected]
+            mask &= np.isin(self._coords[axis], selected)
+        return mask
+
+    def slice(self, altitude_band: Selector = None, speed_band: Selector = None,
+              airline: Selector = None) -> np.ndarray:
+        """
+        2D lat x lon grid for a selection, summed over every axis left as None.
+
+        Args:
+            altitude_band (int or list, optional): Altitude band index/indices
+            speed_band (int or list, optional): Speed band index/indices
+            airline (str, int or list, optional): Airline code(s) or index/indices
+
+        Returns:
+            np.ndarray: Dense 2D grid
+        """
+        mask = self._mask(altitude_band, speed_band, airline)
+        cells = self._coords[0][mask] * self.shape[1] + self._coords[1][mask]
+        grid = np.bincount(cells, weights=self.values[mask], minlength=self.shape[0] * self.shape[1])
+        return grid.reshape(self.shape[0], self.shape[1])
+
+    def marginal(self, axis: str, altitude_band: Selector = None, speed_band: Selector = None,
+                 airline: Selector = None) -> Dict:
+        """
+        Totals along one of the category axes for a selection.
+
+        Args:
+            axis (str): 'altitude_band', 'speed_band' or 'airline'
+            altitude_band, speed_band, airline: Optional selection, as in slice()
+
+        Returns:
+            dict: Band label (or airline code) to total count
+        """
+        axis_index = CUBE_AXES.index(axis)
+        mask = self._mask(altitude_band, speed_band, airline)
+        totals = np.bincount(self._coords[axis_index][mask], weights=self.values[mask],
+                             minlength=self.shape[axis_index])
+        return dict(zip(self.labels(axis), totals.tolist()))
+
+    def labels(self, axis: str) -> List[str]:
+        """
+        Human-readable labels for the bins of a category axis.
+        """
+        if axis == 'airline':
+            return ['other'] + self.airlines[1:]
+        edges = self.altitude_edges if axis == 'altitude_band' else self.speed_edges
+        return [f"{lo}-{hi}" for lo, hi in zip(edges[:-1], edges[1:])] + [f"{edges[-1]}+"]
+
+    def to_bytes(self) -> bytes:
+        """
+        Encode the frame as a compressed npz payload.
+        """
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            shape=np.asarray(self.shape, dtype=np.uint32),
+            keys=self.keys.astype(np.uint64),
+            values=self.values.astype(np.uint32) if np.all(self.values == np.round(self.values))
+            else self.values.astype(np.float32),
+            meta=np.frombuffer(json.dumps({
+                'airlines': self.airlines,
+                'altitude_edges': self.altitude_edges,
+                'speed_edges': self.speed_edges,
+            }).encode('utf-8'), dtype=np.uint8),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CubeFrame':
+        """
+        Decode a payload produced by to_bytes.
+        """
+        with np.load(io.BytesIO(bytes(data))) as payload:
+            meta = json.loads(payload['meta'].tobytes().decode('utf-8'))
+            return cls(payload['shape'], payload['keys'].astype(np.int64), payload['values'],
+                       meta['airlines'], meta['altitude_edges'], meta['speed_edges'])
+
+
+class FlightCube:
+    """
+    Multi-dimensional flight histogram: lat x lon x altitude band x ground
+    speed band x airline.
+
+    Every poll is binned into the cube once; any per-altitude, per-speed or
+    per-airline heatmap (or combination) is then a slice or marginal sum of
+    that single accumulation.
+    """
+
+    def __init__(self, resolution: int = 100, bounds: tuple = None, airlines: Sequence[str] = DEFAULT_AIRLINES,
+                 altitude_edges: Sequence[float] = ALTITUDE_BAND_EDGES_FT,
+                 speed_edges: Sequence[float] = SPEED_BAND_EDGES_KT):
+        """
+        Initialize the cube.
+
+        Args:
+            resolution (int): Lat/lon cells per side
+            bounds (tuple): (max_lat, min_lat, min_lon, max_lon) covered by the cube
+            airlines (sequence): Airline ICAO codes with their own slice
+            altitude_edges (sequence): Altitude band edges in feet
+            speed_edges (sequence): Ground speed band edges in knots
+        """
+        self.resolution = resolution
+        self.bounds = bounds or US_BOUNDS
+        self.airlines = ['other'] + list(airlines)
+        self._airline_index = {code: i for i, code in enumerate(self.airlines) if i}
+        self.altitude_edges = list(altitude_edges)
+        self.speed_edges = list(speed_edges)
+        self.shape = (resolution, resolution, len(self.altitude_edges), len(self.speed_edges), len(self.airlines))
+        self.counts = np.zeros(self.shape, dtype=np.uint32)
+
+    def ingest(self, snapshot: Dict) -> int:
+        """
+        Bin one poll snapshot into the cube.
+
+        Args:
+            snapshot (dict): Snapshot with lats, lons, altitudes, ground_speeds and airlines
+
+        Returns:
+            int: Number of flights binned
+        """
+        y1, y2, x1, x2 = self.bounds
+        lats, lons = snapshot['lats'], snapshot['lons']
+        inside = (lats >= y2) & (lats <= y1) & (lons >= x1) & (lons <= x2)
+
+        coords = (
+            ((lats[inside] - y2) / (y1 - y2) * (self.resolution - 1)).astype(np.intp),
+            ((lons[inside] - x1) / (x2 - x1) * (self.resolution - 1)).astype(np.intp),
+            _band_indices(snapshot['altitudes'][inside], self.altitude_edges),
+            _band_indices(snapshot['ground_speeds'][inside], self.speed_edges),
+            np.fromiter((self._airline_index.get(code, 0) for code in snapshot['airlines'][inside]),
+                        dtype=np.intp, count=int(inside.sum())),
+        )
+        np.add.at(self.counts.reshape(-1), np.ravel_multi_index(coords, self.shape), 1)
+        return int(inside.sum())
+
+    def clear(self):
+        self.counts.fill(0)
+
+    def frame(self) -> CubeFrame:
+        """
+        Snapshot the cube's occupied cells as a queryable CubeFrame.
+        """
+        flat = self.counts.reshape(-1)
+        keys = np.flatnonzero(flat)
+        return CubeFrame(self.shape, keys, flat[keys], self.airlines, self.altitude_edges, self.speed_edges)
+
+    def slice(self, altitude_band: Selector = None, speed_band: Selector = None,
+              airline: Selector = None) -> np.ndarray:
+        """
+        2D lat x lon grid of the live cube for a selection (see CubeFrame.slice).
+        """
+        return self.frame().slice(altitude_band, speed_band, airline)
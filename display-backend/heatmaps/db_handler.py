@@ -0,0 +1,535 @@
+import sqlite3
+import logging
+from typing import List, Dict, Optional
+
+from storage import get_database
+
+logger = logging.getLogger(__name__)
+
+
+class HeatmapDBHandler:
+    """
+    Database handler for the heatmap frame index in heatmaps.db.
+
+    heatmap_logs records rendered PNG frames; heatmap_grids records the
+    compressed grid each frame was rendered from, so any frame can be
+    re-rendered or aggregated later without the PNG. heatmap_archive records
+    the byte ranges of frames packed into hourly archive files, and
+    flight_snapshots the byte ranges of raw polls kept for replay.
+    """
+
+    def __init__(self, db_path: str = "heatmaps.db"):
+        """
+        Initialize the database handler.
+
+        Args:
+            db_path (str): Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self.database = get_database(db_path)
+        self.database.initialize('heatmaps', self.init_database)
+
+    def get_connection(self) -> sqlite3.Connection:
+        """
+        Borrow a pooled database connection (use it as a context manager, don't close it).
+
+        Returns:
+            sqlite3.Connection: Database connection object
+        """
+        return self.database.connection()
+
+    def init_database(self):
+        """
+        Create the heatmap tables if they don't exist.
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS heatmap_logs (
+                        id INTEGER PRIMARY KEY,
+                        file_path TEXT,
+                        timestamp DATETIME,
+                        heatmap_type TEXT
+                    )
+                ''')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_heatmap_logs_type_time '
+                               'ON heatmap_logs(heatmap_type, timestamp)')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS heatmap_grids (
+                        id INTEGER PRIMARY KEY,
+                        grid_path TEXT NOT NULL,
+                        timestamp INTEGER NOT NULL,
+                        heatmap_type TEXT NOT NULL,
+                        resolution INTEGER NOT NULL,
+                        nnz INTEGER NOT NULL,
+                        max_value REAL NOT NULL,
+                        size_bytes INTEGER NOT NULL
+                    )
+                ''')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_heatmap_grids_type_time '
+                               'ON heatmap_grids(heatmap_type, timestamp)')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS heatmap_archive (
+                        id INTEGER PRIMARY KEY,
+                        heatmap_type TEXT NOT NULL,
+                        timestamp INTEGER NOT NULL,
+                        kind TEXT NOT NULL,
+                        archive_path TEXT NOT NULL,
+                        offset INTEGER NOT NULL,
+                        length INTEGER NOT NULL
+                    )
+                ''')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_heatmap_archive_type_time '
+                               'ON heatmap_archive(heatmap_type, timestamp)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_heatmap_archive_path '
+                               'ON heatmap_archive(archive_path)')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS flight_snapshots (
+                        id INTEGER PRIMARY KEY,
+                        timestamp INTEGER NOT NULL,
+                        archive_path TEXT NOT NULL,
+                        offset INTEGER NOT NULL,
+                        length INTEGER NOT NULL,
+                        flight_count INTEGER NOT NULL
+                    )
+                ''')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_flight_snapshots_time '
+                               'ON flight_snapshots(timestamp)')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS heatmap_meta (
+                        key TEXT PRIMARY KEY,
+                        value INTEGER NOT NULL
+                    )
+                ''')
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error initializing heatmap database: {e}")
+            raise
+
+    def get_generation(self) -> Optional[int]:
+        """
+        Get the frame generation, which is bumped whenever stored frames are rewritten.
+
+        Returns:
+            int or None: The generation (0 if no frame was ever rewritten), or None on error
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT value FROM heatmap_meta WHERE key = 'generation'")
+                row = cursor.fetchone()
+                return row['value'] if row else 0
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving frame generation: {e}")
+            return None
+
+    def log_heatmap(self, file_path: str, timestamp: int, heatmap_type: str) -> Optional[int]:
+        """
+        Record a rendered PNG frame.
+
+        Args:
+            file_path (str): Path to the PNG
+            timestamp (int): Frame time as a UNIX timestamp
+            heatmap_type (str): Heatmap type ('rolling', 'reset_30min', 'reset_hour')
+
+        Returns:
+            int or None: Row ID of the log entry
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('INSERT INTO heatmap_logs (file_path, timestamp, heatmap_type) VALUES (?, ?, ?)',
+                               (file_path, timestamp, heatmap_type))
+                conn.commit()
+                return cursor.lastrowid
+        except sqlite3.Error as e:
+            logger.error(f"Error logging heatmap {file_path}: {e}")
+            return None
+
+    def log_grid(self, grid_path: str, timestamp: int, heatmap_type: str, resolution: int,
+                 nnz: int, max_value: float, size_bytes: int) -> Optional[int]:
+        """
+        Record a compressed grid frame.
+
+        Args:
+            grid_path (str): Path to the npz file
+            timestamp (int): Frame time as a UNIX timestamp
+            heatmap_type (str): Heatmap type
+            resolution (int): Grid resolution (cells per side)
+            nnz (int): Number of occupied cells
+            max_value (float): Largest cell count
+            size_bytes (int): Size of the npz file
+
+        Returns:
+            int or None: Row ID of the grid entry
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO heatmap_grids
+                    (grid_path, timestamp, heatmap_type, resolution, nnz, max_value, size_bytes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (grid_path, timestamp, heatmap_type, resolution, nnz, max_value, size_bytes))
+                conn.commit()
+                return cursor.lastrowid
+        except sqlite3.Error as e:
+            logger.error(f"Error logging grid {grid_path}: {e}")
+            return None
+
+    def get_grid(self, heatmap_type: str, timestamp: int) -> Optional[Dict]:
+        """
+        Look up the grid saved for a frame.
+
+        Args:
+            heatmap_type (str): Heatmap type
+            timestamp (int): Frame time as a UNIX timestamp
+
+        Returns:
+            dict or None: Grid record, or None if not found
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM heatmap_grids WHERE heatmap_type = ? AND timestamp = ?',
+                               (heatmap_type, timestamp))
+                row = cursor.fetchone()
+                return dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving grid {heatmap_type}@{timestamp}: {e}")
+            return None
+
+    def get_grids(self, heatmap_type: str, start: int, end: int) -> List[Dict]:
+        """
+        Retrieve grid records for a type within a time range, oldest first.
+
+        Args:
+            heatmap_type (str): Heatmap type
+            start (int): Range start (inclusive) as a UNIX timestamp
+            end (int): Range end (inclusive) as a UNIX timestamp
+
+        Returns:
+            list: List of grid record dictionaries
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT * FROM heatmap_grids
+                    WHERE heatmap_type = ? AND timestamp BETWEEN ? AND ?
+                    ORDER BY timestamp
+                ''', (heatmap_type, start, end))
+                return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving grids for {heatmap_type}: {e}")
+            return []
+
+    def get_frames(self, heatmap_type: str, start: int, end: int) -> List[Dict]:
+        """
+        Retrieve every frame of a type within a time range, oldest first.
+
+        A frame may have a loose PNG, a loose grid, and/or entries in an hourly
+        archive; the indexes are merged on timestamp so every stored frame is
+        listed exactly once.
+
+        Args:
+            heatmap_type (str): Heatmap type
+            start (int): Range start (inclusive) as a UNIX timestamp
+            end (int): Range end (inclusive) as a UNIX timestamp
+
+        Returns:
+            list: Dictionaries with heatmap_type, timestamp, log_id, file_path,
+                grid_id, grid_path, png_archive_id and grid_archive_id
+        """
+        return self._query_frames('heatmap_type = ? AND timestamp BETWEEN ? AND ?',
+                                  (heatmap_type, start, end))
+
+    def get_frames_before(self, cutoff: int) -> List[Dict]:
+        """
+        Retrieve every frame of every type older than a cutoff.
+
+        Args:
+            cutoff (int): Exclusive upper bound as a UNIX timestamp
+
+        Returns:
+            list: Frame dictionaries (see get_frames), ordered by type and time
+        """
+        return self._query_frames('timestamp < ?', (cutoff,))
+
+    def _query_frames(self, where: str, params: tuple) -> List[Dict]:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT heatmap_type, timestamp,
+                           MAX(log_id) AS log_id, MAX(file_path) AS file_path,
+                           MAX(grid_id) AS grid_id, MAX(grid_path) AS grid_path,
+                           MAX(png_archive_id) AS png_archive_id, MAX(grid_archive_id) AS grid_archive_id
+                    FROM (
+                        SELECT heatmap_type, CAST(timestamp AS INTEGER) AS timestamp,
+                               id AS log_id, file_path, NULL AS grid_id, NULL AS grid_path,
+                               NULL AS png_archive_id, NULL AS grid_archive_id
+                        FROM heatmap_logs WHERE {where}
+                        UNION ALL
+                        SELECT heatmap_type, timestamp, NULL, NULL, id, grid_path, NULL, NULL
+                        FROM heatmap_grids WHERE {where}
+                        UNION ALL
+                        SELECT heatmap_type, timestamp, NULL, NULL, NULL, NULL,
+                               CASE kind WHEN 'png' THEN id END, CASE kind WHEN 'grid' THEN id END
+                        FROM heatmap_archive WHERE {where}
+                    )
+                    GROUP BY heatmap_type, timestamp
+                    ORDER BY heatmap_type, timestamp
+                ''', params * 3)
+                return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving frames: {e}")
+            return []
+
+    def get_archive_entry(self, entry_id: int) -> Optional[Dict]:
+        """
+        Look up where an archived PNG or grid lives.
+
+        Args:
+            entry_id (int): heatmap_archive row ID
+
+        Returns:
+            dict or None: Entry with archive_path, offset and length
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM heatmap_archive WHERE id = ?', (entry_id,))
+                row = cursor.fetchone()
+                return dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving archive entry {entry_id}: {e}")
+            return None
+
+    def get_archive_entries(self, archive_path: str) -> List[Dict]:
+        """
+        Get the live entries packed into one archive file.
+
+        Args:
+            archive_path (str): Archive file path
+
+        Returns:
+            list: Entries ordered by offset
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM heatmap_archive WHERE archive_path = ? ORDER BY offset',
+                               (archive_path,))
+                return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving entries of {archive_path}: {e}")
+            return []
+
+    def get_archive_usage(self) -> Optional[Dict[str, int]]:
+        """
+        Get how many bytes of each archive file are still referenced by the index.
+
+        Returns:
+            dict or None: Archive path to live bytes, or None if the index couldn't be read
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT archive_path, SUM(length) AS live_bytes FROM heatmap_archive '
+                               'GROUP BY archive_path')
+                return {row['archive_path']: row['live_bytes'] for row in cursor.fetchall()}
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving archive usage: {e}")
+            return None
+
+    def replace_archive(self, old_archive_paths: List[str], archive_path: str, entries: List[Dict],
+                        log_ids: List[int], grid_ids: List[int]) -> bool:
+        """
+        Swap the index for one archived hour in a single transaction.
+
+        All entries pointing at old_archive_paths are replaced by entries in
+        archive_path, and the loose heatmap_logs / heatmap_grids rows that were
+        packed into it are removed.
+
+        Args:
+            old_archive_paths (list): Archive files being superseded
+            archive_path (str): Path to the new hourly archive
+            entries (list): Dictionaries with heatmap_type, timestamp, kind, offset and length
+            log_ids (list): heatmap_logs row IDs to delete
+            grid_ids (list): heatmap_grids row IDs to delete
+
+        Returns:
+            bool: True if the index was updated
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany('DELETE FROM heatmap_archive WHERE archive_path = ?',
+                                   [(path,) for path in old_archive_paths])
+                cursor.executemany('''
+                    INSERT INTO heatmap_archive (heatmap_type, timestamp, kind, archive_path, offset, length)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [(e['heatmap_type'], e['timestamp'], e['kind'], archive_path, e['offset'], e['length'])
+                      for e in entries])
+                cursor.executemany('DELETE FROM heatmap_logs WHERE id = ?', [(i,) for i in log_ids])
+                cursor.executemany('DELETE FROM heatmap_grids WHERE id = ?', [(i,) for i in grid_ids])
+                conn.commit()
+                return True
+        except sqlite3.Error as e:
+            logger.error(f"Error replacing archive index for {archive_path}: {e}")
+            return False
+
+    def delete_frame_rows(self, log_ids: List[int], grid_ids: List[int]) -> None:
+        """
+        Delete loose frame rows (used when a frame is dropped by a retention tier).
+
+        Args:
+            log_ids (list): heatmap_logs row IDs to delete
+            grid_ids (list): heatmap_grids row IDs to delete
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany('DELETE FROM heatmap_logs WHERE id = ?', [(i,) for i in log_ids])
+                cursor.executemany('DELETE FROM heatmap_grids WHERE id = ?', [(i,) for i in grid_ids])
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting frame rows: {e}")
+
+    def delete_frame(self, heatmap_type: str, timestamp: int) -> List[str]:
+        """
+        Remove every index row of one frame (loose and archived), so it can be rewritten.
+
+        Archived bytes stay in their hourly file until compact_frames repacks
+        or deletes files that are no longer fully referenced. If the frame
+        existed, the frame generation is bumped in the same transaction, so
+        servers drop what they cached from the old frame (see
+        FrameCatalog.generation).
+
+        Args:
+            heatmap_type (str): Heatmap type
+            timestamp (int): Frame time as a UNIX timestamp
+
+        Returns:
+            list: Paths of loose files that belonged to the frame
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT file_path FROM heatmap_logs WHERE heatmap_type = ? AND timestamp = ?',
+                               (heatmap_type, timestamp))
+                paths = [row['file_path'] for row in cursor.fetchall()]
+                cursor.execute('SELECT grid_path FROM heatmap_grids WHERE heatmap_type = ? AND timestamp = ?',
+                               (heatmap_type, timestamp))
+                paths += [row['grid_path'] for row in cursor.fetchall()]
+                deleted = 0
+                for table in ('heatmap_logs', 'heatmap_grids', 'heatmap_archive'):
+                    cursor.execute(f'DELETE FROM {table} WHERE heatmap_type = ? AND timestamp = ?',
+                                   (heatmap_type, timestamp))
+                    deleted += cursor.rowcount
+                if deleted:
+                    cursor.execute('''
+                        INSERT INTO heatmap_meta (key, value) VALUES ('generation', 1)
+                        ON CONFLICT(key) DO UPDATE SET value = value + 1
+                    ''')
+                conn.commit()
+                return paths
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting frame {heatmap_type}@{timestamp}: {e}")
+            return []
+
+    def log_snapshot(self, timestamp: int, archive_path: str, offset: int, length: int,
+                     flight_count: int) -> Optional[int]:
+        """
+        Record where a raw flight poll was appended.
+
+        Args:
+            timestamp (int): Poll time as a UNIX timestamp
+            archive_path (str): Hourly snapshot file
+            offset (int): Byte offset of the snapshot
+            length (int): Snapshot length in bytes
+            flight_count (int): Number of flights in the poll
+
+        Returns:
+            int or None: Row ID of the snapshot entry
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO flight_snapshots (timestamp, archive_path, offset, length, flight_count)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (timestamp, archive_path, offset, length, flight_count))
+                conn.commit()
+                return cursor.lastrowid
+        except sqlite3.Error as e:
+            logger.error(f"Error logging snapshot {timestamp}: {e}")
+            return None
+
+    def get_snapshots(self, start: int, end: int) -> List[Dict]:
+        """
+        Retrieve snapshot entries within a time range, oldest first.
+
+        Args:
+            start (int): Range start (inclusive) as a UNIX timestamp
+            end (int): Range end (exclusive) as a UNIX timestamp
+
+        Returns:
+            list: List of snapshot entry dictionaries
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM flight_snapshots WHERE timestamp >= ? AND timestamp < ? '
+                               'ORDER BY timestamp', (start, end))
+                return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving snapshots: {e}")
+            return []
+
+    def get_snapshot_before(self, timestamp: int) -> Optional[Dict]:
+        """
+        Get the latest snapshot entry strictly before a time.
+
+        Args:
+            timestamp (int): UNIX timestamp
+
+        Returns:
+            dict or None: Snapshot entry, or None if there is none
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM flight_snapshots WHERE timestamp < ? '
+                               'ORDER BY timestamp DESC LIMIT 1', (timestamp,))
+                row = cursor.fetchone()
+                return dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving snapshot before {timestamp}: {e}")
+            return None
+
+    def delete_snapshots_before(self, timestamp: int) -> List[str]:
+        """
+        Drop snapshot entries older than a time.
+
+        Args:
+            timestamp (int): Exclusive cutoff as a UNIX timestamp
+
+        Returns:
+            list: Snapshot files that no longer hold any indexed snapshot
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT DISTINCT archive_path FROM flight_snapshots WHERE timestamp < ?', (timestamp,))
+                paths = [row['archive_path'] for row in cursor.fetchall()]
+                cursor.execute('DELETE FROM flight_snapshots WHERE timestamp < ?', (timestamp,))
+                cursor.execute('SELECT DISTINCT archive_path FROM flight_snapshots')
+                still_used = {row['archive_path'] for row in cursor.fetchall()}
+                conn.commit()
+                return [path for path in paths if path not in still_used]
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting snapshots: {e}")
+            return []
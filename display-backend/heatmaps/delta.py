@@ -0,0 +1,117 @@
+import struct
+import logging
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from .sparse import SparseGrid
+from .grid_store import UINT16_MAX
+
+logger = logging.getLogger(__name__)
+
+# Stream layout (all little-endian):
+#   header    magic "HMDS", uint8 version, uint8 reserved, uint16 rows, uint16 cols, uint32 frame_count,
+#             uint16 padding (16 bytes in all)
+#   keyframe  uint32 timestamp, rows * cols uint16 cell values (row-major)
+#   delta     uint32 timestamp, uint32 count, count uint32 cell indices, count uint16 new values
+# Every array starts at an absolute offset that is a multiple of 4 (zero padding follows the
+# uint16 arrays), so the client can view each one in place as a typed array.
+DELTA_MAGIC = b'HMDS'
+DELTA_VERSION = 2
+_ALIGNMENT = 4
+_HEADER = struct.Struct('<4sBBHHIH')
+_KEYFRAME = struct.Struct('<I')
+_DELTA = struct.Struct('<II')
+
+
+def _padding(offset: int) -> int:
+    return -offset % _ALIGNMENT
+
+
+def _as_uint16(grid: Union[np.ndarray, SparseGrid]) -> np.ndarray:
+    if isinstance(grid, SparseGrid):
+        grid = grid.to_dense()
+    # Counts saturate instead of wrapping; the colormap is capped far below this anyway
+    return np.clip(np.rint(grid), 0, UINT16_MAX).astype('<u2').ravel()
+
+
+def encode_delta_stream(frames: List[Tuple[int, Union[np.ndarray, SparseGrid]]]) -> bytes:
+    """
+    Encode a frame sequence as one uint16 keyframe followed by sparse deltas.
+
+    Consecutive heatmap frames differ in a small fraction of cells, so each
+    frame after the first only carries the indices and new values of the
+    cells that changed.
+
+    Args:
+        frames (list): (timestamp, grid) pairs, oldest first, all the same shape
+
+    Returns:
+        bytes: The encoded stream
+    """
+    if not frames:
+        return _HEADER.pack(DELTA_MAGIC, DELTA_VERSION, 0, 0, 0, 0, 0)
+
+    rows, cols = frames[0][1].shape
+    chunks = [_HEADER.pack(DELTA_MAGIC, DELTA_VERSION, 0, rows, cols, len(frames), 0)]
+    offset = _HEADER.size
+
+    def append(chunk: bytes):
+        nonlocal offset
+        chunks.append(chunk)
+        offset += len(chunk)
+
+    timestamp, grid = frames[0]
+    previous = _as_uint16(grid)
+    append(_KEYFRAME.pack(int(timestamp)))
+    append(previous.tobytes())
+    append(b'\0' * _padding(offset))
+
+    for timestamp, grid in frames[1:]:
+        if grid.shape != (rows, cols):
+            raise ValueError(f"Frame {timestamp} has shape {grid.shape}, expected {(rows, cols)}")
+        current = _as_uint16(grid)
+        changed = np.flatnonzero(current != previous).astype('<u4')
+        append(_DELTA.pack(int(timestamp), changed.size))
+        append(changed.tobytes())
+        append(current[changed].tobytes())
+        append(b'\0' * _padding(offset))
+        previous = current
+    return b''.join(chunks)
+
+
+def decode_delta_stream(data: bytes) -> List[Tuple[int, np.ndarray]]:
+    """
+    Decode a stream produced by encode_delta_stream back into full frames.
+
+    Args:
+        data (bytes): The encoded stream
+
+    Returns:
+        list: (timestamp, uint16 grid) pairs, oldest first
+    """
+    magic, version, _, rows, cols, frame_count, _ = _HEADER.unpack_from(data, 0)
+    if magic != DELTA_MAGIC or version != DELTA_VERSION:
+        raise ValueError("Not a heatmap delta stream")
+    if frame_count == 0:
+        return []
+
+    offset = _HEADER.size
+    (timestamp,) = _KEYFRAME.unpack_from(data, offset)
+    offset += _KEYFRAME.size
+    grid = np.frombuffer(data, dtype='<u2', count=rows * cols, offset=offset).copy()
+    offset += grid.nbytes
+    offset += _padding(offset)
+    frames = [(timestamp, grid.reshape(rows, cols).copy())]
+
+    for _ in range(frame_count - 1):
+        timestamp, count = _DELTA.unpack_from(data, offset)
+        offset += _DELTA.size
+        indices = np.frombuffer(data, dtype='<u4', count=count, offset=offset)
+        offset += count * 4
+        values = np.frombuffer(data, dtype='<u2', count=count, offset=offset)
+        offset += count * 2
+        offset += _padding(offset)
+        grid[indices] = values
+        frames.append((timestamp, grid.reshape(rows, cols).copy()))
+    return frames
@@ -0,0 +1,316 @@
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .db_handler import HeatmapDBHandler
+from .grid_store import save_grid
+from .sparse import SparseGrid
+from .rasterize import rasterize_segments
+from .cube import FlightCube
+from .render import render_grid_png, US_BOUNDS
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_from_flights(flights: List, timestamp: int) -> Dict:
+    """
+    Convert a FlightRadar24 poll into plain arrays.
+
+    Args:
+        flights (list): Flight objects returned by FlightRadar24API.get_flights
+        timestamp (int): Poll time as a UNIX timestamp
+
+    Returns:
+        dict: Snapshot with timestamp, ids, lats, lons, altitudes (ft),
+            ground_speeds (kt) and airlines (ICAO codes)
+    """
+    flights = flights or []
+    return {
+        'timestamp': int(timestamp),
+        'ids': np.array([str(flight.id) for flight in flights]),
+        'lats': np.fromiter((flight.latitude for flight in flights), dtype=np.float64, count=len(flights)),
+        'lons': np.fromiter((flight.longitude for flight in flights), dtype=np.float64, count=len(flights)),
+        'altitudes': np.fromiter((flight.altitude for flight in flights), dtype=np.float64, count=len(flights)),
+        'ground_speeds': np.fromiter((flight.ground_speed for flight in flights), dtype=np.float64,
+                                     count=len(flights)),
+        'airlines': np.array([str(flight.airline_icao) for flight in flights]),
+    }
+
+
+class HeatmapEngine:
+    """
+    Flight density accumulator behind the heatmaps.
+
+    Keeps a rolling (never reset) grid plus grids reset every 30 minutes and
+    every hour, bins poll snapshots into them, and writes frames out as
+    compressed grids and optional PNGs.
+
+    In sparse mode the grids are SparseGrids, so resolutions of 2000x2000 and
+    beyond cost memory and per-poll time proportional to the occupied cells.
+
+    In 'segments' ingest mode each aircraft's previous position is remembered
+    and the path between consecutive polls is rasterized into the grids, so
+    density follows route corridors instead of depending on the poll interval.
+
+    With a cube_resolution, every poll is also binned once into a FlightCube
+    (lat x lon x altitude band x speed band x airline) that resets with the
+    hourly grid and is saved with each frame as heatmap type 'cube'.
+    """
+
+    def __init__(self, db_path: str = "heatmaps.db", output_folder: str = "flight_heatmaps",
+                 grid_resolution: int = 200, bounds: tuple = US_BOUNDS, render_pngs: bool = True,
+                 cmap_max: float = 10, sparse: bool = False, ingest_mode: str = 'points',
+                 max_segment_seconds: float = 600, max_segment_cells: int = None,
+                 cube_resolution: int = None, aligned_resets: bool = False,
+                 replace_existing: bool = False):
+        """
+        Initialize the heatmap engine.
+
+        Args:
+            db_path (str): Path to the heatmap SQLite database
+            output_folder (str): Folder for daily frame folders
+            grid_resolution (int): Grid cells per side
+            bounds (tuple): (max_lat, min_lat, min_lon, max_lon) covered by the grids
+            render_pngs (bool): Whether frames are also rendered to PNG when saved
+            cmap_max (float): Count at which the PNG colormap saturates
+            sparse (bool): Accumulate into SparseGrids instead of dense arrays
+            ingest_mode (str): 'points' to count each aircraft's current cell,
+                'segments' to rasterize its path since the previous poll
+            max_segment_seconds (float): Polls further apart than this aren't joined
+            max_segment_cells (int, optional): Longer segments (teleports, reused IDs)
+                fall back to a point (defaults to a quarter of the grid)
+            cube_resolution (int, optional): Lat/lon resolution of the histogram cube
+                (no cube is kept when None)
+            aligned_resets (bool): Reset on clock boundaries (:00 and :30) instead of
+                30/60 minutes after the previous reset, so frames don't depend on start time
+            replace_existing (bool): Drop any frame already indexed at the same time and
+                type before saving, making rewrites of a time range idempotent
+        """
+        if ingest_mode not in ('points', 'segments'):
+            raise ValueError(f"Unknown ingest mode: {ingest_mode}")
+        self.db_handler = HeatmapDBHandler(db_path)
+        self.output_folder = output_folder
+        self.grid_resolution = grid_resolution
+        self.bounds = bounds
+        self.render_pngs = render_pngs
+        self.cmap_max = cmap_max
+        self.sparse = sparse
+        self.ingest_mode = ingest_mode
+        self.max_segment_seconds = max_segment_seconds
+        self.max_segment_cells = max_segment_cells or max(grid_resolution // 4, 1)
+        self._previous: Optional[Dict] = None
+        self.cube = FlightCube(cube_resolution, bounds) if cube_resolution else None
+        self.aligned_resets = aligned_resets
+        self.replace_existing = replace_existing
+        os.makedirs(output_folder, exist_ok=True)
+
+        shape = (grid_resolution, grid_resolution)
+        new_grid = (lambda: SparseGrid(shape)) if sparse else (lambda: np.zeros(shape))
+        self.grids = {
+            'rolling': new_grid(),
+            'reset_30min': new_grid(),
+            'reset_hour': new_grid(),
+        }
+        self.last_30min_reset: Optional[datetime] = None
+        self.last_hour_reset: Optional[datetime] = None
+
+    def get_grid_indices(self, lats: np.ndarray, lons: np.ndarray):
+        """
+        Map coordinates to grid cells, dropping points outside the bounds.
+
+        Args:
+            lats (np.ndarray): Latitudes
+            lons (np.ndarray): Longitudes
+
+        Returns:
+            tuple: (lat_indices, lon_indices) integer arrays
+        """
+        lat_indices, lon_indices, inside = self._cell_coordinates(lats, lons)
+        return lat_indices[inside], lon_indices[inside]
+
+    def _cell_coordinates(self, lats: np.ndarray, lons: np.ndarray):
+        y1, y2, x1, x2 = self.bounds
+        inside = (lats >= y2) & (lats <= y1) & (lons >= x1) & (lons <= x2)
+        lat_indices = ((np.clip(lats, y2, y1) - y2) / (y1 - y2) * (self.grid_resolution - 1)).astype(np.intp)
+        lon_indices = ((np.clip(lons, x1, x2) - x1) / (x2 - x1) * (self.grid_resolution - 1)).astype(np.intp)
+        return lat_indices, lon_indices, inside
+
+    def _apply_resets(self, current_time: datetime):
+        if self.aligned_resets:
+            self._apply_aligned_resets(current_time)
+            return
+
+        if self.last_30min_reset is None:
+            self.last_30min_reset = self.last_hour_reset = current_time
+
+        if current_time - self.last_30min_reset >= timedelta(minutes=30):
+            self.grids['reset_30min'].fill(0)
+            self.last_30min_reset = current_time
+
+        if current_time - self.last_hour_reset >= timedelta(hours=1):
+            self.grids['reset_hour'].fill(0)
+            if self.cube is not None:
+                self.cube.clear()
+            self.last_hour_reset = current_time
+
+    def _apply_aligned_resets(self, current_time: datetime):
+        half_hour = current_time.replace(minute=current_time.minute - current_time.minute % 30,
+                                         second=0, microsecond=0)
+        hour = half_hour.replace(minute=0)
+
+        if self.last_30min_reset is not None and half_hour != self.last_30min_reset:
+            self.grids['reset_30min'].fill(0)
+        if self.last_hour_reset is not None and hour != self.last_hour_reset:
+            self.grids['reset_hour'].fill(0)
+            if self.cube is not None:
+                self.cube.clear()
+        self.last_30min_reset, self.last_hour_reset = half_hour, hour
+
+    def ingest(self, snapshot: Dict) -> int:
+        """
+        Bin one poll snapshot into every grid.
+
+        Args:
+            snapshot (dict): Snapshot from snapshot_from_flights
+
+        Returns:
+            int: Number of flights binned
+        """
+        self._apply_resets(datetime.fromtimestamp(snapshot['timestamp']))
+        if self.cube is not None:
+            self.cube.ingest(snapshot)
+
+        if self.ingest_mode == 'segments':
+            return self._ingest_segments(snapshot)
+
+        lat_indices, lon_indices = self.get_grid_indices(snapshot['lats'], snapshot['lons'])
+        self._add_cells(lat_indices * self.grid_resolution + lon_indices)
+        return len(lat_indices)
+
+    def _ingest_segments(self, snapshot: Dict) -> int:
+        lat_indices, lon_indices, inside = self._cell_coordinates(snapshot['lats'], snapshot['lons'])
+        ids, lat_indices, lon_indices = snapshot['ids'][inside], lat_indices[inside], lon_indices[inside]
+
+        # Aircraft seen in the previous poll get their path rasterized, the rest count as points
+        joined = np.zeros(ids.size, dtype=bool)
+        cell_keys = []
+        previous = self._previous
+        if previous is not None and snapshot['timestamp'] - previous['timestamp'] <= self.max_segment_seconds:
+            # A poll can list an aircraft twice; each id is joined once (at its first position)
+            _, current_idx, previous_idx = np.intersect1d(ids, previous['ids'], return_indices=True)
+            rows0, cols0 = previous['rows'][previous_idx], previous['cols'][previous_idx]
+            rows1, cols1 = lat_indices[current_idx], lon_indices[current_idx]
+            short = np.maximum(np.abs(rows1 - rows0), np.abs(cols1 - cols0)) <= self.max_segment_cells
+            rows, cols, _ = rasterize_segments(rows0[short], cols0[short], rows1[short], cols1[short])
+            cell_keys.append(rows * self.grid_resolution + cols)
+            joined[current_idx[short]] = True
+
+        cell_keys.append(lat_indices[~joined] * self.grid_resolution + lon_indices[~joined])
+        self._add_cells(np.concatenate(cell_keys).astype(np.intp))
+
+        unique_ids, first = np.unique(ids, return_index=True)
+        self._previous = {
+            'timestamp': snapshot['timestamp'],
+            'ids': unique_ids,
+            'rows': lat_indices[first],
+            'cols': lon_indices[first],
+        }
+        return ids.size
+
+    def seed_previous(self, snapshot: Dict):
+        """
+        Remember a poll's positions without counting it, so the next poll's
+        segments join up with it (used when replaying from the middle of a day).
+
+        Args:
+            snapshot (dict): Snapshot from snapshot_from_flights
+        """
+        lat_indices, lon_indices, inside = self._cell_coordinates(snapshot['lats'], snapshot['lons'])
+        unique_ids, first = np.unique(snapshot['ids'][inside], return_index=True)
+        self._previous = {
+            'timestamp': snapshot['timestamp'],
+            'ids': unique_ids,
+            'rows': lat_indices[inside][first],
+            'cols': lon_indices[inside][first],
+        }
+
+    def _add_cells(self, cell_keys: np.ndarray):
+        if self.sparse:
+            keys, inverse = np.unique(cell_keys, return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(keys)).astype(np.float64)
+            for grid in self.grids.values():
+                grid.add(keys, counts)
+        else:
+            counts = np.bincount(cell_keys, minlength=self.grid_resolution * self.grid_resolution)
+            counts = counts.reshape(self.grid_resolution, self.grid_resolution)
+            for grid in self.grids.values():
+                grid += counts
+
+    def copy_grids(self) -> Dict[str, np.ndarray]:
+        """
+        Copy the current grids so they can be saved while accumulation continues.
+
+        Returns:
+            dict: Heatmap type to grid copy (dense or SparseGrid)
+        """
+        return {heatmap_type: grid.copy() for heatmap_type, grid in self.grids.items()}
+
+    def _replace_frame(self, timestamp: int, heatmap_type: str, keep_path: str):
+        for path in self.db_handler.delete_frame(heatmap_type, timestamp):
+            if path != keep_path and os.path.exists(path):
+                os.remove(path)
+
+    def _daily_folder(self, timestamp: int) -> str:
+        daily_folder = os.path.join(self.output_folder, datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d'))
+        os.makedirs(daily_folder, exist_ok=True)
+        return daily_folder
+
+    def save_grids(self, timestamp: int, grids: Dict[str, np.ndarray]):
+        """
+        Write and index the compressed grid of every heatmap type for a frame.
+
+        Args:
+            timestamp (int): Frame time as a UNIX timestamp
+            grids (dict): Heatmap type to grid
+        """
+        daily_folder = self._daily_folder(timestamp)
+        for heatmap_type, grid in grids.items():
+            grid_path = os.path.join(daily_folder, f"grid_{heatmap_type}_{timestamp}.npz")
+            if self.replace_existing:
+                self._replace_frame(timestamp, heatmap_type, grid_path)
+            size_bytes = save_grid(grid_path, grid)
+            # Index the grid so the frame can be re-rendered later at any colormap or cap
+            nnz = grid.nnz if isinstance(grid, SparseGrid) else int(np.count_nonzero(grid))
+            self.db_handler.log_grid(grid_path, timestamp, heatmap_type, self.grid_resolution,
+                                     nnz, float(grid.max()), size_bytes)
+
+        if self.cube is not None:
+            cube_frame = self.cube.frame()
+            cube_path = os.path.join(daily_folder, f"cube_{timestamp}.npz")
+            if self.replace_existing:
+                self._replace_frame(timestamp, 'cube', cube_path)
+            data = cube_frame.to_bytes()
+            with open(cube_path, 'wb') as f:
+                f.write(data)
+            self.db_handler.log_grid(cube_path, timestamp, 'cube', self.cube.resolution, int(cube_frame.keys.size),
+                                     float(cube_frame.values.max()) if cube_frame.values.size else 0.0, len(data))
+
+    def save_pngs(self, timestamp: int, grids: Dict[str, np.ndarray]):
+        """
+        Render and index the PNG of every heatmap type for a frame.
+
+        Args:
+            timestamp (int): Frame time as a UNIX timestamp
+            grids (dict): Heatmap type to grid
+        """
+        daily_folder = self._daily_folder(timestamp)
+        for heatmap_type, grid in grids.items():
+            file_path = os.path.join(daily_folder, f"heatmap_{heatmap_type}_{timestamp}.png")
+            if isinstance(grid, SparseGrid):
+                grid = grid.to_dense(dtype=np.float32)
+            with open(file_path, 'wb') as f:
+                f.write(render_grid_png(grid, cmap_max=self.cmap_max, bounds=self.bounds))
+            self.db_handler.log_heatmap(file_path, timestamp, heatmap_type)
@@ -0,0 +1,110 @@
+import io
+import os
+import logging
+from typing import Union
+
+import numpy as np
+
+from .sparse import SparseGrid
+
+logger = logging.getLogger(__name__)
+
+# Flight counts per cell comfortably fit in 16 bits; anything larger (or
+# fractional) falls back to float32 values.
+UINT16_MAX = np.iinfo(np.uint16).max
+
+
+def encode_grid(grid: Union[np.ndarray, SparseGrid]) -> bytes:
+    """
+    Encode a 2D heatmap grid as a compressed sparse COO npz payload.
+
+    Only occupied cells are stored, as (row, col, value) triplets, so the size
+    of a frame depends on how many cells have traffic rather than on the grid
+    resolution.
+
+    Args:
+        grid (np.ndarray or SparseGrid): 2D grid of per-cell counts
+
+    Returns:
+        bytes: Compressed npz payload
+    """
+    if isinstance(grid, SparseGrid):
+        rows, cols, values = grid.to_coo()
+        occupied = values != 0
+        rows, cols, values = rows[occupied], cols[occupied], values[occupied]
+    else:
+        grid = np.asarray(grid)
+        rows, cols = np.nonzero(grid)
+        values = grid[rows, cols]
+
+    index_dtype = np.uint16 if max(grid.shape) <= UINT16_MAX + 1 else np.uint32
+    if values.size == 0 or (np.all(values == np.round(values)) and values.min() >= 0
+                            and values.max() <= UINT16_MAX):
+        values = values.astype(np.uint16)
+    else:
+        values = values.astype(np.float32)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        shape=np.asarray(grid.shape, dtype=np.uint32),
+        rows=rows.astype(index_dtype),
+        cols=cols.astype(index_dtype),
+        values=values,
+    )
+    return buffer.getvalue()
+
+
+def decode_grid(data: Union[bytes, memoryview], sparse: bool = False) -> Union[np.ndarray, SparseGrid]:
+    """
+    Decode a payload produced by encode_grid.
+
+    Args:
+        data (bytes): Compressed npz payload
+        sparse (bool): Return a SparseGrid instead of a dense array, which
+            avoids allocating the full grid area for high-resolution frames
+
+    Returns:
+        np.ndarray or SparseGrid: Dense float64 grid, or the sparse grid
+    """
+    with np.load(io.BytesIO(bytes(data))) as payload:
+        shape = tuple(int(n) for n in payload['shape'])
+        if sparse:
+            return SparseGrid.from_coo(shape, payload['rows'], payload['cols'], payload['values'])
+        grid = np.zeros(shape, dtype=np.float64)
+        grid[payload['rows'], payload['cols']] = payload['values']
+    return grid
+
+
+def save_grid(file_path: str, grid: Union[np.ndarray, SparseGrid]) -> int:
+    """
+    Write a grid to disk in the compressed sparse format.
+
+    Args:
+        file_path (str): Destination path (conventionally ending in .npz)
+        grid (np.ndarray or SparseGrid): 2D grid of per-cell counts
+
+    Returns:
+        int: Number of bytes written
+    """
+    data = encode_grid(grid)
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    with open(file_path, 'wb') as f:
+        f.write(data)
+    logger.debug(f"Saved grid {file_path} ({len(data)} bytes)")
+    return len(data)
+
+
+def load_grid(file_path: str, sparse: bool = False) -> Union[np.ndarray, SparseGrid]:
+    """
+    Load a grid written by save_grid.
+
+    Args:
+        file_path (str): Path to the npz file
+        sparse (bool): Return a SparseGrid instead of a dense array
+
+    Returns:
+        np.ndarray or SparseGrid: The grid
+    """
+    with open(file_path, 'rb') as f:
+        return decode_grid(f.read(), sparse=sparse)
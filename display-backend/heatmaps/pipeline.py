@@ -0,0 +1,180 @@
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .engine import HeatmapEngine, snapshot_from_flights
+from .compaction import compact_frames
+from .snapshots import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+
+class HeatmapPipeline:
+    """
+    Producer/consumer pipeline around a HeatmapEngine.
+
+    - The poller fetches flights on a fixed-rate schedule (tick N fires at
+      start + N * interval regardless of how long anything else takes) and
+      queues the snapshot, stamped with its scheduled tick time.
+    - The accumulator records the raw snapshot (when a SnapshotStore is
+      given, so frames can be replayed later), bins it and saves the frame's
+      grids, which is cheap, so no poll is ever lost.
+    - The renderer turns frames into PNGs. Its queue holds a single job: if
+      rendering falls behind, the stale job is dropped in favour of the newest
+      frame (its grid is already saved, so it can still be rendered on demand).
+    """
+
+    def __init__(self, engine: HeatmapEngine, fetch_flights: Callable[[], List], interval_seconds: float = 120,
+                 compaction_interval_seconds: float = 3600, archive_folder: Optional[str] = None,
+                 on_frame: Optional[Callable[[int, Dict[str, np.ndarray]], None]] = None,
+                 snapshot_store: Optional[SnapshotStore] = None, snapshot_retention_days: float = 14):
+        """
+        Initialize the pipeline.
+
+        Args:
+            engine (HeatmapEngine): Engine holding the grids
+            fetch_flights (callable): Returns the current list of flights
+            interval_seconds (float): Poll period
+            compaction_interval_seconds (float): How often old frames are compacted
+            archive_folder (str, optional): Archive folder (defaults to <output_folder>/archive)
+            on_frame (callable, optional): Called with (timestamp, grids) after every accumulated frame
+            snapshot_store (SnapshotStore, optional): Where raw polls are recorded for replay
+            snapshot_retention_days (float): How long recorded polls are kept
+        """
+        self.engine = engine
+        self.fetch_flights = fetch_flights
+        self.interval_seconds = interval_seconds
+        self.compaction_interval_seconds = compaction_interval_seconds
+        self.archive_folder = archive_folder or f"{engine.output_folder}/archive"
+        self.on_frame = on_frame
+        self.snapshot_store = snapshot_store
+        self.snapshot_retention_days = snapshot_retention_days
+
+        self.poll_queue: "queue.Queue" = queue.Queue()
+        self.render_queue: "queue.Queue" = queue.Queue(maxsize=1)
+        self.stop_event = threading.Event()
+        self.threads: List[threading.Thread] = []
+        self.dropped_render_jobs = 0
+        self._last_compaction = 0.0
+
+    def start(self):
+        """
+        Start the poller, accumulator and renderer threads.
+        """
+        for target, name in ((self._poll_loop, 'heatmap-poller'),
+                             (self._accumulate_loop, 'heatmap-accumulator'),
+                             (self._render_loop, 'heatmap-renderer')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """
+        Ask every thread to finish its current step and exit.
+        """
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+
+    def run_forever(self):
+        """
+        Start the pipeline and block until interrupted.
+        """
+        self.start()
+        try:
+            while not self.stop_event.wait(1):
+                pass
+        except KeyboardInterrupt:
+            self.stop()
+
+    def _poll_loop(self):
+        next_tick = time.time()
+        while not self.stop_event.is_set():
+            tick = next_tick
+            try:
+                self.poll_queue.put(snapshot_from_flights(self.fetch_flights(), int(tick)))
+            except Exception as e:
+                logger.error(f"Error polling flights: {e}")
+
+            next_tick += self.interval_seconds
+            now = time.time()
+            if next_tick <= now:
+                # A fetch overran whole periods; skip the missed ticks rather than bursting
+                missed = int((now - next_tick) // self.interval_seconds) + 1
+                logger.warning(f"Flight poll overran, skipping {missed} tick(s)")
+                next_tick += missed * self.interval_seconds
+            self.stop_event.wait(next_tick - time.time())
+
+    def _accumulate_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                snapshot = self.poll_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if self.snapshot_store is not None:
+                try:
+                    self.snapshot_store.record(snapshot)
+                except Exception as e:
+                    logger.error(f"Error recording snapshot {snapshot['timestamp']}: {e}")
+
+            try:
+                binned = self.engine.ingest(snapshot)
+                grids = self.engine.copy_grids()
+                if self.on_frame:
+                    self.on_frame(snapshot['timestamp'], grids)
+                self.engine.save_grids(snapshot['timestamp'], grids)
+                logger.info(f"Accumulated {binned} flights for frame {snapshot['timestamp']}")
+            except Exception as e:
+                logger.error(f"Error accumulating frame {snapshot['timestamp']}: {e}")
+                continue
+
+            if self.engine.render_pngs:
+                self._submit_render((snapshot['timestamp'], grids))
+
+    def _submit_render(self, job):
+        while True:
+            try:
+                self.render_queue.put_nowait(job)
+                return
+            except queue.Full:
+                try:
+                    stale = self.render_queue.get_nowait()
+                    self.dropped_render_jobs += 1
+                    logger.warning(f"Renderer behind, dropped stale render job for frame {stale[0]}")
+                except queue.Empty:
+                    pass
+
+    def _render_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                timestamp, grids = self.render_queue.get(timeout=1)
+            except queue.Empty:
+                self._maybe_compact()
+                continue
+
+            try:
+                self.engine.save_pngs(timestamp, grids)
+                logger.info(f"Rendered heatmaps for frame {timestamp}")
+            except Exception as e:
+                logger.error(f"Error rendering frame {timestamp}: {e}")
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if time.time() - self._last_compaction < self.compaction_interval_seconds:
+            return
+        self._last_compaction = time.time()
+        try:
+            compact_frames(self.engine.db_handler.db_path, archive_folder=self.archive_folder)
+        except Exception as e:
+            logger.error(f"Error compacting heatmap frames: {e}")
+
+        if self.snapshot_store is not None:
+            try:
+                self.snapshot_store.prune(self.snapshot_retention_days)
+            except Exception as e:
+                logger.error(f"Error pruning flight snapshots: {e}")
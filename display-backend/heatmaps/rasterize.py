@@ -0,0 +1,40 @@
+from typing import Tuple
+
+import numpy as np
+
+
+def rasterize_segments(rows0: np.ndarray, cols0: np.ndarray, rows1: np.ndarray,
+                       cols1: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Rasterize many grid segments at once with a vectorized DDA.
+
+    Segment i runs from cell (rows0[i], cols0[i]) to (rows1[i], cols1[i]) and
+    is sampled once per step along its major axis. The start cell is left out
+    (it was already counted as the previous segment's end) and the end cell is
+    included, so chained segments count every cell once. A segment whose ends
+    share a cell yields just that cell.
+
+    Args:
+        rows0 (np.ndarray): Start rows
+        cols0 (np.ndarray): Start columns
+        rows1 (np.ndarray): End rows
+        cols1 (np.ndarray): End columns
+
+    Returns:
+        tuple: (rows, cols, segment_ids) of every rasterized cell
+    """
+    rows0 = np.asarray(rows0, dtype=np.int64)
+    cols0 = np.asarray(cols0, dtype=np.int64)
+    d_rows = np.asarray(rows1, dtype=np.int64) - rows0
+    d_cols = np.asarray(cols1, dtype=np.int64) - cols0
+
+    steps = np.maximum(np.maximum(np.abs(d_rows), np.abs(d_cols)), 1)
+    segment_ids = np.repeat(np.arange(steps.size), steps)
+    # Position of each sample within its segment: 1..steps
+    starts = np.cumsum(steps) - steps
+    positions = np.arange(segment_ids.size) - starts[segment_ids] + 1
+
+    fraction = positions / steps[segment_ids]
+    rows = rows0[segment_ids] + np.rint(d_rows[segment_ids] * fraction).astype(np.int64)
+    cols = cols0[segment_ids] + np.rint(d_cols[segment_ids] * fraction).astype(np.int64)
+    return rows, cols, segment_ids
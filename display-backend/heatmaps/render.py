@@ -0,0 +1,51 @@
+import io
+from typing import Tuple
+
+import numpy as np
+import matplotlib
+import matplotlib.colors as mcolors
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# Geographic boundaries of the United States (max_lat, min_lat, min_lon, max_lon)
+US_BOUNDS = (49, 24, -125, -60)
+
+
+def render_grid_png(grid: np.ndarray, cmap_max: float = 10, cmap_name: str = 'hot',
+                    dpi: int = 300, figsize: Tuple[float, float] = (12, 8),
+                    bounds: Tuple[float, float, float, float] = US_BOUNDS) -> bytes:
+    """
+    Render a heatmap grid to a transparent PNG.
+
+    Uses the object-oriented Figure API rather than pyplot so it is safe to
+    call from Flask request threads as well as from the heatmapper loop.
+
+    Args:
+        grid (np.ndarray): 2D grid of per-cell counts (row 0 is the southern edge)
+        cmap_max (float): Count at which the colormap saturates
+        cmap_name (str): Matplotlib colormap name
+        dpi (int): Output resolution
+        figsize (tuple): Figure size in inches
+        bounds (tuple): (max_lat, min_lat, min_lon, max_lon) of the grid
+
+    Returns:
+        bytes: PNG image data
+    """
+    y1, y2, x1, x2 = bounds
+
+    # Set colormap and normalization to cap maximum intensity
+    cmap = matplotlib.colormaps[cmap_name].copy()
+    cmap.set_under(color='none')
+    norm = mcolors.Normalize(vmin=0.1, vmax=cmap_max)
+
+    fig = Figure(figsize=figsize, facecolor='none')
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_facecolor('none')
+    ax.imshow(grid, cmap=cmap, norm=norm, interpolation='nearest', origin='lower',
+              extent=[x1, x2, y2, y1], aspect='auto')
+    ax.axis('off')
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight', pad_inches=0, dpi=dpi, transparent=True)
+    return buffer.getvalue()
@@ -0,0 +1,194 @@
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .engine import HeatmapEngine
+from .snapshots import SnapshotStore
+from .sparse import SparseGrid
+
+logger = logging.getLogger(__name__)
+
+
+def hour_partitions(start: int, end: int) -> List[Tuple[int, int]]:
+    """
+    Split [start, end) at clock hour boundaries.
+
+    Args:
+        start (int): Range start as a UNIX timestamp
+        end (int): Range end as a UNIX timestamp
+
+    Returns:
+        list: (partition_start, partition_end) pairs in time order
+    """
+    partitions = []
+    boundary = int(datetime.fromtimestamp(start).replace(minute=0, second=0, microsecond=0).timestamp())
+    while boundary < end:
+        next_boundary = boundary + 3600
+        partitions.append((max(boundary, start), min(next_boundary, end)))
+        boundary = next_boundary
+    return partitions
+
+
+def _build_engine(config: Dict, **overrides) -> HeatmapEngine:
+    options = dict(db_path=config['db_path'], output_folder=config['output_folder'],
+                   grid_resolution=config['grid_resolution'], render_pngs=config['render_pngs'],
+                   cmap_max=config['cmap_max'], sparse=config['sparse'], ingest_mode=config['ingest_mode'],
+                   cube_resolution=config['cube_resolution'], aligned_resets=True, replace_existing=True)
+    options.update(overrides)
+    return HeatmapEngine(**options)
+
+
+def _seed(engine: HeatmapEngine, store: SnapshotStore, partition_start: int):
+    # Segments crossing into the partition start from the last poll before it
+    if engine.ingest_mode == 'segments':
+        previous = store.snapshot_before(partition_start)
+        if previous is not None:
+            engine.seed_previous(previous)
+
+
+def _partition_total(config: Dict, partition: Tuple[int, int]):
+    """
+    First pass: the rolling grid increment contributed by one partition.
+    """
+    engine = _build_engine(config, cube_resolution=None)
+    store = SnapshotStore(config['db_path'])
+    _seed(engine, store, partition[0])
+    for snapshot in store.iter_snapshots(*partition):
+        engine.ingest(snapshot)
+    return engine.grids['rolling']
+
+
+def _replay_partition(config: Dict, partition: Tuple[int, int], rolling_offset) -> int:
+    """
+    Second pass: rebuild and write every frame of one partition.
+    """
+    engine = _build_engine(config)
+    store = SnapshotStore(config['db_path'])
+    engine.grids['rolling'] = rolling_offset.copy()
+    _seed(engine, store, partition[0])
+
+    frames = 0
+    for snapshot in store.iter_snapshots(*partition):
+        engine.ingest(snapshot)
+        grids = engine.copy_grids()
+        engine.save_grids(snapshot['timestamp'], grids)
+        if engine.render_pngs:
+            engine.save_pngs(snapshot['timestamp'], grids)
+        frames += 1
+    return frames
+
+
+def _add_grid(total, grid):
+    if isinstance(total, SparseGrid):
+        total.add(grid.keys, grid.values)
+    else:
+        total += grid
+    return total
+
+
+def replay(start: int, end: int, db_path: str = "heatmaps.db", output_folder: str = "flight_heatmaps",
+           workers: int = None, grid_resolution: int = 200, sparse: bool = False, ingest_mode: str = 'points',
+           cube_resolution: int = 100, render_pngs: bool = False, cmap_max: float = 10) -> Dict:
+    """
+    Rebuild heatmap frames for a time range from recorded flight snapshots.
+
+    The range is split into clock hours that are replayed in parallel. Resets
+    are aligned to :00 and :30, so the 30-minute and hourly grids of a
+    partition never depend on earlier partitions. The rolling grid does: a
+    first pass computes each partition's contribution, and the prefix sums
+    seed the rolling grid of the second pass, which writes the frames.
+    Rolling counts start at `start`.
+
+    Rewriting a frame replaces whatever was indexed for it before, so a range
+    can be replayed again (e.g. after changing the resolution or ingest mode).
+    Each replacement bumps the frame generation, which makes running servers
+    drop the frames, tiles and loops they cached from the old data.
+
+    Args:
+        start (int): Range start as a UNIX timestamp
+        end (int): Range end (exclusive) as a UNIX timestamp
+        db_path (str): Path to the heatmap SQLite database
+        output_folder (str): Folder for daily frame folders
+        workers (int, optional): Worker processes (defaults to the CPU count)
+        grid_resolution (int): Grid cells per side
+        sparse (bool): Accumulate into SparseGrids
+        ingest_mode (str): 'points' or 'segments'
+        cube_resolution (int): Lat/lon resolution of the histogram cube (0 for none)
+        render_pngs (bool): Also render PNGs (frames are otherwise rendered on demand)
+        cmap_max (float): Count at which the PNG colormap saturates
+
+    Returns:
+        dict: Statistics about the replay
+    """
+    config = {
+        'db_path': db_path,
+        'output_folder': output_folder,
+        'grid_resolution': grid_resolution,
+        'sparse': sparse,
+        'ingest_mode': ingest_mode,
+        'cube_resolution': cube_resolution or None,
+        'render_pngs': render_pngs,
+        'cmap_max': cmap_max,
+    }
+    partitions = hour_partitions(start, end)
+    stats = {
+        'partitions': len(partitions),
+        'frames': 0,
+        'seconds': 0.0,
+    }
+    if not partitions:
+        return stats
+
+    started = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        totals = list(executor.map(_partition_total, [config] * len(partitions), partitions))
+        logger.info(f"Computed rolling offsets for {len(partitions)} partitions in {time.time() - started:.1f}s")
+
+        shape = (grid_resolution, grid_resolution)
+        offset = SparseGrid(shape) if sparse else np.zeros(shape)
+        futures = {}
+        for partition, total in zip(partitions, totals):
+            futures[executor.submit(_replay_partition, config, partition, offset)] = partition
+            offset = _add_grid(offset.copy(), total)
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            partition = futures[future]
+            try:
+                stats['frames'] += future.result()
+            except Exception as e:
+                logger.error(f"Error replaying {datetime.fromtimestamp(partition[0])}: {e}")
+                continue
+            elapsed = time.time() - started
+            remaining = elapsed / done * (len(partitions) - done)
+            logger.info(f"Replayed {done}/{len(partitions)} hours ({stats['frames']} frames), "
+                        f"{elapsed:.0f}s elapsed, ~{remaining:.0f}s left")
+
+    stats['seconds'] = round(time.time() - started, 2)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Rebuild heatmap frames from recorded flight snapshots')
+    parser.add_argument('--start', required=True, help='Range start, e.g. 2024-05-01T00:00')
+    parser.add_argument('--end', required=True, help='Range end (exclusive)')
+    parser.add_argument('--db-path', default='heatmaps.db', help='Heatmap database path')
+    parser.add_argument('--output-folder', default='flight_heatmaps', help='Folder for frame files')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes')
+    parser.add_argument('--resolution', type=int, default=200, help='Grid cells per side')
+    parser.add_argument('--sparse', action='store_true', help='Use sparse grids')
+    parser.add_argument('--ingest-mode', default='points', choices=('points', 'segments'))
+    parser.add_argument('--cube-resolution', type=int, default=100, help='Cube resolution (0 for none)')
+    parser.add_argument('--render-pngs', action='store_true', help='Also render PNGs')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    print(replay(int(datetime.fromisoformat(args.start).timestamp()), int(datetime.fromisoformat(args.end).timestamp()),
+                 db_path=args.db_path, output_folder=args.output_folder, workers=args.workers,
+                 grid_resolution=args.resolution, sparse=args.sparse, ingest_mode=args.ingest_mode,
+                 cube_resolution=args.cube_resolution, render_pngs=args.render_pngs))
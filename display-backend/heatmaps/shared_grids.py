@@ -0,0 +1,149 @@
+import time
+import logging
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Optional, Sequence, Tuple, Any
+
+import numpy as np
+
+from .sparse import SparseGrid
+
+logger = logging.getLogger(__name__)
+
+# Header slots (int64): sequence number, frame timestamp, grid resolution, grid count
+_HEADER_SLOTS = 4
+_HEADER_BYTES = _HEADER_SLOTS * 8
+
+
+class SharedGrids:
+    """
+    Live heatmap grids published through multiprocessing.shared_memory.
+
+    The heatmap worker process publishes a copy of its grids after every poll;
+    the web process maps the same block and reads the grids in place. Writes
+    are guarded by a sequence lock: the sequence number is odd while a publish
+    is in progress, and a reader retries if it changed while it was reading.
+    """
+
+    def __init__(self, heatmap_types: Sequence[str], grid_resolution: int, name: Optional[str] = None,
+                 create: bool = True):
+        """
+        Create or attach to a shared grid block.
+
+        Args:
+            heatmap_types (sequence): Heatmap types stored in the block, in order
+            grid_resolution (int): Grid cells per side
+            name (str, optional): Shared memory name (required when attaching)
+            create (bool): Create the block rather than attach to an existing one
+        """
+        self.heatmap_types = list(heatmap_types)
+        self.grid_resolution = grid_resolution
+        grid_bytes = grid_resolution * grid_resolution * 8
+        size = _HEADER_BYTES + grid_bytes * len(self.heatmap_types)
+
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self._header = np.ndarray((_HEADER_SLOTS,), dtype=np.int64, buffer=self.shm.buf)
+        self._grids = np.ndarray((len(self.heatmap_types), grid_resolution, grid_resolution),
+                                 dtype=np.float64, buffer=self.shm.buf, offset=_HEADER_BYTES)
+        if create:
+            self._header[:] = (0, 0, grid_resolution, len(self.heatmap_types))
+            self._grids.fill(0)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def sequence(self) -> int:
+        """
+        Even sequence number of the last completed publish (0 if nothing was published).
+        """
+        return int(self._header[0])
+
+    @property
+    def timestamp(self) -> int:
+        """
+        Frame timestamp of the last completed publish.
+        """
+        return int(self._header[1])
+
+    def publish(self, timestamp: int, grids: Dict[str, np.ndarray]):
+        """
+        Copy grids into shared memory (writer side).
+
+        Args:
+            timestamp (int): Frame time as a UNIX timestamp
+            grids (dict): Heatmap type to grid (dense or SparseGrid)
+        """
+        self._header[0] += 1
+        for i, heatmap_type in enumerate(self.heatmap_types):
+            if heatmap_type in grids:
+                grid = grids[heatmap_type]
+                if isinstance(grid, SparseGrid):
+                    grid.fill_dense(self._grids[i])
+                else:
+                    self._grids[i] = grid
+        self._header[1] = timestamp
+        self._header[0] += 1
+
+    def view(self, heatmap_type: str) -> np.ndarray:
+        """
+        Zero-copy view of a live grid. May change underneath the caller;
+        use read() when a consistent result matters.
+
+        Args:
+            heatmap_type (str): Heatmap type
+
+        Returns:
+            np.ndarray: View into shared memory
+        """
+        return self._grids[self.heatmap_types.index(heatmap_type)]
+
+    def read(self, heatmap_type: str, fn: Callable[[np.ndarray], Any] = np.copy,
+             attempts: int = 2) -> Tuple[int, Any]:
+        """
+        Apply fn to a live grid in place and return its result, retrying if a
+        publish happened in the meantime. If fn is slow enough to keep losing
+        that race, fall back to applying it to a consistent copy.
+
+        Args:
+            heatmap_type (str): Heatmap type
+            fn (callable): Function of the zero-copy grid view (defaults to copying it)
+            attempts (int): Zero-copy attempts before falling back to a copy
+
+        Returns:
+            tuple: (frame timestamp, fn result)
+        """
+        grid = self.view(heatmap_type)
+        for _ in range(attempts):
+            result = self._read_consistent(grid, fn)
+            if result is not None:
+                return result
+
+        while True:
+            result = self._read_consistent(grid, np.copy)
+            if result is not None:
+                timestamp, copy = result
+                return timestamp, fn(copy)
+
+    def _read_consistent(self, grid: np.ndarray, fn: Callable[[np.ndarray], Any]) -> Optional[Tuple[int, Any]]:
+        before = self.sequence
+        if before % 2:
+            time.sleep(0.001)
+            return None
+        timestamp = self.timestamp
+        result = fn(grid)
+        return (timestamp, result) if self.sequence == before else None
+
+    def close(self):
+        """
+        Detach from the shared memory block.
+        """
+        self._header = None
+        self._grids = None
+        self.shm.close()
+
+    def unlink(self):
+        """
+        Free the shared memory block (owner side, after close()).
+        """
+        self.shm.unlink()
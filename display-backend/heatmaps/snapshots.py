@@ -0,0 +1,108 @@
+import io
+import os
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+from .db_handler import HeatmapDBHandler
+from .archive import read_entry
+
+logger = logging.getLogger(__name__)
+
+
+def encode_snapshot(snapshot: Dict) -> bytes:
+    """
+    Encode a poll snapshot as a compressed npz payload.
+    """
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **{key: np.asarray(value) for key, value in snapshot.items()})
+    return buffer.getvalue()
+
+
+def decode_snapshot(data: bytes) -> Dict:
+    """
+    Decode a payload produced by encode_snapshot.
+    """
+    with np.load(io.BytesIO(bytes(data))) as payload:
+        snapshot = {key: payload[key] for key in payload.files}
+    snapshot['timestamp'] = int(snapshot['timestamp'])
+    return snapshot
+
+
+class SnapshotStore:
+    """
+    Raw flight polls kept for replaying heatmaps.
+
+    Snapshots are appended to one file per hour and indexed by byte offset in
+    the flight_snapshots table, so recording costs no new inode per poll and
+    any time range can be read back in order.
+    """
+
+    def __init__(self, db_path: str = "heatmaps.db", folder: str = "flight_heatmaps/snapshots"):
+        """
+        Initialize the snapshot store.
+
+        Args:
+            db_path (str): Path to the heatmap SQLite database
+            folder (str): Folder for hourly snapshot files
+        """
+        self.db_handler = HeatmapDBHandler(db_path)
+        self.folder = folder
+
+    def record(self, snapshot: Dict) -> Optional[int]:
+        """
+        Append a snapshot to its hourly file and index it.
+
+        Args:
+            snapshot (dict): Snapshot from snapshot_from_flights
+
+        Returns:
+            int or None: Row ID of the snapshot entry
+        """
+        poll_time = datetime.fromtimestamp(snapshot['timestamp'], timezone.utc)
+        archive_path = os.path.join(self.folder, poll_time.strftime('%Y-%m-%d'), poll_time.strftime('%H') + '.bin')
+        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+
+        data = encode_snapshot(snapshot)
+        with open(archive_path, 'ab') as f:
+            offset = f.tell()
+            f.write(data)
+        return self.db_handler.log_snapshot(snapshot['timestamp'], archive_path, offset, len(data),
+                                            int(len(snapshot['lats'])))
+
+    def iter_snapshots(self, start: int, end: int) -> Iterator[Dict]:
+        """
+        Yield the snapshots recorded in [start, end), oldest first.
+        """
+        for entry in self.db_handler.get_snapshots(start, end):
+            yield decode_snapshot(read_entry(entry))
+
+    def snapshot_before(self, timestamp: int) -> Optional[Dict]:
+        """
+        Get the latest snapshot strictly before a time.
+        """
+        entry = self.db_handler.get_snapshot_before(timestamp)
+        return decode_snapshot(read_entry(entry)) if entry else None
+
+    def prune(self, older_than_days: float = 14, now: float = None) -> int:
+        """
+        Drop snapshots older than the retention period.
+
+        Args:
+            older_than_days (float): Retention period
+            now (float): Current UNIX time (defaults to time.time())
+
+        Returns:
+            int: Number of snapshot files removed
+        """
+        now = now or datetime.now().timestamp()
+        removed = 0
+        for path in self.db_handler.delete_snapshots_before(int(now - older_than_days * 86400)):
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
@@ -0,0 +1,123 @@
+from typing import Tuple
+
+import numpy as np
+
+
+class SparseGrid:
+    """
+    Sparse 2D count grid for high-resolution heatmaps.
+
+    Occupied cells are kept as a sorted array of row-major cell keys with a
+    parallel array of counts, so memory and per-poll work scale with the
+    number of occupied cells rather than with the grid area.
+    """
+
+    def __init__(self, shape: Tuple[int, int], keys: np.ndarray = None, values: np.ndarray = None):
+        """
+        Initialize the grid.
+
+        Args:
+            shape (tuple): (rows, cols) of the grid
+            keys (np.ndarray, optional): Sorted row-major cell keys
+            values (np.ndarray, optional): Counts for each key
+        """
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.keys = np.asarray(keys, dtype=np.int64) if keys is not None else np.empty(0, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64) if values is not None else np.empty(0, dtype=np.float64)
+
+    @classmethod
+    def from_coo(cls, shape: Tuple[int, int], rows: np.ndarray, cols: np.ndarray, values: np.ndarray) -> 'SparseGrid':
+        """
+        Build a grid from (row, col, value) triplets (duplicates are summed).
+
+        Args:
+            shape (tuple): (rows, cols) of the grid
+            rows (np.ndarray): Row index of each value
+            cols (np.ndarray): Column index of each value
+            values (np.ndarray): Values
+
+        Returns:
+            SparseGrid: The grid
+        """
+        keys = np.asarray(rows, dtype=np.int64) * shape[1] + np.asarray(cols, dtype=np.int64)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        return cls(shape, unique_keys, np.bincount(inverse, weights=values, minlength=len(unique_keys)))
+
+    @property
+    def nnz(self) -> int:
+        return int(np.count_nonzero(self.values))
+
+    def max(self) -> float:
+        return float(self.values.max()) if self.values.size else 0.0
+
+    def add(self, keys: np.ndarray, counts: np.ndarray):
+        """
+        Add counts to cells, merging into the existing sorted keys.
+
+        Args:
+            keys (np.ndarray): Sorted, unique row-major cell keys
+            counts (np.ndarray): Count to add to each key
+        """
+        if keys.size == 0:
+            return
+        positions = np.searchsorted(self.keys, keys)
+        hit = positions < self.keys.size
+        hit[hit] = self.keys[positions[hit]] == keys[hit]
+        self.values[positions[hit]] += counts[hit]
+
+        new = ~hit
+        if new.any():
+            self.keys = np.insert(self.keys, positions[new], keys[new])
+            self.values = np.insert(self.values, positions[new], counts[new].astype(np.float64))
+
+    def fill(self, value: float):
+        """
+        Reset the grid (only filling with 0 is supported, mirroring ndarray.fill use in the engine).
+        """
+        if value != 0:
+            raise ValueError("SparseGrid can only be filled with 0")
+        self.keys = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float64)
+
+    def copy(self) -> 'SparseGrid':
+        return SparseGrid(self.shape, self.keys.copy(), self.values.copy())
+
+    def to_coo(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns:
+            tuple: (rows, cols, values) of the occupied cells
+        """
+        rows, cols = np.divmod(self.keys, self.shape[1])
+        return rows, cols, self.values
+
+    def lookup(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Gather values at (broadcastable) row and column index arrays.
+
+        Args:
+            rows (np.ndarray): Row indices
+            cols (np.ndarray): Column indices
+
+        Returns:
+            np.ndarray: Values, 0 for unoccupied cells
+        """
+        keys = np.asarray(rows, dtype=np.int64) * self.shape[1] + np.asarray(cols, dtype=np.int64)
+        if self.keys.size == 0:
+            return np.zeros(keys.shape)
+        positions = np.minimum(np.searchsorted(self.keys, keys), self.keys.size - 1)
+        return np.where(self.keys[positions] == keys, self.values[positions], 0.0)
+
+    def fill_dense(self, out: np.ndarray):
+        """
+        Write the grid into an existing dense array.
+
+        Args:
+            out (np.ndarray): Destination array of the grid's shape
+        """
+        out.fill(0)
+        out.reshape(-1)[self.keys] = self.values
+
+    def to_dense(self, dtype=np.float64) -> np.ndarray:
+        out = np.zeros(self.shape, dtype=dtype)
+        self.fill_dense(out)
+        return out
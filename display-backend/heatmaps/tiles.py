@@ -0,0 +1,202 @@
+import io
+import math
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import matplotlib
+import matplotlib.colors as mcolors
+import matplotlib.image as mimage
+
+from .catalog import FrameCatalog
+from .render import US_BOUNDS
+from .sparse import SparseGrid
+
+TILE_SIZE = 256
+MAX_ZOOM = 12
+
+
+_empty_tile: Optional[bytes] = None
+
+
+def empty_tile(tile_size: int = TILE_SIZE) -> bytes:
+    """
+    Fully transparent tile, served wherever a frame has no traffic.
+
+    Returns:
+        bytes: PNG tile
+    """
+    global _empty_tile
+    if _empty_tile is None:
+        buffer = io.BytesIO()
+        mimage.imsave(buffer, np.zeros((tile_size, tile_size, 4), dtype=np.uint8), format='png')
+        _empty_tile = buffer.getvalue()
+    return _empty_tile
+
+
+def tile_pixel_coordinates(z: int, x: int, y: int, tile_size: int = TILE_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Latitude of each pixel row and longitude of each pixel column of a Web
+    Mercator (XYZ) tile, sampled at pixel centres.
+
+    Args:
+        z (int): Zoom level
+        x (int): Tile column
+        y (int): Tile row (0 at the north edge)
+        tile_size (int): Tile size in pixels
+
+    Returns:
+        tuple: (lats, lons) 1D arrays of length tile_size
+    """
+    world_pixels = tile_size * (2 ** z)
+    offsets = np.arange(tile_size) + 0.5
+    lons = (x * tile_size + offsets) / world_pixels * 360.0 - 180.0
+    mercator_y = math.pi * (1 - 2 * (y * tile_size + offsets) / world_pixels)
+    lats = np.degrees(np.arctan(np.sinh(mercator_y)))
+    return lats, lons
+
+
+def render_tile(grid: Union[np.ndarray, SparseGrid], z: int, x: int, y: int, bounds: tuple = US_BOUNDS,
+                cmap_max: float = 10, cmap_name: str = 'hot', tile_size: int = TILE_SIZE) -> Optional[bytes]:
+    """
+    Render one XYZ tile of a heatmap grid.
+
+    Each tile pixel is mapped back to the grid cell it falls in (using the same
+    cell mapping the engine bins with), so detail improves with zoom up to
+    the resolution of the grid.
+
+    Args:
+        grid (np.ndarray or SparseGrid): 2D grid of per-cell counts (row 0 is the southern edge)
+        z (int): Zoom level
+        x (int): Tile column
+        y (int): Tile row
+        bounds (tuple): (max_lat, min_lat, min_lon, max_lon) of the grid
+        cmap_max (float): Count at which the colormap saturates
+        cmap_name (str): Matplotlib colormap name
+        tile_size (int): Tile size in pixels
+
+    Returns:
+        bytes or None: PNG tile, or None if the tile has no traffic
+    """
+    y1, y2, x1, x2 = bounds
+    rows, cols = grid.shape
+    lats, lons = tile_pixel_coordinates(z, x, y, tile_size)
+
+    lat_inside = (lats >= y2) & (lats <= y1)
+    lon_inside = (lons >= x1) & (lons <= x2)
+    if not lat_inside.any() or not lon_inside.any():
+        return None
+
+    row_indices = np.clip(((lats - y2) / (y1 - y2) * (rows - 1)).astype(np.intp), 0, rows - 1)
+    col_indices = np.clip(((lons - x1) / (x2 - x1) * (cols - 1)).astype(np.intp), 0, cols - 1)
+    if isinstance(grid, SparseGrid):
+        values = grid.lookup(row_indices[:, None], col_indices[None, :])
+    else:
+        values = grid[np.ix_(row_indices, col_indices)]
+    values[~(lat_inside[:, None] & lon_inside[None, :])] = 0
+    if not values.any():
+        return None
+
+    cmap = matplotlib.colormaps[cmap_name].copy()
+    cmap.set_under(color='none')
+    norm = mcolors.Normalize(vmin=0.1, vmax=cmap_max)
+    rgba = cmap(norm(values), bytes=True)
+
+    buffer = io.BytesIO()
+    mimage.imsave(buffer, rgba, format='png')
+    return buffer.getvalue()
+
+
+class TileServer:
+    """
+    Serves heatmap frames as XYZ tiles, rendered on demand from the frame's
+    stored grid and kept in an LRU keyed by frame, zoom and tile. Frames
+    stored only as PNGs have no tiles; clients show the whole PNG instead.
+    Both caches are dropped when the catalog's frame generation moves.
+    """
+
+    def __init__(self, catalog: FrameCatalog, cache_size: int = 2048, grid_cache_size: int = 8,
+                 cmap_max: float = 10):
+        """
+        Initialize the tile server.
+
+        Args:
+            catalog (FrameCatalog): Catalog used to load frame grids
+            cache_size (int): Number of rendered tiles to keep
+            grid_cache_size (int): Number of decoded frame grids to keep
+            cmap_max (float): Count at which the colormap saturates
+        """
+        self.catalog = catalog
+        self.cache_size = cache_size
+        self.grid_cache_size = grid_cache_size
+        self.cmap_max = cmap_max
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._tiles: "OrderedDict[tuple, Optional[bytes]]" = OrderedDict()
+        self._grids: "OrderedDict[tuple, SparseGrid]" = OrderedDict()
+
+    def _sync_generation(self) -> int:
+        generation = self.catalog.generation()
+        with self._lock:
+            if generation != self._generation:
+                self._generation = generation
+                self._tiles.clear()
+                self._grids.clear()
+        return generation
+
+    def _grid(self, heatmap_type: str, timestamp: int, generation: int) -> Optional[SparseGrid]:
+        key = (heatmap_type, timestamp)
+        with self._lock:
+            if key in self._grids:
+                self._grids.move_to_end(key)
+                return self._grids[key]
+
+        # Kept sparse so high-resolution frames cost memory per occupied cell
+        grid = self.catalog.get_frame_grid(heatmap_type, timestamp, sparse=True)
+        # Misses aren't cached: the frame's grid may not be written yet
+        if grid is None:
+            return None
+        with self._lock:
+            if generation == self._generation:
+                self._grids[key] = grid
+                while len(self._grids) > self.grid_cache_size:
+                    self._grids.popitem(last=False)
+        return grid
+
+    def get_tile(self, heatmap_type: str, timestamp: int, z: int, x: int, y: int) -> Tuple[bool, Optional[bytes]]:
+        """
+        Get a tile of a frame.
+
+        Args:
+            heatmap_type (str): Stored heatmap type
+            timestamp (int): Frame time as a UNIX timestamp
+            z (int): Zoom level
+            x (int): Tile column
+            y (int): Tile row
+
+        Returns:
+            tuple: (frame_found, PNG bytes or None if the tile is empty)
+        """
+        if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+            return False, None
+
+        generation = self._sync_generation()
+        key = (heatmap_type, timestamp, z, x, y)
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                return True, self._tiles[key]
+
+        grid = self._grid(heatmap_type, timestamp, generation)
+        if grid is None:
+            return False, None
+
+        tile = render_tile(grid, z, x, y, cmap_max=self.cmap_max)
+        with self._lock:
+            # A tile rendered while the generation moved may come from the old frame
+            if generation == self._generation:
+                self._tiles[key] = tile
+                while len(self._tiles) > self.cache_size:
+                    self._tiles.popitem(last=False)
+        return True, tile
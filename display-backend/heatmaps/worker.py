@@ -0,0 +1,132 @@
+import os
+import atexit
+import logging
+import threading
+import multiprocessing
+from typing import Dict, Optional, Tuple
+
+from .engine import HeatmapEngine
+from .pipeline import HeatmapPipeline
+from .snapshots import SnapshotStore
+from .render import render_grid_png, US_BOUNDS
+from .shared_grids import SharedGrids
+from .catalog import HEATMAP_TYPES
+
+logger = logging.getLogger(__name__)
+
+
+def _fetch_us_flights(fr_api):
+    y1, y2, x1, x2 = US_BOUNDS
+    return fr_api.get_flights(bounds=f"{y1},{y2},{x1},{x2}")
+
+
+def _run_worker(shared_grids: SharedGrids, config: Dict):
+    # Imported here so the web process doesn't need the FlightRadar24 client
+    from FlightRadar24 import FlightRadar24API
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    fr_api = FlightRadar24API()
+    engine = HeatmapEngine(db_path=config['db_path'], output_folder=config['output_folder'],
+                           grid_resolution=config['grid_resolution'], render_pngs=config['render_pngs'],
+                           cmap_max=config['cmap_max'], sparse=config['sparse'],
+                           ingest_mode=config['ingest_mode'], cube_resolution=config['cube_resolution'])
+    pipeline = HeatmapPipeline(engine, lambda: _fetch_us_flights(fr_api),
+                               interval_seconds=config['interval_seconds'],
+                               on_frame=shared_grids.publish,
+                               snapshot_store=SnapshotStore(config['db_path'],
+                                                            f"{config['output_folder']}/snapshots"))
+    pipeline.run_forever()
+
+
+class HeatmapWorker:
+    """
+    Runs the heatmap pipeline in a child process next to the Flask app.
+
+    The live grids are shared with the web process through SharedGrids, so
+    the current frame can be rendered on demand instead of waiting for the
+    next PNG to land on disk.
+    """
+
+    def __init__(self, db_path: str = "heatmaps.db", output_folder: str = "flight_heatmaps",
+                 grid_resolution: int = 200, interval_seconds: float = 120, render_pngs: bool = True,
+                 cmap_max: float = 10, sparse: bool = False, ingest_mode: str = 'points',
+                 cube_resolution: int = None):
+        """
+        Initialize the worker (nothing runs until start()).
+
+        Args:
+            db_path (str): Path to the heatmap SQLite database
+            output_folder (str): Folder for daily frame folders
+            grid_resolution (int): Grid cells per side
+            interval_seconds (float): Poll period
+            render_pngs (bool): Whether the worker renders PNGs for every frame
+            cmap_max (float): Count at which the colormap saturates
+            sparse (bool): Accumulate into SparseGrids (the shared block stays dense)
+            ingest_mode (str): 'points' or 'segments', see HeatmapEngine
+            cube_resolution (int, optional): Resolution of the flight histogram cube
+        """
+        self.config = {
+            'db_path': db_path,
+            'output_folder': output_folder,
+            'grid_resolution': grid_resolution,
+            'interval_seconds': interval_seconds,
+            'render_pngs': render_pngs,
+            'cmap_max': cmap_max,
+            'sparse': sparse,
+            'ingest_mode': ingest_mode,
+            'cube_resolution': cube_resolution,
+        }
+        self.shared_grids: Optional[SharedGrids] = None
+        self.process: Optional[multiprocessing.Process] = None
+        self._lock = threading.Lock()
+        self._png_cache: Dict[str, Tuple[int, bytes]] = {}
+
+    def start(self):
+        """
+        Allocate the shared grids and start the worker process.
+        """
+        self.shared_grids = SharedGrids(HEATMAP_TYPES, self.config['grid_resolution'])
+        # fork so the child inherits the shared memory mapping without re-importing app.py
+        context = multiprocessing.get_context('fork')
+        self.process = context.Process(target=_run_worker, args=(self.shared_grids, self.config),
+                                       name='heatmap-worker', daemon=True)
+        self.process.start()
+        atexit.register(self.stop)
+        logger.info(f"Started heatmap worker (pid {self.process.pid}, shared memory {self.shared_grids.name})")
+
+    def stop(self):
+        """
+        Stop the worker process and free the shared grids.
+        """
+        if self.process and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5)
+        if self.shared_grids:
+            self.shared_grids.close()
+            self.shared_grids.unlink()
+            self.shared_grids = None
+
+    def live_png(self, heatmap_type: str) -> Optional[Tuple[int, bytes]]:
+        """
+        Render the live grid of a type, re-rendering only when a new frame was published.
+
+        Args:
+            heatmap_type (str): Stored heatmap type
+
+        Returns:
+            tuple or None: (frame timestamp, PNG bytes), or None before the first frame
+        """
+        if not self.shared_grids or self.shared_grids.sequence == 0:
+            return None
+
+        sequence = self.shared_grids.sequence
+        with self._lock:
+            cached = self._png_cache.get(heatmap_type)
+            if cached and cached[0] == sequence:
+                return self.shared_grids.timestamp, cached[1]
+
+        timestamp, png = self.shared_grids.read(
+            heatmap_type, lambda grid: render_grid_png(grid, cmap_max=self.config['cmap_max']))
+        with self._lock:
+            self._png_cache[heatmap_type] = (sequence, png)
+        return timestamp, png
@@ -5,5 +5,9 @@ RSS Feeds package for aggregating and processing RSS feeds.
 from .aggregator import RSSAggregator
 from .db_handler import DatabaseHandler
 from .ai_interaction import GeminiArticleRanker
+from .news_cache import NewsCache
+from .dedup import DuplicateDetector
+from .retention import ArticleRetention
+from .scheduler import FeedScheduler
 
-__all__ = ['RSSAggregator', 'DatabaseHandler', 'GeminiArticleRanker']
+__all__ = ['RSSAggregator', 'DatabaseHandler', 'GeminiArticleRanker', 'NewsCache', 'DuplicateDetector', 'ArticleRetention', 'FeedScheduler']
@@ -1,13 +1,17 @@
 import json
 import feedparser
 import logging
-from datetime import datetime
-from typing import List, Dict, Optional
-from urllib.parse import urljoin
+import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urljoin, urlparse
 import time
 import os
 
 from .db_handler import DatabaseHandler
+from .dedup import DuplicateDetector
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,17 +22,37 @@ class RSSAggregator:
     RSS Feed Aggregator that fetches articles from RSS feeds and stores them in the database.
     """
     
-    def __init__(self, feeds_file: str = "feeds.json", db_path: str = "articles.db"):
+    USER_AGENT = "Display-Website RSS Aggregator"
+    
+    def __init__(self, feeds_file: str = "feeds.json", db_path: str = "articles.db",
+                 max_workers: int = 8, per_host_limit: int = 1, host_delay: float = 1.0,
+                 timeout: float = 15.0):
         """
         Initialize the RSS aggregator.
         
         Args:
             feeds_file (str): Path to the feeds.json file
             db_path (str): Path to the SQLite database file
+            max_workers (int): Maximum number of feeds downloaded at once
+            per_host_limit (int): Maximum concurrent downloads from one host
+            host_delay (float): Minimum seconds between requests to the same host
+            timeout (float): Hard limit in seconds on downloading a single feed
         """
         self.feeds_file = feeds_file
         self.db_handler = DatabaseHandler(db_path)
+        self.duplicate_detector = DuplicateDetector(self.db_handler)
         self.feeds = self._load_feeds()
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.host_delay = host_delay
+        self.timeout = timeout
+        self._host_lock = threading.Lock()
+        self._host_semaphores: Dict[str, threading.Semaphore] = {}
+        self._host_last_request: Dict[str, float] = {}
+        # Feed URL to the monotonic start time of each download in progress
+        self._downloads_started: Dict[str, float] = {}
+        # URLs of downloads given up on by aggregate_feeds that are still running
+        self._abandoned: set = set()
     
     def _load_feeds(self) -> List[Dict]:
         """
@@ -43,7 +67,7 @@ class RSSAggregator:
                 return []
             
             with open(self.feeds_file, 'r', encoding='utf-8') as f:
-                feeds = json.load(f)
+                feeds = self._feeds_with_url(json.load(f))
             
             logger.info(f"Loaded {len(feeds)} feeds from {self.feeds_file}")
             return feeds
@@ -54,6 +78,25 @@ class RSSAggregator:
             logger.error(f"Error loading feeds: {e}")
             return []
     
+    @staticmethod
+    def _feeds_with_url(feeds: List[Dict]) -> List[Dict]:
+        """
+        Drop feed configurations without a URL, with a warning for each.
+        
+        Args:
+            feeds (List[Dict]): Feed configurations
+            
+        Returns:
+            List[Dict]: The feeds that have a URL
+        """
+        usable = []
+        for feed in feeds:
+            if feed.get('url'):
+                usable.append(feed)
+            else:
+                logger.warning(f"Skipping feed without a URL: {feed.get('title', 'Unknown Feed')}")
+        return usable
+    
     def _parse_published_date(self, entry) -> Optional[datetime]:
         """
         Parse the published date from an RSS entry.
@@ -116,115 +159,311 @@ class RSSAggregator:
         
         return description
     
-    def fetch_feed_articles(self, feed: Dict) -> List[Dict]:
+    def _host_semaphore(self, host: str) -> threading.Semaphore:
+        with self._host_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.Semaphore(self.per_host_limit)
+            return self._host_semaphores[host]
+    
+    def download_feed(self, feed: Dict, conditional: bool = True) -> Optional[Dict]:
         """
-        Fetch articles from a single RSS feed.
+        Download the raw document of a single RSS feed.
+        
+        Requests to the same host are limited to per_host_limit at a time and
+        spaced host_delay seconds apart, and the whole download is abandoned
+        once it takes longer than timeout seconds, so one hung host can't
+        stall an aggregation cycle.
+        
+        Conditional requests send the ETag and Last-Modified validators saved
+        in feed_state, so a feed that hasn't changed costs a 304 and no parsing.
         
         Args:
             feed (Dict): Feed configuration containing url, title, category, etc.
+            conditional (bool): Send the saved validators with the request
             
         Returns:
-            List[Dict]: List of article data dictionaries
+            Dict or None: 'content' (None if not modified), 'etag', 'last_modified'
+                and the saved 'state', or None if the feed couldn't be downloaded
         """
-        articles = []
         feed_url = feed.get('url')
         feed_title = feed.get('title', 'Unknown Feed')
         
         if not feed_url:
             logger.warning(f"No URL found for feed: {feed_title}")
-            return articles
+            return None
         
+        host = urlparse(feed_url).netloc
+        semaphore = self._host_semaphore(host)
+        # Queue behind the host's other downloads, unless one of them has hung
+        while not semaphore.acquire(timeout=1.0):
+            if self._host_stalled(host):
+                logger.warning(f"Skipping {feed_title}: a download from {host} has hung")
+                self.db_handler.record_feed_error(feed_url, f"{host} has a hung download")
+                return None
         try:
+            with self._host_lock:
+                delay = self._host_last_request.get(host, 0) + self.host_delay - time.monotonic()
+                self._host_last_request[host] = time.monotonic() + max(delay, 0)
+            if delay > 0:
+                time.sleep(delay)
+            
+            headers = {'User-Agent': self.USER_AGENT}
+            state = self.db_handler.get_feed_state(feed_url) if conditional else None
+            if state and state['etag']:
+                headers['If-None-Match'] = state['etag']
+            if state and state['last_modified']:
+                headers['If-Modified-Since'] = state['last_modified']
+            
             logger.info(f"Fetching articles from: {feed_title} ({feed_url})")
+            started = time.monotonic()
+            deadline = started + self.timeout
+            with self._host_lock:
+                self._downloads_started[feed_url] = started
+            try:
+                with requests.get(feed_url, headers=headers, stream=True,
+                                  timeout=(min(5.0, self.timeout), self.timeout)) as response:
+                    if response.status_code == 304:
+                        logger.info(f"Feed not modified: {feed_title}")
+                        return {'content': None, 'etag': None, 'last_modified': None, 'state': state}
+                    
+                    response.raise_for_status()
+                    chunks = []
+                    for chunk in response.iter_content(chunk_size=65536):
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"download took longer than {self.timeout}s")
+                        chunks.append(chunk)
+                    return {
+                        'content': b''.join(chunks),
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'state': state,
+                    }
+            except Exception as e:
+                logger.error(f"Error fetching feed {feed_title}: {e}")
+                self.db_handler.record_feed_error(feed_url, str(e))
+                return None
+        finally:
+            with self._host_lock:
+                self._downloads_started.pop(feed_url, None)
+                self._abandoned.discard(feed_url)
+            semaphore.release()
+    
+    def _host_stalled(self, host: str) -> bool:
+        with self._host_lock:
+            return any(urlparse(url).netloc == host for url in self._abandoned)
+    
+    def _overdue_downloads(self, now: float) -> List[str]:
+        """
+        Get the URLs of downloads that have run past timeout and weren't given up on yet.
+        
+        Args:
+            now (float): Current time.monotonic()
+            
+        Returns:
+            List[str]: Feed URLs
+        """
+        with self._host_lock:
+            return [url for url, started in self._downloads_started.items()
+                    if now - started > self.timeout and url not in self._abandoned]
+    
+    def _parse_entries(self, feed: Dict, content: bytes) -> List:
+        """
+        Parse a downloaded RSS feed document into its entries.
+        
+        Args:
+            feed (Dict): Feed configuration containing url, title, category, etc.
+            content (bytes): Feed document downloaded by download_feed
             
+        Returns:
+            List: feedparser entries, in feed order
+        """
+        feed_title = feed.get('title', 'Unknown Feed')
+        try:
             # Parse the RSS feed
-            parsed_feed = feedparser.parse(feed_url)
+            parsed_feed = feedparser.parse(content)
             
             if parsed_feed.bozo and parsed_feed.bozo_exception:
                 logger.warning(f"Feed parsing warning for {feed_title}: {parsed_feed.bozo_exception}")
             
-            # Process each entry
-            for entry in parsed_feed.entries:
-                try:
-                    # Extract article data
-                    title = getattr(entry, 'title', 'No Title')
-                    link = getattr(entry, 'link', '')
-                    
-                    if not link:
-                        logger.warning(f"No link found for article: {title}")
-                        continue
-                    
-                    description = self._get_article_description(entry)
-                    author = self._get_article_author(entry)
-                    published_date = self._parse_published_date(entry)
-                    
-                    article_data = {
-                        'title': title.strip(),
-                        'link': link.strip(),
-                        'description': description.strip() if description else None,
-                        'author': author.strip() if author else None,
-                        'published_date': published_date,
-                        'feed_title': feed_title,
-                        'feed_category': feed.get('category', 'General'),
-                        'feed_language': feed.get('language', 'en')
-                    }
-                    
-                    articles.append(article_data)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing entry from {feed_title}: {e}")
-                    continue
+            return parsed_feed.entries
+        except Exception as e:
+            logger.error(f"Error parsing feed {feed_title}: {e}")
+            return []
+    
+    def _build_article(self, feed: Dict, entry) -> Optional[Dict]:
+        """
+        Extract article data from an RSS entry.
+        
+        Args:
+            feed (Dict): Feed configuration the entry came from
+            entry: RSS entry object from feedparser
             
-            logger.info(f"Successfully fetched {len(articles)} articles from {feed_title}")
+        Returns:
+            Dict or None: Article data dictionary, or None if the entry is unusable
+        """
+        feed_title = feed.get('title', 'Unknown Feed')
+        try:
+            # Extract article data
+            title = getattr(entry, 'title', 'No Title')
+            link = getattr(entry, 'link', '')
             
+            if not link:
+                logger.warning(f"No link found for article: {title}")
+                return None
+            
+            description = self._get_article_description(entry)
+            author = self._get_article_author(entry)
+            published_date = self._parse_published_date(entry)
+            
+            return {
+                'title': title.strip(),
+                'link': link.strip(),
+                'description': description.strip() if description else None,
+                'author': author.strip() if author else None,
+                'published_date': published_date,
+                'feed_title': feed_title,
+                'feed_category': feed.get('category', 'General'),
+                'feed_language': feed.get('language', 'en')
+            }
         except Exception as e:
-            logger.error(f"Error fetching feed {feed_title}: {e}")
+            logger.error(f"Error processing entry from {feed_title}: {e}")
+            return None
+    
+    def parse_feed_articles(self, feed: Dict, content: bytes) -> List[Dict]:
+        """
+        Parse every entry of a downloaded RSS feed document into article data.
         
+        Args:
+            feed (Dict): Feed configuration containing url, title, category, etc.
+            content (bytes): Feed document downloaded by download_feed
+            
+        Returns:
+            List[Dict]: List of article data dictionaries
+        """
+        articles = []
+        for entry in self._parse_entries(feed, content):
+            article_data = self._build_article(feed, entry)
+            if article_data:
+                articles.append(article_data)
+        
+        logger.info(f"Successfully fetched {len(articles)} articles from {feed.get('title', 'Unknown Feed')}")
         return articles
     
-    def store_article(self, article_data: Dict) -> bool:
+    def parse_new_feed_articles(self, feed: Dict, content: bytes,
+                                high_water: Optional[Dict] = None) -> Tuple[List[Dict], Optional[Dict]]:
         """
-        Store an article in the database.
+        Parse only the entries newer than a feed's high-water mark.
+        
+        Feeds list their newest items first, so once an entry matches the
+        last ingested link or is older than the last ingested publish time,
+        everything after it is already stored. That shortcut is only taken
+        when every entry is dated and the dates never increase; otherwise the
+        whole feed is scanned and the mark is cleared.
         
         Args:
-            article_data (Dict): Article data dictionary
+            feed (Dict): Feed configuration containing url, title, category, etc.
+            content (bytes): Feed document downloaded by download_feed
+            high_water (Dict, optional): 'link' and 'published' of the newest entry
+                ingested last time
             
         Returns:
-            bool: True if stored successfully, False otherwise
+            Tuple: (article data dictionaries, new high-water mark or None)
         """
-        try:
-            # Check if article already exists
-            existing_article = self.db_handler.get_article_by_link(article_data['link'])
-            if existing_article:
-                logger.debug(f"Article already exists: {article_data['title']}")
-                return False
-            
-            # Insert new article
-            article_id = self.db_handler.insert_article(
-                title=article_data['title'],
-                link=article_data['link'],
-                description=article_data['description'],
-                author=article_data['author'],
-                published_date=article_data['published_date'],
-                status='pending',
-                ranking_score=0.0
-            )
+        entries = self._parse_entries(feed, content)
+        feed_title = feed.get('title', 'Unknown Feed')
+        
+        # Compare everything as naive UTC, like the dates feedparser parses itself
+        published = [self._parse_published_date(entry) for entry in entries]
+        published = [date.astimezone(timezone.utc).replace(tzinfo=None) if date and date.tzinfo else date
+                     for date in published]
+        ordered = all(published) and all(newer >= older for newer, older in zip(published, published[1:]))
+        if not ordered:
+            if high_water:
+                logger.info(f"Entries of {feed_title} are not in date order, scanning the whole feed")
+            return self.parse_feed_articles(feed, content), None
+        
+        articles = []
+        for entry, published_date in zip(entries, published):
+            if high_water and (getattr(entry, 'link', '').strip() == high_water['link']
+                               or published_date < high_water['published']):
+                break
+            article_data = self._build_article(feed, entry)
+            if article_data:
+                articles.append(article_data)
+        
+        logger.info(f"Found {len(articles)} new of {len(entries)} articles in {feed_title}")
+        if not entries:
+            return articles, high_water
+        return articles, {'link': getattr(entries[0], 'link', '').strip(), 'published': published[0]}
+    
+    def _process_feed(self, feed: Dict, document: Optional[Dict], stats: Dict[str, int]) -> Optional[int]:
+        """
+        Parse and store a downloaded feed, then save its validators.
+        
+        Validators and the high-water mark are only saved once the articles
+        are stored, so a failure part-way through doesn't make the next fetch
+        skip them.
+        
+        Args:
+            feed (Dict): Feed configuration
+            document (Dict or None): Result of download_feed
+            stats (Dict[str, int]): Aggregation statistics to update
             
-            if article_id:
-                logger.info(f"Stored article: {article_data['title']} (ID: {article_id})")
-                return True
-            else:
-                logger.warning(f"Failed to store article: {article_data['title']}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Error storing article {article_data['title']}: {e}")
-            return False
+        Returns:
+            int or None: Number of new articles stored, or None if the download or the insert failed
+        """
+        stats['feeds_processed'] += 1
+        if document is None:
+            stats['feeds_failed'] += 1
+            return None
+        if document['content'] is None:
+            stats['feeds_unchanged'] += 1
+            self.db_handler.record_feed_success(feed['url'])
+            return 0
+        
+        state = document['state']
+        high_water = None
+        if state and state['high_water_link'] and state['high_water_published']:
+            high_water = {'link': state['high_water_link'],
+                          'published': datetime.fromisoformat(state['high_water_published'])}
+        articles, high_water = self.parse_new_feed_articles(feed, document['content'], high_water)
+        stats['articles_fetched'] += len(articles)
+        
+        # Store the whole feed in one transaction; links already stored are skipped
+        counts = self.db_handler.insert_articles(articles)
+        if counts['failed']:
+            # Keep the old validators and mark, so the next poll downloads these articles again
+            stats['feeds_failed'] += 1
+            self.db_handler.record_feed_error(feed['url'], f"could not store {counts['failed']} articles")
+            return None
+        stats['articles_stored'] += counts['inserted']
+        stats['articles_skipped'] += counts['skipped']
+        if counts['inserted']:
+            stats['articles_duplicate'] += self.duplicate_detector.cluster_new_articles()
+        
+        self.db_handler.record_feed_success(feed['url'], document['etag'], document['last_modified'])
+        self.db_handler.update_feed_high_water(feed['url'], high_water['link'] if high_water else None,
+                                               high_water['published'] if high_water else None)
+        return counts['inserted']
     
     def aggregate_all_feeds(self) -> Dict[str, int]:
         """
         Aggregate articles from all RSS feeds.
         
+        Returns:
+            Dict[str, int]: Summary statistics of the aggregation
+        """
+        return self.aggregate_feeds(self.feeds)
+    
+    def aggregate_feeds(self, feeds: List[Dict], new_counts: Optional[Dict[str, Optional[int]]] = None) -> Dict[str, int]:
+        """
+        Aggregate articles from some of the RSS feeds.
+        
+        Args:
+            feeds (List[Dict]): Feed configurations to fetch
+            new_counts (Dict, optional): Filled with each feed URL's number of
+                new articles (None when the download failed)
+            
         Returns:
             Dict[str, int]: Summary statistics of the aggregation
         """
@@ -232,38 +471,56 @@ class RSSAggregator:
             'feeds_processed': 0,
             'articles_fetched': 0,
             'articles_stored': 0,
-            'articles_skipped': 0
+            'articles_skipped': 0,
+            'articles_duplicate': 0,
+            'feeds_unchanged': 0,
+            'feeds_failed': 0
         }
         
-        if not self.feeds:
+        feeds = self._feeds_with_url(feeds)
+        if not feeds:
             logger.warning("No feeds to process")
             return stats
         
-        logger.info(f"Starting aggregation of {len(self.feeds)} feeds")
+        logger.info(f"Starting aggregation of {len(feeds)} feeds")
+        start_time = time.monotonic()
         
-        for feed in self.feeds:
-            try:
-                stats['feeds_processed'] += 1
-                
-                # Fetch articles from this feed
-                articles = self.fetch_feed_articles(feed)
-                stats['articles_fetched'] += len(articles)
-                
-                # Store each article
-                for article in articles:
-                    if self.store_article(article):
-                        stats['articles_stored'] += 1
-                    else:
-                        stats['articles_skipped'] += 1
+        # Downloads run in the pool; each document is parsed and stored here as soon as it arrives.
+        # The timeout is only checked between chunks inside a download, so a server that keeps
+        # trickling bytes is given up on here instead and its thread is left to finish on its own.
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='rss-fetch')
+        try:
+            futures = {executor.submit(self.download_feed, feed): feed for feed in feeds}
+            by_url = {feed['url']: future for future, feed in futures.items()}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                results = [(futures[future], future.result()) for future in done]
                 
-                # Small delay between feeds to be respectful
-                time.sleep(1)
+                for url in self._overdue_downloads(time.monotonic()):
+                    future = by_url.get(url)
+                    if future not in pending:
+                        continue
+                    logger.error(f"Giving up on {futures[future].get('title', 'Unknown')}: "
+                                 f"download took longer than {self.timeout}s")
+                    with self._host_lock:
+                        self._abandoned.add(url)
+                    self.db_handler.record_feed_error(url, f"download took longer than {self.timeout}s")
+                    pending.discard(future)
+                    results.append((futures[future], None))
                 
-            except Exception as e:
-                logger.error(f"Error processing feed {feed.get('title', 'Unknown')}: {e}")
-                continue
+                for feed, document in results:
+                    try:
+                        inserted = self._process_feed(feed, document, stats)
+                    except Exception as e:
+                        logger.error(f"Error processing feed {feed.get('title', 'Unknown')}: {e}")
+                        inserted = None
+                    if new_counts is not None:
+                        new_counts[feed['url']] = inserted
+        finally:
+            executor.shutdown(wait=False)
         
-        logger.info(f"Aggregation completed. Stats: {stats}")
+        logger.info(f"Aggregation completed in {time.monotonic() - start_time:.1f}s. Stats: {stats}")
         return stats
     
     def aggregate_single_feed(self, feed_title: str) -> Dict[str, int]:
@@ -280,7 +537,10 @@ class RSSAggregator:
             'feeds_processed': 0,
             'articles_fetched': 0,
             'articles_stored': 0,
-            'articles_skipped': 0
+            'articles_skipped': 0,
+            'articles_duplicate': 0,
+            'feeds_unchanged': 0,
+            'feeds_failed': 0
         }
         
         # Find the feed by title
@@ -297,19 +557,7 @@ class RSSAggregator:
         logger.info(f"Processing single feed: {feed_title}")
         
         try:
-            stats['feeds_processed'] = 1
-            
-            # Fetch articles from this feed
-            articles = self.fetch_feed_articles(target_feed)
-            stats['articles_fetched'] = len(articles)
-            
-            # Store each article
-            for article in articles:
-                if self.store_article(article):
-                    stats['articles_stored'] += 1
-                else:
-                    stats['articles_skipped'] += 1
-            
+            self._process_feed(target_feed, self.download_feed(target_feed), stats)
         except Exception as e:
             logger.error(f"Error processing feed {feed_title}: {e}")
         
@@ -327,64 +575,16 @@ class RSSAggregator:
             List[Dict]: List of ranked articles
         """
         try:
-            # Get all articles from the database with ranking above 50
-            articles = self.db_handler.get_articles(
-                min_ranking=50.0,  # Get a reasonable number of candidates
-                order_by='ranking_score DESC'
-            )
+            # Scoring balances ranking, times_served and published_date inside SQLite:
+            # higher ranking, fewer times served and newer articles come first
+            result_articles = self.db_handler.get_top_scored_articles(limit=number, min_ranking=50.0)
             
-            if not articles:
+            if not result_articles:
                 logger.info("No high-ranking articles found")
                 return []
             
-            # Calculate a score that balances ranking, times_served, and published_date
-            # Higher ranking = more likely to be shown
-            # Higher times_served = less likely to be shown
-            # Newer articles = more likely to be shown
-            current_time = datetime.now()
-            ranked_articles = []
-            
-            for article in articles:
-                # Calculate days since publication
-                published_date = article['published_date']
-                if published_date:
-                    # Convert string to datetime if needed
-                    if isinstance(published_date, str):
-                        try:
-                            published_date = datetime.fromisoformat(published_date.replace('Z', '+00:00'))
-                        except:
-                            published_date = None
-                    
-                    if published_date:
-                        days_since_published = (current_time - published_date).days
-                        # Age penalty factor - older articles get penalized more
-                        # Add 1 to avoid division by zero for very new articles
-                        age_factor = max(1, days_since_published + 1)
-                    else:
-                        # Default age factor if we couldn't parse the date
-                        age_factor = 10  # Assume somewhat old
-                else:
-                    # Default age factor if no published date
-                    age_factor = 10  # Assume somewhat old
-                
-                # Calculate an adjusted score that considers:
-                # - Higher ranking = better
-                # - Lower times_served = better
-                # - Lower age = better
-                adjusted_score = article['ranking_score'] / ((article['times_served'] + 1) * age_factor)
-                
-                article['adjusted_score'] = adjusted_score
-                ranked_articles.append(article)
-            
-            # Sort by adjusted score
-            ranked_articles.sort(key=lambda x: x['adjusted_score'], reverse=True)
-            
-            # Limit to the requested number
-            result_articles = ranked_articles[:number]
-            
             # Update times_served for all articles being returned
-            for article in result_articles:
-                self.db_handler.increment_times_served(article['id'])
+            self.db_handler.increment_times_served_many([article['id'] for article in result_articles])
             
             logger.info(f"Fetched {len(result_articles)} articles algorithmically")
             return result_articles
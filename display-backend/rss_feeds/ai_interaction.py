@@ -68,7 +68,8 @@ Articles to analyze:
             prompt += f"\n--- Article {i} ---\n"
             prompt += f"Title: {article.get('title', 'No title')}\n"
             # NOTE: Added a check for 'description' to prevent slicing None if the value is NULL/None in the dict
-            description = article.get('description', 'No description')
+            # Plain text cleaned at ingest, so markup doesn't eat into the 400 characters
+            description = article.get('description_text') or article.get('description', 'No description')
             prompt += f"Description: {description[:400]}...\n" if description else "Description: No description...\n"
             
             if article.get('source'):
@@ -313,6 +314,20 @@ The order must match the article order above. Provide exactly """ + str(len(arti
         if not pending_articles:
             logger.info("All articles were filtered out after cleaning.")
             return 0
+        
+        # Rank one article per near-duplicate cluster (see DuplicateDetector); the rest won't be served
+        representatives = {}
+        duplicate_ids = []
+        for article in pending_articles:
+            cluster_id = article.get('cluster_id') or article['id']
+            if cluster_id in representatives:
+                duplicate_ids.append(article['id'])
+            else:
+                representatives[cluster_id] = article
+        if duplicate_ids:
+            self.db_handler.bulk_update_status(duplicate_ids, 'duplicate')
+            logger.info(f"Skipping {len(duplicate_ids)} near-duplicate articles")
+            pending_articles = list(representatives.values())
             
         total_ranked = 0
         ranking_debug_log = []
@@ -1,8 +1,13 @@
+import re
 import sqlite3
 import os
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 import logging
+import time
+
+from storage import get_database
+from .text import plain_text, DESCRIPTION_TEXT_LENGTH, REASONING_TEXT_LENGTH
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -22,18 +27,21 @@ class DatabaseHandler:
             db_path (str): Path to the SQLite database file
         """
         self.db_path = db_path
-        self.init_database()
+        self.database = get_database(db_path)
+        self.database.initialize('articles', self.init_database)
     
     def get_connection(self) -> sqlite3.Connection:
         """
-        Get a database connection.
+        Borrow a connection from the database's pool.
+        
+        Connections are shared between threads (see storage.SQLiteDatabase):
+        callers use them as context managers, which returns them to the pool,
+        and must not close them.
         
         Returns:
             sqlite3.Connection: Database connection object
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable accessing columns by name
-        return conn
+        return self.database.connection()
     
     def init_database(self):
         """
@@ -41,6 +49,14 @@ class DatabaseHandler:
         """
         try:
             with self.get_connection() as conn:
+                # Incremental auto-vacuum lets compact() free pages without a full VACUUM.
+                # A new database just takes the setting; an existing one is rebuilt once, here.
+                if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                    if conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()[0]:
+                        logger.info("Switching the articles database to incremental auto-vacuum")
+                        conn.execute('VACUUM')
+                
                 cursor = conn.cursor()
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS articles (
@@ -56,7 +72,9 @@ class DatabaseHandler:
                         ai_reasoning TEXT,
                         created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                         updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        times_served INTEGER DEFAULT 0
+                        times_served INTEGER DEFAULT 0,
+                        description_text TEXT,
+                        reasoning_text TEXT
                     )
                 ''')
                 
@@ -65,12 +83,163 @@ class DatabaseHandler:
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_published_date ON articles(published_date)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_ranking_score ON articles(ranking_score)')
                 
+                # published_date as UNIX seconds, kept in sync by triggers so every write path is covered
+                self._add_missing_columns(cursor, 'articles', {'published_ts': 'INTEGER'})
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_published_ts ON articles(published_ts)')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS articles_published_ts_insert AFTER INSERT ON articles
+                    BEGIN
+                        UPDATE articles SET published_ts = CAST(strftime('%s', NEW.published_date) AS INTEGER)
+                        WHERE id = NEW.id;
+                    END
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS articles_published_ts_update AFTER UPDATE OF published_date ON articles
+                    BEGIN
+                        UPDATE articles SET published_ts = CAST(strftime('%s', NEW.published_date) AS INTEGER)
+                        WHERE id = NEW.id;
+                    END
+                ''')
+                cursor.execute('''
+                    UPDATE articles SET published_ts = CAST(strftime('%s', published_date) AS INTEGER)
+                    WHERE published_ts IS NULL AND published_date IS NOT NULL
+                ''')
+                
+                # Per-feed HTTP validators for conditional GETs, plus fetch health
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS feed_state (
+                        feed_url TEXT PRIMARY KEY,
+                        etag TEXT,
+                        last_modified TEXT,
+                        last_success DATETIME,
+                        last_attempt DATETIME,
+                        error_count INTEGER DEFAULT 0,
+                        last_error TEXT,
+                        high_water_link TEXT,
+                        high_water_published DATETIME,
+                        poll_interval REAL,
+                        publish_rate REAL,
+                        next_poll_ts INTEGER
+                    )
+                ''')
+                self._add_missing_columns(cursor, 'feed_state', {
+                    'high_water_link': 'TEXT',
+                    'high_water_published': 'DATETIME',
+                    'poll_interval': 'REAL',
+                    'publish_rate': 'REAL',
+                    'next_poll_ts': 'INTEGER',
+                })
+                
+                # Display text, cleaned once when the description or AI reasoning is written
+                self._add_missing_columns(cursor, 'articles', {'description_text': 'TEXT', 'reasoning_text': 'TEXT'})
+                self._backfill_display_text(cursor)
+                
+                # Near-duplicate clustering: MinHash signatures and LSH band buckets of recent articles
+                self._add_missing_columns(cursor, 'articles', {'cluster_id': 'INTEGER'})
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_cluster_id ON articles(cluster_id)')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS article_signatures (
+                        article_id INTEGER PRIMARY KEY,
+                        signature BLOB NOT NULL,
+                        created_ts INTEGER NOT NULL
+                    )
+                ''')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_article_signatures_created_ts ON article_signatures(created_ts)')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS article_lsh_buckets (
+                        band INTEGER NOT NULL,
+                        bucket INTEGER NOT NULL,
+                        article_id INTEGER NOT NULL,
+                        PRIMARY KEY (band, bucket, article_id)
+                    ) WITHOUT ROWID
+                ''')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_article_lsh_buckets_article_id ON article_lsh_buckets(article_id)')
+                
+                # Full-text index over the searchable columns, stored as an external-content table
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'articles_fts'")
+                fts_exists = cursor.fetchone() is not None
+                cursor.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                        title, description, author,
+                        content='articles', content_rowid='id',
+                        tokenize='porter unicode61', prefix='2 3'
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles
+                    BEGIN
+                        INSERT INTO articles_fts (rowid, title, description, author)
+                        VALUES (NEW.id, NEW.title, NEW.description, NEW.author);
+                    END
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles
+                    BEGIN
+                        INSERT INTO articles_fts (articles_fts, rowid, title, description, author)
+                        VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.author);
+                    END
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title, description, author ON articles
+                    BEGIN
+                        INSERT INTO articles_fts (articles_fts, rowid, title, description, author)
+                        VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.author);
+                        INSERT INTO articles_fts (rowid, title, description, author)
+                        VALUES (NEW.id, NEW.title, NEW.description, NEW.author);
+                    END
+                ''')
+                if not fts_exists:
+                    cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+                    logger.info("Built full-text index for existing articles")
+                
+                # Links of articles moved to the archive, so feeds still carrying them don't re-insert them
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS archived_links (
+                        link TEXT PRIMARY KEY,
+                        archived_ts INTEGER NOT NULL
+                    ) WITHOUT ROWID
+                ''')
+                
                 conn.commit()
                 logger.info("Database initialized successfully")
         except sqlite3.Error as e:
             logger.error(f"Error initializing database: {e}")
             raise
     
+    def _add_missing_columns(self, cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]):
+        """
+        Add columns introduced after a table was first created.
+        
+        Args:
+            cursor (sqlite3.Cursor): Cursor of the initializing connection
+            table (str): Table name
+            columns (dict): Column name to column definition
+        """
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row['name'] for row in cursor.fetchall()}
+        for name, definition in columns.items():
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+                logger.info(f"Added column {table}.{name}")
+    
+    def _backfill_display_text(self, cursor: sqlite3.Cursor):
+        """
+        Fill description_text and reasoning_text of rows stored before they existed.
+        
+        Args:
+            cursor (sqlite3.Cursor): Cursor of the initializing connection
+        """
+        cursor.execute('''
+            SELECT id, description, ai_reasoning FROM articles
+            WHERE (description_text IS NULL AND description IS NOT NULL)
+               OR (reasoning_text IS NULL AND ai_reasoning IS NOT NULL)
+        ''')
+        rows = [(plain_text(row['description'], DESCRIPTION_TEXT_LENGTH),
+                 plain_text(row['ai_reasoning'], REASONING_TEXT_LENGTH), row['id']) for row in cursor.fetchall()]
+        if rows:
+            cursor.executemany('UPDATE articles SET description_text = ?, reasoning_text = ? WHERE id = ?', rows)
+            logger.info(f"Filled display text of {len(rows)} articles")
+    
     def insert_article(self, title: str, link: str, description: str = None, 
                       author: str = None, published_date: datetime = None,
                       status: str = 'pending', ranking_score: float = 0.0,
@@ -96,9 +265,11 @@ class DatabaseHandler:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO articles 
-                    (title, link, description, author, published_date, status, ranking_score, ai_summary, ai_reasoning, updated_at, times_served)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
-                ''', (title, link, description, author, published_date, status, ranking_score, ai_summary, ai_reasoning, times_served))
+                    (title, link, description, author, published_date, status, ranking_score, ai_summary, ai_reasoning, updated_at, times_served,
+                     description_text, reasoning_text)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?, ?)
+                ''', (title, link, description, author, published_date, status, ranking_score, ai_summary, ai_reasoning, times_served,
+                      plain_text(description, DESCRIPTION_TEXT_LENGTH), plain_text(ai_reasoning, REASONING_TEXT_LENGTH)))
                 
                 article_id = cursor.lastrowid
                 conn.commit()
@@ -110,6 +281,45 @@ class DatabaseHandler:
         except sqlite3.Error as e:
             logger.error(f"Error inserting article: {e}")
             return None
+    def insert_articles(self, articles: List[Dict], status: str = 'pending') -> Dict[str, int]:
+        """
+        Insert a batch of articles in one transaction, skipping links already
+        stored or archived.
+        
+        Args:
+            articles (list): Article dictionaries with title, link, description,
+                author and published_date
+            status (str): Status given to the new articles (default: 'pending')
+            
+        Returns:
+            dict: Counts of 'inserted' and 'skipped' articles, and of articles in a
+                batch that 'failed' to be written (nothing is stored then)
+        """
+        if not articles:
+            return {'inserted': 0, 'skipped': 0, 'failed': 0}
+        
+        try:
+            with self.get_connection() as conn:
+                # rowcount counts only the INSERT itself, not rows the published_ts and FTS triggers touch
+                cursor = conn.executemany('''
+                    INSERT INTO articles
+                    (title, link, description, author, published_date, status, ranking_score, updated_at, times_served,
+                     description_text)
+                    SELECT ?, ?, ?, ?, ?, ?, 0.0, CURRENT_TIMESTAMP, 0, ?
+                    WHERE NOT EXISTS (SELECT 1 FROM archived_links WHERE link = ?)
+                    ON CONFLICT(link) DO NOTHING
+                ''', [(article['title'], article['link'], article.get('description'), article.get('author'),
+                       article.get('published_date'), status,
+                       plain_text(article.get('description'), DESCRIPTION_TEXT_LENGTH), article['link'])
+                      for article in articles])
+                inserted = max(cursor.rowcount, 0)
+                conn.commit()
+                logger.info(f"Inserted {inserted} of {len(articles)} articles")
+                return {'inserted': inserted, 'skipped': len(articles) - inserted, 'failed': 0}
+        except sqlite3.Error as e:
+            logger.error(f"Error inserting articles: {e}")
+            return {'inserted': 0, 'skipped': 0, 'failed': len(articles)}
+    
     def get_articles(self, status: str = None, min_ranking: float = None, order_by: str = 'published_date') -> List[Dict]:
         """
         Retrieve articles from the database.
@@ -263,6 +473,12 @@ class DatabaseHandler:
         # Add updated_at timestamp
         kwargs['updated_at'] = datetime.now().isoformat()
         
+        # Keep the display text in step with the raw fields it's cleaned from
+        if 'description' in kwargs:
+            kwargs['description_text'] = plain_text(kwargs['description'], DESCRIPTION_TEXT_LENGTH)
+        if 'ai_reasoning' in kwargs:
+            kwargs['reasoning_text'] = plain_text(kwargs['ai_reasoning'], REASONING_TEXT_LENGTH)
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -399,35 +615,50 @@ class DatabaseHandler:
             logger.error(f"Error retrieving top-ranked articles: {e}")
             return []
     
-    def search_articles(self, search_term: str, fields: List[str] = None) -> List[Dict]:
+    # Columns of articles_fts, in the order bm25() weights are given
+    SEARCH_FIELDS = ('title', 'description', 'author')
+    
+    def search_articles(self, search_term: str, fields: List[str] = None, limit: int = 50) -> List[Dict]:
         """
-        Search articles by a term in specified fields.
+        Search articles through the full-text index, best matches first.
+        
+        Every word of the search term must match, as a prefix ("elect" finds
+        "election"), and words are stemmed. Matches are ranked with bm25, with
+        titles weighted above authors and descriptions.
         
         Args:
-            search_term (str): Term to search for
+            search_term (str): Words to search for
             fields (list, optional): Fields to search in (default: ['title', 'description', 'author'])
+            limit (int): Maximum number of results
             
         Returns:
-            list: List of matching article dictionaries
+            list: Matching article dictionaries, each with a 'snippet' of the
+                matched text (matches wrapped in <mark>) and its bm25 'rank'
         """
         if fields is None:
-            fields = ['title', 'description', 'author']
+            fields = list(self.SEARCH_FIELDS)
+        fields = [field for field in fields if field in self.SEARCH_FIELDS]
+        
+        # Quote each word so user input can't be read as FTS5 query syntax
+        words = re.findall(r'\w+', search_term or '')
+        if not words or not fields:
+            return []
+        match = '{%s}: (%s)' % (' '.join(fields), ' '.join(f'"{word}"*' for word in words))
         
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Build WHERE clause for searching in multiple fields
-                conditions = [f"{field} LIKE ?" for field in fields]
-                where_clause = " OR ".join(conditions)
-                query = f'SELECT * FROM articles WHERE {where_clause} ORDER BY ranking_score DESC'
-                
-                # Prepare search parameters
-                search_params = [f'%{search_term}%' for _ in fields]
-                
-                cursor.execute(query, search_params)
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                cursor.execute('''
+                    SELECT a.*,
+                        snippet(articles_fts, -1, '<mark>', '</mark>', '...', 16) AS snippet,
+                        bm25(articles_fts, 10.0, 1.0, 2.0) AS rank
+                    FROM articles_fts
+                    JOIN articles a ON a.id = articles_fts.rowid
+                    WHERE articles_fts MATCH ?
+                    ORDER BY rank
+                    LIMIT ?
+                ''', (match, limit))
+                return [dict(row) for row in cursor.fetchall()]
         except sqlite3.Error as e:
             logger.error(f"Error searching articles: {e}")
             return []
@@ -494,6 +725,113 @@ class DatabaseHandler:
         except sqlite3.Error as e:
             logger.error(f"Error retrieving articles with summaries: {e}")
             return []
+    def get_top_scored_articles(self, limit: int = 20, min_ranking: float = 50.0,
+                                now: Optional[int] = None, window_days: Tuple[int, ...] = (7, 30),
+                                columns: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Get the best articles to serve, scored inside SQLite.
+        
+        adjusted_score = ranking_score / ((times_served + 1) * age_factor), where
+        age_factor is the article's age in whole days plus one (10 when the
+        publish date is unknown).
+        
+        Recent windows are tried first through the published_ts index. An
+        article older than a window has an age factor of at least window + 1,
+        so once the window's top `limit` all beat the best score any older
+        article could reach, the older rows are never read.
+        
+        Args:
+            limit (int): Number of articles to return
+            min_ranking (float): Minimum ranking score
+            now (int, optional): Current UNIX time (defaults to time.time())
+            window_days (tuple): Increasing recency windows to try before a full scan
+            columns (list, optional): Columns to return (default: all)
+            
+        Returns:
+            list: Article dictionaries with adjusted_score, best first
+        """
+        now = int(now if now is not None else time.time())
+        query = '''
+            SELECT {columns}, ranking_score / ((times_served + 1) *
+                CASE WHEN published_ts IS NULL THEN 10 ELSE MAX(1, (:now - published_ts) / 86400 + 1) END
+            ) AS adjusted_score
+            FROM articles
+            WHERE ranking_score >= :min_ranking {window}
+            ORDER BY adjusted_score DESC
+            LIMIT :limit
+        '''
+        params = {'now': now, 'min_ranking': min_ranking, 'limit': limit}
+        selected = ', '.join(columns) if columns else '*'
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT MAX(ranking_score) FROM articles')
+                best_ranking = cursor.fetchone()[0] or 0
+                
+                for days in window_days:
+                    cursor.execute(query.format(columns=selected, window='AND published_ts >= :since'),
+                                   dict(params, since=now - days * 86400))
+                    rows = [dict(row) for row in cursor.fetchall()]
+                    # Older or undated articles score at most best_ranking / min(days + 1, 10)
+                    if len(rows) == limit and rows[-1]['adjusted_score'] >= best_ranking / min(days + 1, 10):
+                        return rows
+                
+                cursor.execute(query.format(columns=selected, window=''), params)
+                return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving top scored articles: {e}")
+            return []
+    
+    def increment_times_served_many(self, article_ids: List[int]) -> int:
+        """
+        Increment the times served count of several articles in one statement.
+        
+        Args:
+            article_ids (list): Article IDs
+            
+        Returns:
+            int: Number of articles updated
+        """
+        if not article_ids:
+            return 0
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                placeholders = ','.join(['?'] * len(article_ids))
+                cursor.execute(f'UPDATE articles SET times_served = times_served + 1 WHERE id IN ({placeholders})',
+                               list(article_ids))
+                conn.commit()
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Error incrementing times served: {e}")
+            return 0
+    
+    def add_times_served(self, counts: Dict[int, int]) -> int:
+        """
+        Add accumulated serve counts to several articles in one transaction.
+        
+        Args:
+            counts (dict): Article ID to number of times it was served
+            
+        Returns:
+            int: Number of articles updated
+        """
+        if not counts:
+            return 0
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany('UPDATE articles SET times_served = times_served + ? WHERE id = ?',
+                                   [(count, article_id) for article_id, count in counts.items()])
+                conn.commit()
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Error adding times served: {e}")
+            return 0
+    
     def increment_times_served(self, article_id: int) -> bool:
         """
         Increment the times served count for an article.
@@ -520,9 +858,391 @@ class DatabaseHandler:
             logger.error(f"Error incrementing times served for article {article_id}: {e}")
             return False
 
+    def get_feed_state(self, feed_url: str) -> Optional[Dict]:
+        """
+        Retrieve the fetch state of a feed.
+        
+        Args:
+            feed_url (str): The feed URL
+            
+        Returns:
+            dict or None: Feed state dictionary or None if the feed was never fetched
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM feed_state WHERE feed_url = ?', (feed_url,))
+                row = cursor.fetchone()
+                return dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving state for feed {feed_url}: {e}")
+            return None
+    
+    def record_feed_success(self, feed_url: str, etag: str = None, last_modified: str = None) -> bool:
+        """
+        Record a successful fetch of a feed (including a 304 Not Modified).
+        
+        Args:
+            feed_url (str): The feed URL
+            etag (str, optional): ETag header of the response
+            last_modified (str, optional): Last-Modified header of the response
+            
+        Returns:
+            bool: True if the state was saved, False otherwise
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO feed_state (feed_url, etag, last_modified, last_success, last_attempt, error_count)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, 0)
+                    ON CONFLICT(feed_url) DO UPDATE SET
+                        etag = COALESCE(excluded.etag, etag),
+                        last_modified = COALESCE(excluded.last_modified, last_modified),
+                        last_success = CURRENT_TIMESTAMP,
+                        last_attempt = CURRENT_TIMESTAMP,
+                        error_count = 0,
+                        last_error = NULL
+                ''', (feed_url, etag, last_modified))
+                conn.commit()
+                return True
+        except sqlite3.Error as e:
+            logger.error(f"Error saving state for feed {feed_url}: {e}")
+            return False
+    
+    def update_feed_high_water(self, feed_url: str, link: Optional[str], published: Optional[datetime]) -> bool:
+        """
+        Save the newest entry ingested from a feed, or clear it with None.
+        
+        Args:
+            feed_url (str): The feed URL
+            link (str, optional): Link of the newest ingested entry
+            published (datetime, optional): Publish time of the newest ingested entry
+            
+        Returns:
+            bool: True if the state was saved, False otherwise
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('UPDATE feed_state SET high_water_link = ?, high_water_published = ? WHERE feed_url = ?',
+                               (link, published, feed_url))
+                conn.commit()
+                return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            logger.error(f"Error saving high-water mark for feed {feed_url}: {e}")
+            return False
+    
+    def update_feed_schedule(self, feed_url: str, poll_interval: float, publish_rate: Optional[float],
+                             next_poll_ts: int) -> bool:
+        """
+        Save a feed's learned polling schedule.
+        
+        Args:
+            feed_url (str): The feed URL
+            poll_interval (float): Seconds between polls
+            publish_rate (float or None): Smoothed new articles per second, None if not yet known
+            next_poll_ts (int): UNIX time of the next poll
+            
+        Returns:
+            bool: True if the schedule was saved, False otherwise
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO feed_state (feed_url, poll_interval, publish_rate, next_poll_ts)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(feed_url) DO UPDATE SET
+                        poll_interval = excluded.poll_interval,
+                        publish_rate = excluded.publish_rate,
+                        next_poll_ts = excluded.next_poll_ts
+                ''', (feed_url, poll_interval, publish_rate, next_poll_ts))
+                conn.commit()
+                return True
+        except sqlite3.Error as e:
+            logger.error(f"Error saving schedule for feed {feed_url}: {e}")
+            return False
+    
+    def record_feed_error(self, feed_url: str, error: str) -> bool:
+        """
+        Record a failed fetch of a feed.
+        
+        Args:
+            feed_url (str): The feed URL
+            error (str): Description of the failure
+            
+        Returns:
+            bool: True if the state was saved, False otherwise
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO feed_state (feed_url, last_attempt, error_count, last_error)
+                    VALUES (?, CURRENT_TIMESTAMP, 1, ?)
+                    ON CONFLICT(feed_url) DO UPDATE SET
+                        last_attempt = CURRENT_TIMESTAMP,
+                        error_count = error_count + 1,
+                        last_error = excluded.last_error
+                ''', (feed_url, error))
+                conn.commit()
+                return True
+        except sqlite3.Error as e:
+            logger.error(f"Error saving state for feed {feed_url}: {e}")
+            return False
+
+    def get_unclustered_articles(self, since_ts: int) -> List[Dict]:
+        """
+        Get articles stored since a time that haven't been assigned a cluster yet.
+        
+        Args:
+            since_ts (int): UNIX time; older unclustered articles are left alone
+            
+        Returns:
+            list: Dictionaries with id, title, description and status, oldest first
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, title, description, status FROM articles
+                    WHERE cluster_id IS NULL AND created_at >= datetime(?, 'unixepoch')
+                    ORDER BY id
+                ''', (since_ts,))
+                return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving unclustered articles: {e}")
+            return []
+    
+    def get_lsh_candidates(self, buckets: List[Tuple[int, int]], since_ts: int) -> List[Dict]:
+        """
+        Get recent articles sharing at least one LSH bucket.
+        
+        Args:
+            buckets (list): (band, bucket) pairs of the article being clustered
+            since_ts (int): Ignore signatures stored before this UNIX time
+            
+        Returns:
+            list: Dictionaries with article_id, signature and cluster_id
+        """
+        if not buckets:
+            return []
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                matches = ' OR '.join(['(b.band = ? AND b.bucket = ?)'] * len(buckets))
+                cursor.execute(f'''
+                    SELECT DISTINCT s.article_id, s.signature, a.cluster_id
+                    FROM article_lsh_buckets b
+                    JOIN article_signatures s ON s.article_id = b.article_id
+                    JOIN articles a ON a.id = s.article_id
+                    WHERE ({matches}) AND s.created_ts >= ?
+                ''', [value for pair in buckets for value in pair] + [since_ts])
+                return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving LSH candidates: {e}")
+            return []
+    
+    def save_article_clusters(self, assignments: List[Dict]) -> bool:
+        """
+        Store cluster assignments, signatures and LSH buckets in one transaction.
+        
+        Args:
+            assignments (list): Dictionaries with id, cluster_id, status,
+                signature (bytes), buckets ((band, bucket) pairs) and created_ts
+                
+        Returns:
+            bool: True if everything was stored, False otherwise
+        """
+        if not assignments:
+            return True
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    UPDATE articles SET cluster_id = ?, status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+                ''', [(item['cluster_id'], item['status'], item['id']) for item in assignments])
+                cursor.executemany(
+                    'INSERT OR REPLACE INTO article_signatures (article_id, signature, created_ts) VALUES (?, ?, ?)',
+                    [(item['id'], item['signature'], item['created_ts']) for item in assignments if item['signature']])
+                cursor.executemany(
+                    'INSERT OR IGNORE INTO article_lsh_buckets (band, bucket, article_id) VALUES (?, ?, ?)',
+                    [(band, bucket, item['id']) for item in assignments for band, bucket in item['buckets']])
+                conn.commit()
+                return True
+        except sqlite3.Error as e:
+            logger.error(f"Error saving article clusters: {e}")
+            return False
+    
+    def prune_article_signatures(self, before_ts: int) -> int:
+        """
+        Drop signatures and LSH buckets stored before a time.
+        
+        Unclustered articles stored before then become clusters of their own,
+        so they stop showing up in get_unclustered_articles.
+        
+        Args:
+            before_ts (int): UNIX time; older signatures are deleted
+            
+        Returns:
+            int: Number of signatures deleted
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    DELETE FROM article_lsh_buckets WHERE article_id IN
+                    (SELECT article_id FROM article_signatures WHERE created_ts < ?)
+                ''', (before_ts,))
+                cursor.execute('DELETE FROM article_signatures WHERE created_ts < ?', (before_ts,))
+                deleted = cursor.rowcount
+                cursor.execute('''
+                    UPDATE articles SET cluster_id = id
+                    WHERE cluster_id IS NULL AND created_at < datetime(?, 'unixepoch')
+                ''', (before_ts,))
+                conn.commit()
+                return deleted
+        except sqlite3.Error as e:
+            logger.error(f"Error pruning article signatures: {e}")
+            return 0
+
+    def archive_articles(self, archive_path: str, dead_statuses: List[str], dead_before_ts: int,
+                         aged_before_ts: int, dead_status_prefixes: Optional[List[str]] = None,
+                         batch_size: int = 1000) -> int:
+        """
+        Move articles that will never be served again into an archive database.
+        
+        Articles are archived when their status is one of dead_statuses or
+        starts with one of dead_status_prefixes and they haven't changed since
+        dead_before_ts, or when they were stored before aged_before_ts. Each batch is copied and
+        deleted in one transaction, and the archived links are remembered so
+        the aggregator doesn't store them again.
+        
+        Args:
+            archive_path (str): Path to the archive SQLite database (created if missing)
+            dead_statuses (list): Statuses of articles that won't be ranked or served
+            dead_before_ts (int): UNIX time before which dead articles are archived
+            aged_before_ts (int): UNIX time before which every article is archived
+            dead_status_prefixes (list, optional): Status prefixes of such articles (e.g. 'error')
+            batch_size (int): Articles moved per transaction
+            
+        Returns:
+            int: Number of articles archived
+        """
+        archived = 0
+        try:
+            with self.get_connection() as conn:
+                conn.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+                try:
+                    self._sync_archive_schema(conn)
+                    columns = ', '.join(row['name'] for row in conn.execute('PRAGMA main.table_info(articles)'))
+                
+                    prefixes = list(dead_status_prefixes or [])
+                    dead_conditions = [f"status IN ({','.join(['?'] * len(dead_statuses))})"]
+                    dead_conditions += ["substr(status, 1, ?) = ?"] * len(prefixes)
+                    cursor = conn.execute(f'''
+                        SELECT id FROM articles
+                        WHERE (({' OR '.join(dead_conditions)})
+                               AND datetime(updated_at) < datetime(?, 'unixepoch'))
+                           OR datetime(created_at) < datetime(?, 'unixepoch')
+                    ''', list(dead_statuses) + [value for prefix in prefixes for value in (len(prefix), prefix)]
+                        + [dead_before_ts, aged_before_ts])
+                    article_ids = [row[0] for row in cursor.fetchall()]
+                
+                    for i in range(0, len(article_ids), batch_size):
+                        batch = article_ids[i:i + batch_size]
+                        id_list = ','.join(['?'] * len(batch))
+                        with conn:
+                            conn.execute(f'''
+                                INSERT OR REPLACE INTO archive.articles ({columns}, archived_at)
+                                SELECT {columns}, CURRENT_TIMESTAMP FROM main.articles WHERE id IN ({id_list})
+                            ''', batch)
+                            conn.execute(f'''
+                                INSERT OR IGNORE INTO archived_links (link, archived_ts)
+                                SELECT link, CAST(strftime('%s', 'now') AS INTEGER) FROM articles WHERE id IN ({id_list})
+                            ''', batch)
+                            conn.execute(f'DELETE FROM articles WHERE id IN ({id_list})', batch)
+                        archived += len(batch)
+                finally:
+                    conn.execute('DETACH DATABASE archive')
+            
+            if archived:
+                logger.info(f"Archived {archived} articles to {archive_path}")
+            return archived
+        except sqlite3.Error as e:
+            logger.error(f"Error archiving articles: {e}")
+            return archived
+    
+    def _sync_archive_schema(self, conn: sqlite3.Connection):
+        """
+        Create the archive's articles table, or add columns the hot table gained since.
+        
+        Args:
+            conn (sqlite3.Connection): Connection with the archive attached as 'archive'
+        """
+        columns = [(row['name'], row['type']) for row in conn.execute('PRAGMA main.table_info(articles)')]
+        definitions = ', '.join(f'{name} {type_}' + (' PRIMARY KEY' if name == 'id' else '')
+                                for name, type_ in columns)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS archive.articles ({definitions}, archived_at DATETIME)')
+        existing = {row['name'] for row in conn.execute('PRAGMA archive.table_info(articles)')}
+        for name, type_ in columns:
+            if name not in existing:
+                conn.execute(f'ALTER TABLE archive.articles ADD COLUMN {name} {type_}')
+        conn.commit()
+    
+    def prune_archived_links(self, before_ts: int) -> int:
+        """
+        Forget archived links older than a time, once feeds no longer carry them.
+        
+        Args:
+            before_ts (int): UNIX time; links archived before it are deleted
+            
+        Returns:
+            int: Number of links deleted
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM archived_links WHERE archived_ts < ?', (before_ts,))
+                deleted = cursor.rowcount
+                conn.commit()
+                return deleted
+        except sqlite3.Error as e:
+            logger.error(f"Error pruning archived links: {e}")
+            return 0
+    
+    def compact(self, analyze: bool = True) -> bool:
+        """
+        Return free pages to the filesystem and refresh the query planner statistics.
+        
+        Only the pages freed since the last call are released (the database
+        is switched to incremental auto-vacuum in init_database), so this
+        never rewrites the whole file.
+        
+        Args:
+            analyze (bool): Also run ANALYZE
+            
+        Returns:
+            bool: True if the maintenance ran, False otherwise
+        """
+        try:
+            with self.get_connection() as conn:
+                conn.commit()
+                conn.execute('PRAGMA incremental_vacuum').fetchall()
+                if analyze:
+                    conn.execute('ANALYZE')
+                    conn.commit()
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error compacting database: {e}")
+            return False
+    
     def close(self):
         """
-        Close the database connection (if using persistent connections).
-        Currently not needed since we use context managers.
+        Close the database's idle pooled connections.
         """
-        pass
+        self.database.close_idle()
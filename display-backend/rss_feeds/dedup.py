@@ -0,0 +1,191 @@
+import re
+import time
+import zlib
+import random
+import logging
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+from .db_handler import DatabaseHandler
+from .text import plain_text
+
+logger = logging.getLogger(__name__)
+
+# Hash family h(x) = (a * x + b) mod p over 32-bit shingle hashes
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def normalize_text(text: Optional[str]) -> List[str]:
+    """
+    Lowercased words of a title or description, without markup or punctuation.
+
+    Args:
+        text (str): Raw feed text (may contain HTML and entities)
+
+    Returns:
+        List[str]: The words in order
+    """
+    text = plain_text(text)
+    if not text:
+        return []
+    return _WORD_PATTERN.findall(text.lower())
+
+
+def shingles(words: List[str], size: int = 2) -> Set[int]:
+    """
+    Hash the overlapping word n-grams of a text.
+
+    Args:
+        words (list): Normalized words
+        size (int): Words per shingle
+
+    Returns:
+        Set[int]: 32-bit shingle hashes
+    """
+    if len(words) < size:
+        return {zlib.crc32(' '.join(words).encode())} if words else set()
+    return {zlib.crc32(' '.join(words[i:i + size]).encode()) for i in range(len(words) - size + 1)}
+
+
+class DuplicateDetector:
+    """
+    Clusters near-duplicate articles (the same story from several feeds).
+    
+    Each article gets a MinHash signature over the word shingles of its title
+    and description. Signatures are split into bands and each band is hashed
+    into an LSH bucket stored in the articles database, so a new article is
+    only compared against the recent articles sharing one of its buckets.
+    With the defaults (16 bands of 4 rows) pairs above about 0.5 Jaccard
+    similarity are found with high probability, and buckets older than the
+    window are pruned, so clustering cost per article doesn't grow with the
+    size of the database.
+    
+    The first article of a cluster is its representative; later members are
+    marked 'duplicate' while still pending, so only the representative is
+    sent to the ranker.
+    """
+    
+    def __init__(self, db_handler: DatabaseHandler, num_perm: int = 64, bands: int = 16,
+                 threshold: float = 0.6, window_hours: float = 72, seed: int = 1):
+        """
+        Initialize the duplicate detector.
+        
+        Args:
+            db_handler (DatabaseHandler): Handler of the articles database
+            num_perm (int): MinHash signature length
+            bands (int): Number of LSH bands (must divide num_perm)
+            threshold (float): Estimated Jaccard similarity at which articles are merged
+            window_hours (float): How far back new articles are compared
+            seed (int): Seed of the hash family (changing it invalidates stored signatures)
+        """
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm")
+        self.db_handler = db_handler
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.window_seconds = int(window_hours * 3600)
+        
+        rng = random.Random(seed)
+        self._hash_params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+    
+    def signature(self, title: Optional[str], description: Optional[str]) -> Optional[array]:
+        """
+        Compute the MinHash signature of an article.
+        
+        Args:
+            title (str): Article title
+            description (str): Article description
+        
+        Returns:
+            array or None: num_perm unsigned 32-bit minimums, or None if the article has no text
+        """
+        hashes = shingles(normalize_text(title) + normalize_text(description))
+        if not hashes:
+            return None
+        return array('I', [min((a * x + b) % _PRIME for x in hashes) & _MAX_HASH
+                           for a, b in self._hash_params])
+    
+    def buckets(self, signature: array) -> List[Tuple[int, int]]:
+        """
+        Get the LSH bucket of each band of a signature.
+        
+        Args:
+            signature (array): MinHash signature
+        
+        Returns:
+            list: (band, bucket) pairs
+        """
+        return [(band, zlib.crc32(signature[band * self.rows:(band + 1) * self.rows].tobytes()))
+                for band in range(self.bands)]
+    
+    @staticmethod
+    def similarity(first: array, second: array) -> float:
+        """
+        Estimate the Jaccard similarity of two articles from their signatures.
+        """
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+    
+    def cluster_new_articles(self) -> int:
+        """
+        Assign every recently stored, unclustered article to a cluster.
+        
+        Returns:
+            int: Number of articles marked as duplicates
+        """
+        now = int(time.time())
+        since_ts = now - self.window_seconds
+        articles = self.db_handler.get_unclustered_articles(since_ts)
+        if not articles:
+            self.db_handler.prune_article_signatures(since_ts)
+            return 0
+        
+        # Articles clustered in this call aren't stored yet, so they are matched in memory
+        batch_buckets: Dict[Tuple[int, int], List[Dict]] = {}
+        assignments = []
+        duplicates = 0
+        
+        for article in articles:
+            signature = self.signature(article['title'], article['description'])
+            if signature is None:
+                assignments.append({'id': article['id'], 'cluster_id': article['id'], 'status': article['status'],
+                                    'signature': b'', 'buckets': [], 'created_ts': now})
+                continue
+            buckets = self.buckets(signature)
+            
+            candidates = self.db_handler.get_lsh_candidates(buckets, since_ts)
+            for candidate in candidates:
+                candidate['signature'] = array('I', candidate['signature'])
+            for bucket in buckets:
+                candidates.extend(batch_buckets.get(bucket, []))
+            
+            best, best_similarity = None, self.threshold
+            for candidate in candidates:
+                similarity = self.similarity(signature, candidate['signature'])
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+            
+            status = article['status']
+            if best is None:
+                cluster_id = article['id']
+            else:
+                cluster_id = best['cluster_id']
+                if status == 'pending':
+                    status = 'duplicate'
+                    duplicates += 1
+                logger.debug(f"Article {article['id']} joins cluster {cluster_id} ({best_similarity:.2f} similar)")
+            
+            entry = {'article_id': article['id'], 'signature': signature, 'cluster_id': cluster_id}
+            for bucket in buckets:
+                batch_buckets.setdefault(bucket, []).append(entry)
+            assignments.append({'id': article['id'], 'cluster_id': cluster_id, 'status': status,
+                                'signature': signature.tobytes(), 'buckets': buckets, 'created_ts': now})
+        
+        self.db_handler.save_article_clusters(assignments)
+        self.db_handler.prune_article_signatures(since_ts)
+        logger.info(f"Clustered {len(assignments)} new articles, {duplicates} duplicates")
+        return duplicates
@@ -0,0 +1,174 @@
+import time
+import heapq
+import atexit
+import logging
+import threading
+from typing import List, Dict, Optional
+
+from .db_handler import DatabaseHandler
+
+logger = logging.getLogger(__name__)
+
+# Columns read per candidate: what scoring needs plus the display text
+CANDIDATE_COLUMNS = ['id', 'title', 'author', 'published_date', 'published_ts', 'ranking_score', 'times_served',
+                     'description_text', 'reasoning_text']
+
+
+class NewsCache:
+    """
+    In-memory candidate list behind /get_news.
+    
+    The best candidate_count articles are loaded once per aggregate-and-rank
+    cycle (or when the list gets stale), and each request scores just those
+    with the same formula as DatabaseHandler.get_top_scored_articles. Serve
+    counts are applied to the candidates immediately and written to the
+    database in the background. Responses carry only the fields the News
+    screen shows, using the plain-text columns cleaned at ingest.
+    """
+    
+    def __init__(self, db_path: str = "articles.db", candidate_count: int = 200, min_ranking: float = 50.0,
+                 max_age: float = 1800, flush_interval: float = 30):
+        """
+        Initialize the news cache.
+        
+        Args:
+            db_path (str): Path to the SQLite database file
+            candidate_count (int): Number of articles kept in memory
+            min_ranking (float): Minimum ranking score of a candidate
+            max_age (float): Seconds after which the candidates are reloaded
+            flush_interval (float): Seconds between writes of pending serve counts
+        """
+        self.db_handler = DatabaseHandler(db_path)
+        self.candidate_count = candidate_count
+        self.min_ranking = min_ranking
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        
+        self._lock = threading.Lock()
+        # Held while flushing or reloading, so a flush can't land between a reload's flush and its query
+        self._load_lock = threading.Lock()
+        self._candidates: List[Dict] = []
+        self._floor = 0.0
+        self._loaded_at: Optional[float] = None
+        self._pending: Dict[int, int] = {}
+        self._flush_thread: Optional[threading.Thread] = None
+        atexit.register(self.flush)
+    
+    def refresh(self):
+        """
+        Reload the candidates from the database, after writing pending serve counts.
+        """
+        with self._load_lock:
+            self._reload()
+    
+    def _refresh_unless_reloaded(self, loaded_at: Optional[float]):
+        # Concurrent requests that all saw the same list only reload it once
+        with self._load_lock:
+            if self._loaded_at == loaded_at:
+                self._reload()
+    
+    def _reload(self):
+        self._flush()
+        candidates = self.db_handler.get_top_scored_articles(limit=self.candidate_count,
+                                                             min_ranking=self.min_ranking,
+                                                             columns=CANDIDATE_COLUMNS)
+        for article in candidates:
+            article['payload'] = self._payload(article)
+        # Scores only fall as articles are served, so once the best picks drop
+        # below what the first excluded article had, the list must be reloaded
+        floor = candidates[-1]['adjusted_score'] if len(candidates) == self.candidate_count else 0.0
+        with self._lock:
+            # Serves counted since the flush above aren't in the database yet
+            for article in candidates:
+                article['times_served'] += self._pending.get(article['id'], 0)
+            self._candidates = candidates
+            self._floor = floor
+            self._loaded_at = time.time()
+        logger.info(f"Loaded {len(candidates)} news candidates")
+    
+    def pick(self, number: int = 20) -> List[Dict]:
+        """
+        Get the articles to serve and count them as served.
+        
+        Args:
+            number (int): Number of articles to return
+            
+        Returns:
+            List[Dict]: Articles with id, title, description, author,
+                published_date, ranking_score and ai_reasoning, best first
+        """
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.time() - loaded_at > self.max_age:
+            self._refresh_unless_reloaded(loaded_at)
+        self._start_flush_thread()
+        
+        now = int(time.time())
+        loaded_at = self._loaded_at
+        result = self._take(number, now)
+        if result is None:
+            # An article outside the candidates may now beat the last pick
+            self._refresh_unless_reloaded(loaded_at)
+            result = self._take(number, now, force=True)
+        return result
+    
+    def _take(self, number: int, now: int, force: bool = False) -> Optional[List[Dict]]:
+        with self._lock:
+            picked = heapq.nlargest(number, self._candidates, key=lambda article: self._score(article, now))
+            if not force and picked and self._score(picked[-1], now) < self._floor:
+                return None
+            
+            result = []
+            for article in picked:
+                result.append(article['payload'])
+                article['times_served'] += 1
+                self._pending[article['id']] = self._pending.get(article['id'], 0) + 1
+            return result
+    
+    @staticmethod
+    def _payload(article: Dict) -> Dict:
+        return {
+            'id': article['id'],
+            'title': article['title'],
+            'description': article['description_text'],
+            'author': article['author'],
+            'published_date': article['published_date'],
+            'ranking_score': article['ranking_score'],
+            'ai_reasoning': article['reasoning_text'],
+        }
+    
+    @staticmethod
+    def _score(article: Dict, now: int) -> float:
+        if article['published_ts'] is None:
+            age_factor = 10
+        else:
+            age_factor = max(1, int((now - article['published_ts']) / 86400) + 1)
+        return article['ranking_score'] / ((article['times_served'] + 1) * age_factor)
+    
+    def flush(self):
+        """
+        Write pending serve counts to the database.
+        """
+        with self._load_lock:
+            self._flush()
+    
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self.db_handler.add_times_served(pending)
+    
+    def _start_flush_thread(self):
+        if self._flush_thread is not None:
+            return
+        with self._lock:
+            if self._flush_thread is None:
+                self._flush_thread = threading.Thread(target=self._flush_loop, name='news-flush', daemon=True)
+                self._flush_thread.start()
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error writing news serve counts: {e}")
@@ -0,0 +1,96 @@
+import os
+import glob
+import time
+import logging
+from typing import Dict, Optional
+
+from .db_handler import DatabaseHandler
+
+logger = logging.getLogger(__name__)
+
+
+class ArticleRetention:
+    """
+    Keeps the articles table down to what can still be ranked or served.
+    
+    Each run moves tossed, errored, duplicate and aged-out articles into an
+    archive database, deletes old ranking_debug_*.json files, and then
+    releases the freed pages (incremental VACUUM) and refreshes the planner
+    statistics (ANALYZE).
+    """
+    
+    DEAD_STATUSES = ('tossed', 'duplicate')
+    # The ranker marks articles it couldn't handle 'error_<reason>'
+    DEAD_STATUS_PREFIXES = ('error',)
+    
+    def __init__(self, db_path: str = "articles.db", archive_path: Optional[str] = None,
+                 dead_after_days: float = 3, serving_window_days: float = 30, link_memory_days: float = 180,
+                 debug_dir: str = ".", debug_max_age_days: float = 3, interval: float = 86400):
+        """
+        Initialize the retention job.
+        
+        Args:
+            db_path (str): Path to the SQLite database file
+            archive_path (str, optional): Archive database (defaults to <db name>_archive.db next to it)
+            dead_after_days (float): Days a tossed, errored or duplicate article stays in the hot table
+                (at least the duplicate detector's window, so late copies still find their cluster)
+            serving_window_days (float): Days after which any article is archived
+            link_memory_days (float): Days archived links are remembered to keep them from being re-inserted
+            debug_dir (str): Directory the ranker writes ranking_debug_*.json files to
+            debug_max_age_days (float): Days debug files are kept
+            interval (float): Seconds between runs of run_if_due
+        """
+        self.db_handler = DatabaseHandler(db_path)
+        if archive_path is None:
+            root, ext = os.path.splitext(db_path)
+            archive_path = f"{root}_archive{ext or '.db'}"
+        self.archive_path = archive_path
+        self.dead_after = dead_after_days * 86400
+        self.serving_window = serving_window_days * 86400
+        self.link_memory = link_memory_days * 86400
+        self.debug_dir = debug_dir
+        self.debug_max_age = debug_max_age_days * 86400
+        self.interval = interval
+        self._last_run: Optional[float] = None
+    
+    def run_if_due(self) -> Optional[Dict[str, int]]:
+        """
+        Run the job if it hasn't run in the last interval seconds.
+        
+        Returns:
+            dict or None: Statistics of the run, or None if it wasn't due
+        """
+        if self._last_run is not None and time.time() - self._last_run < self.interval:
+            return None
+        return self.run()
+    
+    def run(self) -> Dict[str, int]:
+        """
+        Archive, clean up and compact.
+        
+        Returns:
+            Dict[str, int]: Numbers of articles archived, links forgotten and debug files deleted
+        """
+        self._last_run = now = time.time()
+        stats = {
+            'articles_archived': self.db_handler.archive_articles(
+                self.archive_path, list(self.DEAD_STATUSES),
+                dead_before_ts=int(now - self.dead_after), aged_before_ts=int(now - self.serving_window),
+                dead_status_prefixes=list(self.DEAD_STATUS_PREFIXES)),
+            'links_forgotten': self.db_handler.prune_archived_links(int(now - self.link_memory)),
+            'debug_files_deleted': self._delete_debug_files(now),
+        }
+        self.db_handler.compact()
+        logger.info(f"Article retention completed in {time.time() - now:.1f}s. Stats: {stats}")
+        return stats
+    
+    def _delete_debug_files(self, now: float) -> int:
+        deleted = 0
+        for path in glob.glob(os.path.join(self.debug_dir, 'ranking_debug_*.json')):
+            try:
+                if now - os.path.getmtime(path) > self.debug_max_age:
+                    os.remove(path)
+                    deleted += 1
+            except OSError as e:
+                logger.warning(f"Could not delete {path}: {e}")
+        return deleted
@@ -0,0 +1,176 @@
+import time
+import heapq
+import random
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .aggregator import RSSAggregator
+
+logger = logging.getLogger(__name__)
+
+
+class FeedScheduler:
+    """
+    Polls each feed on its own interval, learned from how often it publishes.
+    
+    Feeds wait in a priority queue ordered by their next poll time. After
+    each poll the number of new articles over the time since the previous
+    poll updates an exponentially weighted estimate of the feed's publish
+    rate, and the next interval is the time expected to bring target_items
+    new articles, clamped to [min_interval, max_interval] and jittered so
+    feeds don't stay in lockstep. Failed downloads back off by doubling the
+    interval. Schedules are saved in feed_state, so they survive restarts.
+    """
+    
+    def __init__(self, aggregator: RSSAggregator, on_new_articles: Optional[Callable[[], None]] = None,
+                 min_interval: float = 300, max_interval: float = 6 * 3600, default_interval: float = 1800,
+                 target_items: float = 1.0, smoothing: float = 0.3, jitter: float = 0.1, batch_window: float = 60):
+        """
+        Initialize the scheduler (nothing runs until start()).
+        
+        Args:
+            aggregator (RSSAggregator): Fetches and stores the feeds
+            on_new_articles (callable, optional): Called after the first batch of polls and
+                after every batch that stored new articles
+            min_interval (float): Shortest time between polls of a feed, in seconds
+            max_interval (float): Longest time between polls of a feed, in seconds
+            default_interval (float): Interval of feeds without a learned rate
+            target_items (float): New articles a poll should find on average
+            smoothing (float): Weight of the latest observation in the publish rate (0-1)
+            jitter (float): Relative random spread applied to each interval
+            batch_window (float): Feeds due within this many seconds are fetched together
+        """
+        self.aggregator = aggregator
+        self.db_handler = aggregator.db_handler
+        self.on_new_articles = on_new_articles
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        self.target_items = target_items
+        self.smoothing = smoothing
+        self.jitter = jitter
+        self.batch_window = batch_window
+        
+        self._feeds: Dict[str, Dict] = {feed['url']: feed for feed in aggregator.feeds if feed.get('url')}
+        self._queue: List[Tuple[float, str]] = []
+        self._intervals: Dict[str, float] = {}
+        self._rates: Dict[str, Optional[float]] = {}
+        self._last_poll: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._first_batch = True
+        self._load_schedules(time.time())
+    
+    def _load_schedules(self, now: float):
+        for url in self._feeds:
+            state = self.db_handler.get_feed_state(url) or {}
+            interval = state.get('poll_interval') or self.default_interval
+            self._intervals[url] = interval
+            self._rates[url] = state.get('publish_rate')
+            next_poll = state.get('next_poll_ts')
+            if next_poll:
+                self._last_poll[url] = next_poll - interval
+            heapq.heappush(self._queue, (max(now, next_poll or now), url))
+    
+    def next_interval(self, url: str, new_articles: Optional[int], now: float) -> float:
+        """
+        Update a feed's publish rate from a poll and get the time until its next poll.
+        
+        Args:
+            url (str): Feed URL
+            new_articles (int or None): New articles the poll stored, None if it failed
+            now (float): UNIX time of the poll
+        
+        Returns:
+            float: Seconds until the next poll, before jitter
+        """
+        interval = self._intervals.get(url, self.default_interval)
+        if new_articles is None:
+            return min(self.max_interval, interval * 2)
+        
+        last_poll = self._last_poll.get(url)
+        # The first poll after a fresh start finds a whole backlog, which says nothing about the rate
+        if last_poll is not None and now > last_poll:
+            observed = new_articles / (now - last_poll)
+            rate = self._rates.get(url)
+            self._rates[url] = observed if rate is None else self.smoothing * observed + (1 - self.smoothing) * rate
+        
+        rate = self._rates.get(url)
+        if rate is None:
+            return self.default_interval
+        if rate <= 0:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, self.target_items / rate))
+    
+    def run_pending(self, now: Optional[float] = None) -> Optional[Dict[str, int]]:
+        """
+        Poll every feed that is due (or will be within batch_window) in one batch.
+        
+        Args:
+            now (float, optional): Current UNIX time (defaults to time.time())
+        
+        Returns:
+            dict or None: Aggregation statistics, or None if no feed was due
+        """
+        live = now is None
+        now = time.time() if live else now
+        due = []
+        while self._queue and self._queue[0][0] <= now + self.batch_window:
+            due.append(heapq.heappop(self._queue)[1])
+        if not due:
+            return None
+        
+        new_counts: Dict[str, Optional[int]] = {}
+        try:
+            stats = self.aggregator.aggregate_feeds([self._feeds[url] for url in due], new_counts)
+        finally:
+            # Due feeds are off the queue; put them back even if the batch raised, and
+            # back off the ones it didn't get to as if their download had failed
+            self._reschedule(due, new_counts, time.time() if live else now)
+        
+        # The first batch also handles articles left pending by a previous run
+        first_batch, self._first_batch = self._first_batch, False
+        if (stats['articles_stored'] or first_batch) and self.on_new_articles:
+            try:
+                self.on_new_articles()
+            except Exception as e:
+                logger.error(f"Error handling new articles: {e}")
+        return stats
+    
+    def _reschedule(self, due: List[str], new_counts: Dict[str, Optional[int]], polled_at: float):
+        for url in due:
+            interval = self.next_interval(url, new_counts.get(url), polled_at)
+            self._intervals[url] = interval
+            if new_counts.get(url) is not None:
+                self._last_poll[url] = polled_at
+            next_poll = polled_at + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            heapq.heappush(self._queue, (next_poll, url))
+            self.db_handler.update_feed_schedule(url, interval, self._rates.get(url), int(next_poll))
+            logger.debug(f"Next poll of {url} in {next_poll - polled_at:.0f}s")
+    
+    def start(self):
+        """
+        Start polling in a background thread.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='feed-scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"Started feed scheduler for {len(self._feeds)} feeds")
+    
+    def stop(self):
+        """
+        Stop the polling thread after its current batch.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Error polling feeds: {e}")
+            wait = self._queue[0][0] - time.time() if self._queue else self.max_interval
+            self._stop.wait(max(1.0, wait))
@@ -0,0 +1,39 @@
+import re
+import html
+from typing import Optional
+
+# Longest plain-text description and AI reasoning stored for display
+DESCRIPTION_TEXT_LENGTH = 300
+REASONING_TEXT_LENGTH = 300
+
+_HIDDEN_PATTERN = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+_SPACE_PATTERN = re.compile(r'\s+')
+
+
+def plain_text(text: Optional[str], max_length: Optional[int] = None) -> Optional[str]:
+    """
+    Turn feed HTML into display text: tags removed, entities decoded and
+    whitespace collapsed, optionally truncated at a word boundary.
+
+    Args:
+        text (str): Raw feed text (may contain HTML and entities)
+        max_length (int, optional): Maximum length, including the trailing ellipsis
+
+    Returns:
+        str or None: The plain text, or None if nothing readable is left
+    """
+    if not text:
+        return None
+    text = _TAG_PATTERN.sub(' ', _HIDDEN_PATTERN.sub(' ', text))
+    # Decode after stripping, so escaped markup ("&lt;b&gt;") stays visible text
+    text = _SPACE_PATTERN.sub(' ', html.unescape(text)).strip()
+    if not text:
+        return None
+
+    if max_length is not None and len(text) > max_length:
+        cut = text[:max_length - 1]
+        if ' ' in cut:
+            cut = cut[:cut.rindex(' ')]
+        text = cut.rstrip(' ,;:.-') + '…'
+    return text
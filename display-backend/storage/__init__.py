@@ -0,0 +1,7 @@
+"""
+Storage package with the SQLite connection layer shared by every database.
+"""
+
+from .sqlite import SQLiteDatabase, get_database
+
+__all__ = ['SQLiteDatabase', 'get_database']
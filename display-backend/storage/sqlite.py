@@ -0,0 +1,315 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Cursor that reports how long every statement took to its database.
+    """
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.database.record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.database.record_query(sql, time.perf_counter() - start)
+
+
+class TimedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors (including the execute shortcuts) are TimedCursors.
+    """
+
+    database: 'SQLiteDatabase' = None
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class PooledConnection:
+    """
+    Context manager that checks a connection out of its database's pool.
+
+    Entering returns the connection; leaving commits (or rolls back on an
+    exception) and checks it back in. Nested blocks on the same thread share
+    the outer block's connection, so a handler method can call another one
+    inside its transaction. Only the outermost block ends the transaction:
+    an inner block that raises leaves the rollback to the outer one, which
+    rolls back everything if the exception reaches it.
+    """
+
+    def __init__(self, database: 'SQLiteDatabase'):
+        self.database = database
+        self._conn: Optional[sqlite3.Connection] = None
+        self._outermost = False
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._conn = self.database.checkout()
+        self._outermost = self.database.depth() == 1
+        return self._conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        conn, self._conn = self._conn, None
+        try:
+            if self._outermost:
+                conn.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self.database.checkin(conn)
+        return False
+
+
+class SQLiteDatabase:
+    """
+    One SQLite database file shared by every handler that uses it.
+
+    Connections come from a small pool shared by all threads: a thread checks
+    one out for the length of a with block and returns it afterwards, so a
+    threaded server reuses pool_size connections (and their page caches)
+    instead of opening one per request thread. Connections run in WAL mode
+    so readers never wait for the writer, and the pool is rebuilt after a
+    fork. Schema setup registered through initialize() runs once per process
+    instead of on every handler construction, and every statement is timed,
+    with slow ones logged.
+    """
+
+    _registry: Dict[str, 'SQLiteDatabase'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, db_path: str, busy_timeout: float = 10.0, cache_size_kib: int = 16384,
+                 mmap_size: int = 256 * 1024 * 1024, slow_query_ms: float = 100.0, pool_size: int = 8):
+        """
+        Initialize the database.
+
+        Args:
+            db_path (str): Path to the SQLite database file
+            busy_timeout (float): Seconds a statement waits for a lock (or a checkout for a
+                free connection) before failing
+            cache_size_kib (int): Page cache size per connection in KiB
+            mmap_size (int): Bytes of the file to memory-map for reads
+            slow_query_ms (float): Statements slower than this are logged as warnings
+            pool_size (int): Most connections open at once
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.slow_query_ms = slow_query_ms
+        self.pool_size = pool_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._pool_lock = threading.Condition()
+        self._idle: List[sqlite3.Connection] = []
+        self._open = 0
+        self._pid = os.getpid()
+        self._initialized = set()
+        self._query_stats: Dict[str, List[float]] = {}
+
+    def connection(self) -> PooledConnection:
+        """
+        Get a context manager that lends the calling thread a pooled connection.
+
+        Returns:
+            PooledConnection: Use it in a with block; the connection returns rows as sqlite3.Row
+        """
+        return PooledConnection(self)
+
+    def checkout(self) -> sqlite3.Connection:
+        """
+        Take a connection from the pool, or reuse the one this thread already holds.
+
+        Returns:
+            sqlite3.Connection: The connection; give it back with checkin()
+
+        Raises:
+            sqlite3.OperationalError: If no connection frees up within busy_timeout
+        """
+        self._reset_after_fork()
+        held = getattr(self._local, 'conn', None)
+        if held is not None and self._local.pid == os.getpid():
+            self._local.depth += 1
+            return held
+
+        deadline = time.monotonic() + self.busy_timeout
+        conn = None
+        with self._pool_lock:
+            while not self._idle and self._open >= self.pool_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(f"no free connection to {self.db_path} "
+                                                   f"after {self.busy_timeout}s")
+                self._pool_lock.wait(remaining)
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                self._open += 1
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._pool_lock:
+                    self._open -= 1
+                    self._pool_lock.notify()
+                raise
+        self._local.conn, self._local.pid, self._local.depth = conn, os.getpid(), 1
+        return conn
+
+    def depth(self) -> int:
+        """
+        Get how many checkouts the calling thread holds on its connection.
+
+        Returns:
+            int: Nesting depth, 0 if the thread holds no connection
+        """
+        if getattr(self._local, 'conn', None) is None or self._local.pid != os.getpid():
+            return 0
+        return self._local.depth
+
+    def checkin(self, conn: sqlite3.Connection):
+        """
+        Give back a connection taken with checkout().
+
+        Args:
+            conn (sqlite3.Connection): The connection
+        """
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+        if self._pid != os.getpid():
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        with self._pool_lock:
+            self._idle.append(conn)
+            self._pool_lock.notify()
+
+    def _reset_after_fork(self):
+        # A child must not share the parent's connections; it starts with an empty pool
+        if self._pid == os.getpid():
+            return
+        with self._pool_lock:
+            if self._pid != os.getpid():
+                self._idle, self._open, self._pid = [], 0, os.getpid()
+                self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Pooled connections move between threads, but only one thread uses a connection at a time
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, factory=TimedConnection,
+                               check_same_thread=False)
+        conn.database = self
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        # NORMAL is durable across application crashes in WAL mode, and skips an fsync per commit
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kib)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    def close_idle(self):
+        """
+        Close every connection that isn't checked out.
+        """
+        with self._pool_lock:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._pool_lock.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def initialize(self, name: str, init_fn: Callable[[], None]):
+        """
+        Run a schema setup function once per process.
+
+        Args:
+            name (str): Identifies the setup (e.g. the handler class)
+            init_fn (callable): Creates tables and indexes; if it raises, it runs again next time
+        """
+        if name in self._initialized:
+            return
+        with self._init_lock:
+            if name not in self._initialized:
+                init_fn()
+                self._initialized.add(name)
+
+    def record_query(self, sql: str, seconds: float):
+        """
+        Add a statement's run time to the per-statement statistics.
+
+        Args:
+            sql (str): The statement
+            seconds (float): How long it took
+        """
+        statement = re.sub(r'\s+', ' ', sql).strip()
+        with self._lock:
+            stats = self._query_stats.setdefault(statement, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+        if seconds * 1000 >= self.slow_query_ms:
+            logger.warning(f"Slow query on {self.db_path} ({seconds * 1000:.0f} ms): {statement[:200]}")
+
+    def query_stats(self, limit: int = 20) -> List[Dict]:
+        """
+        Get the statements that took the most total time.
+
+        Args:
+            limit (int): Number of statements to return
+
+        Returns:
+            list: Dictionaries with statement, count, total_ms, avg_ms and max_ms
+        """
+        with self._lock:
+            items = sorted(self._query_stats.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [{
+            'statement': statement,
+            'count': count,
+            'total_ms': round(total * 1000, 3),
+            'avg_ms': round(total * 1000 / count, 3),
+            'max_ms': round(longest * 1000, 3),
+        } for statement, (count, total, longest) in items]
+
+    @classmethod
+    def for_path(cls, db_path: str) -> 'SQLiteDatabase':
+        """
+        Get the shared database for a file, creating it on first use.
+
+        Args:
+            db_path (str): Path to the SQLite database file
+
+        Returns:
+            SQLiteDatabase: The database shared by every caller using that file
+        """
+        key = os.path.abspath(db_path)
+        with cls._registry_lock:
+            if key not in cls._registry:
+                cls._registry[key] = cls(db_path)
+            return cls._registry[key]
+
+
+def get_database(db_path: str) -> SQLiteDatabase:
+    """
+    Get the shared database for a file (see SQLiteDatabase.for_path).
+    """
+    return SQLiteDatabase.for_path(db_path)
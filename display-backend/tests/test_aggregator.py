@@ -0,0 +1,56 @@
+import json
+
+from rss_feeds.aggregator import RSSAggregator
+
+FEED_URL = 'https://example.com/feed.xml'
+
+FEED = b'''<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Example</title>
+<item><title>Newest</title><link>https://example.com/2</link><pubDate>Sun, 18 Oct 2026 12:00:00 GMT</pubDate></item>
+<item><title>Older</title><link>https://example.com/1</link><pubDate>Sun, 18 Oct 2026 11:00:00 GMT</pubDate></item>
+</channel></rss>'''
+
+
+def _aggregator(tmp_path):
+    feeds_file = tmp_path / 'feeds.json'
+    feeds_file.write_text(json.dumps([{'title': 'Example', 'url': FEED_URL}]))
+    return RSSAggregator(feeds_file=str(feeds_file), db_path=str(tmp_path / 'articles.db'))
+
+
+def _stats():
+    return {'feeds_processed': 0, 'articles_fetched': 0, 'articles_stored': 0, 'articles_skipped': 0,
+            'articles_duplicate': 0, 'feeds_unchanged': 0, 'feeds_failed': 0}
+
+
+def _document(aggregator):
+    return {'content': FEED, 'etag': '"new"', 'last_modified': 'Sun, 18 Oct 2026 12:00:00 GMT',
+            'state': aggregator.db_handler.get_feed_state(FEED_URL)}
+
+
+def test_stored_feed_saves_validators_and_high_water(tmp_path):
+    aggregator = _aggregator(tmp_path)
+    stats = _stats()
+
+    assert aggregator._process_feed(aggregator.feeds[0], _document(aggregator), stats) == 2
+    state = aggregator.db_handler.get_feed_state(FEED_URL)
+    assert state['etag'] == '"new"'
+    assert state['high_water_link'] == 'https://example.com/2'
+    assert stats['articles_stored'] == 2
+
+
+def test_failed_insert_keeps_feed_state(tmp_path):
+    aggregator = _aggregator(tmp_path)
+    handler = aggregator.db_handler
+    handler.record_feed_success(FEED_URL, '"old"', 'Sat, 17 Oct 2026 12:00:00 GMT')
+    with handler.get_connection() as conn:
+        conn.execute("CREATE TRIGGER fail_insert BEFORE INSERT ON articles "
+                     "BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+    before = handler.get_feed_state(FEED_URL)
+    stats = _stats()
+
+    assert aggregator._process_feed(aggregator.feeds[0], _document(aggregator), stats) is None
+    after = handler.get_feed_state(FEED_URL)
+    assert (after['etag'], after['last_modified']) == (before['etag'], before['last_modified'])
+    assert after['high_water_link'] is None and after['high_water_published'] is None
+    assert after['error_count'] == before['error_count'] + 1
+    assert stats['feeds_failed'] == 1 and stats['articles_stored'] == 0
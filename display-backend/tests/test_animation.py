@@ -0,0 +1,62 @@
+import io
+import struct
+import zlib
+
+import numpy as np
+import matplotlib.image as mimage
+from PIL import Image
+
+from heatmaps.animation import PNG_SIGNATURE, mux_apng, parse_png
+
+
+def _png(seed):
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    mimage.imsave(buffer, rng.integers(0, 256, (24, 32, 4), dtype=np.uint8), format='png')
+    return buffer.getvalue()
+
+
+def _chunks(data):
+    assert data.startswith(PNG_SIGNATURE)
+    offset = len(PNG_SIGNATURE)
+    chunks = []
+    while offset < len(data):
+        (length,) = struct.unpack_from('>I', data, offset)
+        chunk_type = data[offset + 4:offset + 8]
+        body = data[offset + 8:offset + 8 + length]
+        (crc,) = struct.unpack_from('>I', data, offset + 8 + length)
+        assert crc == zlib.crc32(chunk_type + body), chunk_type
+        chunks.append((chunk_type, body))
+        offset += 12 + length
+    assert offset == len(data)
+    return chunks
+
+
+def test_apng_chunks_are_well_formed():
+    pngs = [_png(seed) for seed in range(4)]
+    chunks = _chunks(mux_apng([parse_png(png) for png in pngs], delay_ms=150))
+    types = [chunk_type for chunk_type, _ in chunks]
+
+    assert types[0] == b'IHDR' and types[1] == b'acTL' and types[-1] == b'IEND'
+    assert struct.unpack('>II', chunks[1][1]) == (4, 0)
+    # The default image is the first frame, so its fcTL comes right before the IDAT
+    assert types.index(b'fcTL') < types.index(b'IDAT')
+    assert types.count(b'fcTL') == 4 and types.count(b'IDAT') == 1 and types.count(b'fdAT') == 3
+
+    sequence = [struct.unpack_from('>I', body)[0] for chunk_type, body in chunks
+                if chunk_type in (b'fcTL', b'fdAT')]
+    assert sequence == list(range(len(sequence)))
+    for chunk_type, body in chunks:
+        if chunk_type == b'fcTL':
+            _, width, height, x, y, delay, denominator, _, _ = struct.unpack('>IIIIIHHBB', body)
+            assert (width, height, x, y, delay, denominator) == (32, 24, 0, 0, 150, 1000)
+
+
+def test_apng_frames_decode_to_the_original_images():
+    pngs = [_png(seed) for seed in range(3)]
+    with Image.open(io.BytesIO(mux_apng([parse_png(png) for png in pngs]))) as apng:
+        assert apng.n_frames == 3
+        for index, png in enumerate(pngs):
+            apng.seek(index)
+            with Image.open(io.BytesIO(png)) as original:
+                assert np.array_equal(np.asarray(apng.convert('RGBA')), np.asarray(original.convert('RGBA')))
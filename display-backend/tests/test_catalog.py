@@ -0,0 +1,43 @@
+import numpy as np
+
+from heatmaps.catalog import FrameCatalog
+from heatmaps.grid_store import save_grid
+from heatmaps.tiles import TileServer
+
+TIMESTAMP = 1_700_000_000
+
+
+def _write_frame(catalog, tmp_path, grid):
+    grid_path = str(tmp_path / f'grid_rolling_{TIMESTAMP}.npz')
+    catalog.db_handler.delete_frame('rolling', TIMESTAMP)
+    size_bytes = save_grid(grid_path, grid)
+    catalog.db_handler.log_grid(grid_path, TIMESTAMP, 'rolling', grid.shape[0],
+                                int(np.count_nonzero(grid)), float(grid.max()), size_bytes)
+
+
+def test_rewritten_frame_is_not_served_from_cache(tmp_path):
+    catalog = FrameCatalog(db_path=str(tmp_path / 'heatmaps.db'), generation_ttl=0)
+    tiles = TileServer(catalog)
+    grid = np.zeros((50, 50))
+    grid[10:20, 10:20] = 5
+    _write_frame(catalog, tmp_path, grid)
+
+    old_png = catalog.get_frame_png('rolling', TIMESTAMP)
+    old_contours = catalog.get_frame_contours('rolling', TIMESTAMP)
+    old_tile = tiles.get_tile('rolling', TIMESTAMP, 0, 0, 0)
+    generation = catalog.generation()
+
+    # Replay deletes the frame's rows and writes a new grid under the same path
+    _write_frame(catalog, tmp_path, grid * 0 + np.eye(50) * 9)
+
+    assert catalog.generation() == generation + 1
+    assert catalog.get_frame_png('rolling', TIMESTAMP) != old_png
+    assert catalog.get_frame_contours('rolling', TIMESTAMP) != old_contours
+    assert tiles.get_tile('rolling', TIMESTAMP, 0, 0, 0) != old_tile
+
+
+def test_first_write_keeps_the_generation(tmp_path):
+    catalog = FrameCatalog(db_path=str(tmp_path / 'heatmaps.db'), generation_ttl=0)
+    _write_frame(catalog, tmp_path, np.ones((20, 20)))
+
+    assert catalog.generation() == 0
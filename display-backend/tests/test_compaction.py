@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+
+from heatmaps.catalog import FrameCatalog
+from heatmaps.compaction import DEFAULT_RETENTION_TIERS, compact_frames, select_frames
+from heatmaps.grid_store import save_grid
+
+NOW = 1_800_000_000
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def _log_frames(catalog, folder, hour_start, step_minutes=2, pngs=False):
+    for timestamp in range(hour_start, hour_start + HOUR, step_minutes * 60):
+        grid_path = os.path.join(folder, f'grid_rolling_{timestamp}.npz')
+        size_bytes = save_grid(grid_path, np.full((10, 10), timestamp % 97, dtype=float))
+        catalog.db_handler.log_grid(grid_path, timestamp, 'rolling', 10, 100, 96.0, size_bytes)
+        if pngs:
+            png_path = os.path.join(folder, f'heatmap_rolling_{timestamp}.png')
+            with open(png_path, 'wb') as f:
+                f.write(b'png %d' % timestamp)
+            catalog.db_handler.log_heatmap(png_path, timestamp, 'rolling')
+
+
+def _frames(catalog, hour_start):
+    return catalog.get_frames('rolling', hour_start, hour_start + HOUR - 1)
+
+
+def test_frames_past_the_last_tier_are_dropped(tmp_path):
+    catalog = FrameCatalog(db_path=str(tmp_path / 'heatmaps.db'))
+    archive_folder = str(tmp_path / 'archive')
+    expired = NOW - 31 * DAY - NOW % HOUR
+    hourly = NOW - 10 * DAY - NOW % HOUR
+    _log_frames(catalog, str(tmp_path), expired)
+    _log_frames(catalog, str(tmp_path), hourly)
+
+    stats = compact_frames(str(tmp_path / 'heatmaps.db'), archive_folder=archive_folder, now=NOW)
+
+    assert _frames(catalog, expired) == []
+    assert len(_frames(catalog, hourly)) == 1
+    assert stats['hours_dropped'] == 1 and stats['hours_rewritten'] == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.npz')]
+    # Only the hourly frame's archive is left on disk
+    assert sum(len(files) for _, _, files in os.walk(archive_folder)) == 1
+
+
+def test_frames_thin_out_as_they_age_into_coarser_tiers(tmp_path):
+    db_path = str(tmp_path / 'heatmaps.db')
+    catalog = FrameCatalog(db_path=db_path)
+    archive_folder = str(tmp_path / 'archive')
+    hour_start = NOW - 2 * DAY - NOW % HOUR
+    recent = NOW - 12 * HOUR - NOW % HOUR
+    _log_frames(catalog, str(tmp_path), hour_start, pngs=True)
+    _log_frames(catalog, str(tmp_path), recent, pngs=True)
+
+    # A day old: one frame per 10 minutes, and the PNGs of frames with grids go
+    stats = compact_frames(db_path, archive_folder=archive_folder, now=NOW)
+    frames = _frames(catalog, hour_start)
+    assert [frame['timestamp'] for frame in frames] == list(range(hour_start, hour_start + HOUR, 600))
+    assert all(frame['grid_archive_id'] and not frame['png_archive_id'] for frame in frames)
+    assert stats['frames_dropped'] == 24 and stats['pngs_dropped'] == 6
+
+    # Under a day old: every 2-minute frame is archived with its PNG
+    frames = _frames(catalog, recent)
+    assert len(frames) == 30
+    assert all(frame['grid_archive_id'] and frame['png_archive_id'] for frame in frames)
+    assert catalog.get_frame_png('rolling', recent) == b'png %d' % recent
+
+    # A week old: the archived hour is rewritten down to one frame, while the
+    # recent hour is now a day old and thinned to one frame per 10 minutes
+    stats = compact_frames(db_path, archive_folder=archive_folder, now=NOW + 6 * DAY)
+    assert [frame['timestamp'] for frame in _frames(catalog, hour_start)] == [hour_start]
+    assert stats['frames_dropped'] == 5 + 24
+
+    # Nothing changes until a frame crosses into another tier
+    stats = compact_frames(db_path, archive_folder=archive_folder, now=NOW + 6 * DAY + HOUR)
+    assert stats['hours_rewritten'] == 0 and stats['hours_dropped'] == 0
+
+
+def test_frames_without_a_grid_keep_their_png():
+    frame = {'timestamp': NOW - 2 * DAY, 'log_id': 1, 'grid_id': None, 'grid_archive_id': None}
+    gridded = dict(frame, timestamp=NOW - 2 * DAY + 600, grid_id=2)
+
+    assert select_frames([frame, gridded], DEFAULT_RETENTION_TIERS, NOW) == [(frame, True), (gridded, False)]
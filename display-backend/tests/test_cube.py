@@ -0,0 +1,80 @@
+import numpy as np
+
+from heatmaps.cube import ALTITUDE_BAND_EDGES_FT, SPEED_BAND_EDGES_KT, CubeFrame, FlightCube
+from heatmaps.render import US_BOUNDS
+
+AIRLINES = ['AAL', 'DAL', 'UAL']
+
+
+def _snapshot(count=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        # A margin around the bounds, so some flights fall outside the cube
+        'lats': rng.uniform(20, 52, count),
+        'lons': rng.uniform(-130, -55, count),
+        'altitudes': rng.uniform(0, 45000, count),
+        'ground_speeds': rng.uniform(0, 600, count),
+        'airlines': rng.choice(AIRLINES + ['XYZ', 'QQQ'], count),
+    }
+
+
+def _inside(snapshot):
+    y1, y2, x1, x2 = US_BOUNDS
+    lats, lons = snapshot['lats'], snapshot['lons']
+    return (lats >= y2) & (lats <= y1) & (lons >= x1) & (lons <= x2)
+
+
+def _cube(snapshots):
+    cube = FlightCube(resolution=50, airlines=AIRLINES)
+    binned = sum(cube.ingest(snapshot) for snapshot in snapshots)
+    return cube, binned
+
+
+def test_slice_with_no_selection_counts_every_flight_inside():
+    snapshots = [_snapshot(seed=0), _snapshot(seed=1)]
+    cube, binned = _cube(snapshots)
+
+    assert binned == sum(int(_inside(snapshot).sum()) for snapshot in snapshots)
+    grid = cube.frame().slice()
+    assert grid.shape == (50, 50)
+    assert grid.sum() == binned
+
+
+def test_marginals_match_the_ingested_flights():
+    snapshot = _snapshot()
+    inside = _inside(snapshot)
+    frame = _cube([snapshot])[0].frame()
+
+    altitudes = np.searchsorted(ALTITUDE_BAND_EDGES_FT, snapshot['altitudes'][inside], side='right') - 1
+    assert list(frame.marginal('altitude_band').values()) == np.bincount(
+        altitudes, minlength=len(ALTITUDE_BAND_EDGES_FT)).tolist()
+
+    speeds = np.searchsorted(SPEED_BAND_EDGES_KT, snapshot['ground_speeds'][inside], side='right') - 1
+    assert list(frame.marginal('speed_band').values()) == np.bincount(
+        speeds, minlength=len(SPEED_BAND_EDGES_KT)).tolist()
+
+    airlines = snapshot['airlines'][inside]
+    totals = frame.marginal('airline')
+    for code in AIRLINES:
+        assert totals[code] == (airlines == code).sum()
+    assert totals['other'] == (~np.isin(airlines, AIRLINES)).sum()
+
+
+def test_selections_add_up_to_the_full_slice():
+    frame = _cube([_snapshot()])[0].frame()
+    full = frame.slice()
+
+    by_band = sum(frame.slice(altitude_band=band) for band in range(len(ALTITUDE_BAND_EDGES_FT)))
+    np.testing.assert_array_equal(by_band, full)
+    by_airline = frame.slice(airline=AIRLINES) + frame.slice(airline='other')
+    np.testing.assert_array_equal(by_airline, full)
+    # A selection on two axes matches the marginal restricted the same way
+    assert frame.slice(altitude_band=3, airline='DAL').sum() == frame.marginal('airline', altitude_band=3)['DAL']
+
+
+def test_stored_frame_answers_the_same_queries():
+    frame = _cube([_snapshot()])[0].frame()
+    loaded = CubeFrame.from_bytes(frame.to_bytes())
+
+    np.testing.assert_array_equal(loaded.slice(speed_band=[1, 2]), frame.slice(speed_band=[1, 2]))
+    assert loaded.marginal('airline') == frame.marginal('airline')
@@ -0,0 +1,25 @@
+from rss_feeds.db_handler import DatabaseHandler
+
+
+def _articles(count, start=0):
+    return [{'title': f'Article {i}', 'link': f'https://example.com/{i}',
+             'description': f'<p>Story number {i}</p>', 'published_date': '2026-01-01 12:00:00'}
+            for i in range(start, start + count)]
+
+
+def test_insert_counts_ignore_trigger_changes(tmp_path):
+    handler = DatabaseHandler(str(tmp_path / 'articles.db'))
+
+    # The published_ts and FTS triggers change more rows than the INSERT itself
+    assert handler.insert_articles(_articles(1)) == {'inserted': 1, 'skipped': 0, 'failed': 0}
+    assert handler.insert_articles(_articles(5, start=1)) == {'inserted': 5, 'skipped': 0, 'failed': 0}
+    assert handler.insert_articles(_articles(8)) == {'inserted': 2, 'skipped': 6, 'failed': 0}
+
+
+def test_inserted_articles_are_searchable(tmp_path):
+    handler = DatabaseHandler(str(tmp_path / 'articles.db'))
+    handler.insert_articles(_articles(3))
+
+    results = handler.search_articles('Article')
+    assert len(results) == 3
+    assert all(result['published_ts'] is not None for result in results)
@@ -0,0 +1,68 @@
+import struct
+
+import numpy as np
+
+from heatmaps.delta import encode_delta_stream, decode_delta_stream
+from heatmaps.sparse import SparseGrid
+
+
+def _frames(shape=(201, 199), count=5, seed=0):
+    rng = np.random.default_rng(seed)
+    grid = np.zeros(shape)
+    frames = []
+    for i in range(count):
+        # An odd number of changed cells per frame exercises the uint16 padding
+        cells = rng.choice(grid.size, size=2 * i + 3, replace=False)
+        grid.ravel()[cells] += rng.integers(1, 50, size=cells.size)
+        frames.append((1_700_000_000 + 120 * i, grid.copy()))
+    return frames
+
+
+def _array_offsets(data):
+    """Walk the stream layout and return the offset of every array in it."""
+    _, _, _, rows, cols, frame_count, _ = struct.unpack_from('<4sBBHHIH', data, 0)
+    offset = 16
+    offsets = [offset + 4]
+    offset += 4 + rows * cols * 2
+    offset += -offset % 4
+    for _ in range(frame_count - 1):
+        offsets.append(offset)
+        (_, count) = struct.unpack_from('<II', data, offset)
+        offset += 8
+        offsets.append(offset)
+        offset += count * 4
+        offsets.append(offset)
+        offset += count * 2
+        offset += -offset % 4
+    assert offset == len(data)
+    return offsets
+
+
+def test_round_trip():
+    frames = _frames()
+    decoded = decode_delta_stream(encode_delta_stream(frames))
+
+    assert [timestamp for timestamp, _ in decoded] == [timestamp for timestamp, _ in frames]
+    for (_, grid), (_, original) in zip(decoded, frames):
+        assert grid.dtype == np.uint16
+        np.testing.assert_array_equal(grid, original)
+
+
+def test_sparse_frames_round_trip():
+    frames = []
+    for timestamp, grid in _frames(shape=(40, 60)):
+        rows, cols = np.nonzero(grid)
+        frames.append((timestamp, SparseGrid.from_coo(grid.shape, rows, cols, grid[rows, cols])))
+    decoded = decode_delta_stream(encode_delta_stream(frames))
+    for (_, grid), (_, original) in zip(decoded, frames):
+        np.testing.assert_array_equal(grid, original.to_dense())
+
+
+def test_every_array_is_four_byte_aligned():
+    data = encode_delta_stream(_frames())
+    assert len(data) % 4 == 0
+    assert all(offset % 4 == 0 for offset in _array_offsets(data))
+
+
+def test_empty_stream():
+    assert decode_delta_stream(encode_delta_stream([])) == []
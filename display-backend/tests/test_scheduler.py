@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from rss_feeds.aggregator import RSSAggregator
+from rss_feeds.scheduler import FeedScheduler
+
+FEED_URLS = ['https://example.com/a.xml', 'https://example.com/b.xml']
+NOW = 1_800_000_000
+
+
+def _scheduler(tmp_path):
+    feeds_file = tmp_path / 'feeds.json'
+    feeds_file.write_text(json.dumps([{'title': url, 'url': url} for url in FEED_URLS]))
+    aggregator = RSSAggregator(feeds_file=str(feeds_file), db_path=str(tmp_path / 'articles.db'))
+    return FeedScheduler(aggregator, default_interval=600, jitter=0)
+
+
+def test_feeds_are_requeued_with_backoff_when_the_batch_raises(tmp_path, monkeypatch):
+    scheduler = _scheduler(tmp_path)
+
+    def aggregate_feeds(feeds, new_counts):
+        new_counts[FEED_URLS[0]] = 0
+        raise RuntimeError('connection pool exhausted')
+
+    monkeypatch.setattr(scheduler.aggregator, 'aggregate_feeds', aggregate_feeds)
+    with pytest.raises(RuntimeError):
+        scheduler.run_pending(now=NOW)
+
+    assert sorted(scheduler._queue) == [(NOW + 600, FEED_URLS[0]), (NOW + 1200, FEED_URLS[1])]
+    state = scheduler.db_handler.get_feed_state(FEED_URLS[1])
+    assert (state['poll_interval'], state['next_poll_ts']) == (1200, NOW + 1200)
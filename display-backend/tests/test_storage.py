@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+from storage import SQLiteDatabase
+
+
+def _database(tmp_path):
+    database = SQLiteDatabase(str(tmp_path / 'test.db'))
+    with database.connection() as conn:
+        conn.execute('CREATE TABLE items (name TEXT)')
+    return database
+
+
+def _committed(database):
+    # A separate connection only sees committed rows
+    conn = sqlite3.connect(database.db_path)
+    try:
+        return [row[0] for row in conn.execute('SELECT name FROM items ORDER BY name')]
+    finally:
+        conn.close()
+
+
+def test_inner_block_does_not_commit_outer_transaction(tmp_path):
+    database = _database(tmp_path)
+
+    with database.connection() as outer:
+        outer.execute("INSERT INTO items VALUES ('outer')")
+        with database.connection() as inner:
+            assert inner is outer
+            inner.execute("INSERT INTO items VALUES ('inner')")
+        assert _committed(database) == []
+        assert outer.in_transaction
+
+    assert _committed(database) == ['inner', 'outer']
+
+
+def test_nested_block_that_raises_rolls_back_at_outermost_exit(tmp_path):
+    database = _database(tmp_path)
+
+    with pytest.raises(ValueError):
+        with database.connection() as outer:
+            outer.execute("INSERT INTO items VALUES ('outer')")
+            try:
+                with database.connection() as inner:
+                    inner.execute("INSERT INTO items VALUES ('inner')")
+                    raise ValueError('inner failed')
+            except ValueError:
+                # The inner exit neither commits nor discards the outer block's work
+                assert outer.in_transaction
+                assert _committed(database) == []
+                raise
+
+    assert _committed(database) == []
+    assert database.depth() == 0
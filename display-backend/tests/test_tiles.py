@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+
+from heatmaps.render import US_BOUNDS
+from heatmaps.tiles import render_tile, tile_pixel_coordinates
+
+# Latitude where Web Mercator tiles end
+MAX_LAT = math.degrees(math.atan(math.sinh(math.pi)))
+
+
+def _tile_for(lat, lon, z):
+    # Reference formula from the OSM slippy map tile names
+    n = 2 ** z
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return x, y
+
+
+def test_world_tile_spans_the_mercator_world():
+    lats, lons = tile_pixel_coordinates(0, 0, 0, tile_size=256)
+
+    half_pixel = 360 / 256 / 2
+    assert lons[0] == -180 + half_pixel and lons[-1] == 180 - half_pixel
+    assert np.all(np.diff(lons) > 0) and np.all(np.diff(lats) < 0)
+    assert MAX_LAT > lats[0] > lats[1] and np.allclose(lats, -lats[::-1])
+
+
+def test_neighbouring_tiles_continue_each_other():
+    z = 5
+    lats, lons = tile_pixel_coordinates(z, 10, 11)
+    right_lats, right_lons = tile_pixel_coordinates(z, 11, 11)
+    below_lats, _ = tile_pixel_coordinates(z, 10, 12)
+
+    assert np.array_equal(right_lats, lats)
+    assert np.isclose(right_lons[0] - lons[-1], lons[1] - lons[0])
+    # Pixel rows shrink toward the equator but never overlap or leave a gap bigger than a row
+    assert lats[-1] > below_lats[0] > lats[-1] - 2 * (lats[-2] - lats[-1])
+
+
+def test_tile_contains_the_point_it_was_picked_for():
+    for lat, lon, z in ((40.71, -74.01, 10), (34.05, -118.24, 7), (25.76, -80.19, 12), (47.61, -122.33, 3)):
+        lats, lons = tile_pixel_coordinates(z, *_tile_for(lat, lon, z))
+        assert lats[-1] <= lat <= lats[0]
+        assert lons[0] <= lon <= lons[-1]
+
+
+def test_rendered_tiles_follow_the_grid():
+    y1, y2, x1, x2 = US_BOUNDS
+    grid = np.zeros((100, 100))
+    # One busy cell around Denver
+    grid[int((39.74 - y2) / (y1 - y2) * 99), int((-104.99 - x1) / (x2 - x1) * 99)] = 50
+
+    z = 6
+    assert render_tile(grid, z, *_tile_for(39.74, -104.99, z)) is not None
+    assert render_tile(grid, z, *_tile_for(40.71, -74.01, z)) is None
+    # Outside the grid's bounds altogether
+    assert render_tile(grid, z, *_tile_for(-33.87, 151.21, z)) is None
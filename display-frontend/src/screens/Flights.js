@@ -40,8 +40,12 @@ const Flights = ({ theme }) => {
         })
             .then(res => res.json())
             .then(data => {
-                const urls = data.map(([url, time]) => ({
-                    url: `${process.env.REACT_APP_SERVER_URL}/heatmap/${selectedType}/${time}.png`,
+                // Frames without a stored grid have no tiles, so they're shown as one PNG
+                const urls = data.map(([url, time, hasGrid]) => ({
+                    url: hasGrid
+                        ? `${process.env.REACT_APP_SERVER_URL}/heatmap/tiles/${selectedType}/${time}/{z}/{x}/{y}.png`
+                        : `${process.env.REACT_APP_SERVER_URL}/heatmap/${selectedType}/${time}.png`,
+                    tiled: hasGrid,
                     time
                 }));
                 setImages(urls);
@@ -118,13 +122,20 @@ const Flights = ({ theme }) => {
                     }
                     attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
                 />
-                {images[currentIndex] && (
+                {images[currentIndex] && (images[currentIndex].tiled ? (
+                    <TileLayer
+                        bounds={bounds} // Only request heatmap tiles that cover the US
+                        url={images[currentIndex].url}
+                        opacity={0.7} // Set opacity to make overlay semi-transparent
+                        maxNativeZoom={12}
+                    />
+                ) : (
                     <ImageOverlay
                         bounds={bounds}
                         url={images[currentIndex].url}
-                        opacity={0.7} // Set opacity to make overlay semi-transparent
+                        opacity={0.7}
                     />
-                )}
+                ))}
             </MapContainer>
             <div style={{
                 position: 'absolute',